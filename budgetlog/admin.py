@@ -5,7 +5,7 @@ from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.forms import ReadOnlyPasswordHashField
 
 # Lokální aplikace
-from .models import AppUser, Book, Tag, Category, Transaction
+from .models import AppUser, Book, Tag, Category, Transaction, MonthlyCategoryRollup, ImportJob
 
 
 class UserCreationForm(forms.ModelForm):
@@ -77,6 +77,28 @@ class TransactionAdmin(admin.ModelAdmin):
     search_fields = ('description', 'category__name', 'type')
 
 
+@admin.register(MonthlyCategoryRollup)
+class MonthlyCategoryRollupAdmin(admin.ModelAdmin):
+    """
+    Admin konfigurace pro předpočítané měsíční souhrny; slouží pouze ke kontrole, data přepočítá 'rebuild_rollups'.
+    """
+    list_display = ('book', 'year', 'month', 'category', 'type', 'total', 'count')
+    list_filter = ('type', 'year', 'book')
+    readonly_fields = ('book', 'year', 'month', 'category', 'type', 'total', 'count')
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    """
+    Admin konfigurace pro importy CSV na pozadí; umožňuje sledovat stav a výsledky jednotlivých importů.
+    """
+    list_display = ('id', 'book', 'owner', 'status', 'processed', 'added', 'skipped_count', 'created_at',
+                    'finished_at')
+    list_filter = ('status',)
+    readonly_fields = ('processed', 'added', 'skipped', 'skipped_count', 'error', 'created_at', 'started_at',
+                       'finished_at')
+
+
 @admin.register(AppUser)
 class AppUserAdmin(UserAdmin):
     """
@@ -0,0 +1,92 @@
+"""
+Vývoj zůstatku knihy v čase pro graf na dashboardu.
+
+Průběžný zůstatek po dnech spočítá databáze okenní funkcí (TransactionQuerySet.daily_balances), takže se do
+Pythonu nepřenáší každá transakce, ale nejvýše jeden řádek za den. Dny se pak seskupí do týdnů nebo měsíců:
+zůstatek období je zůstatek jeho posledního dne s transakcemi, období bez transakcí převezmou zůstatek
+předchozího. Počet bodů je omezen nastavením BALANCE_SERIES_MAX_POINTS.
+"""
+
+# Standardní knihovny Pythonu
+import math
+from datetime import timedelta
+from decimal import Decimal
+
+# Období grafu od nejjemnějšího; výchozí je první
+PERIODS = ('day', 'week', 'month')
+
+
+def period_start(day, period):
+    """Vrátí první den období (pondělí u týdne), do kterého patří `day`."""
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_period(start, period):
+    """Vrátí první den období následujícího po období začínajícím `start`."""
+    if period == 'week':
+        return start + timedelta(days=7)
+    if period == 'month':
+        return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    return start + timedelta(days=1)
+
+
+def period_count(first, last, period):
+    """Počet období od `first` do `last` včetně."""
+    first, last = period_start(first, period), period_start(last, period)
+    if period == 'month':
+        return (last.year - first.year) * 12 + last.month - first.month + 1
+    return (last - first).days // (7 if period == 'week' else 1) + 1
+
+
+def balance_series(queryset, period=PERIODS[0], max_points=366):
+    """
+    Vrátí průběžný zůstatek transakcí querysetu po obdobích.
+
+    Pokud by požadované období dalo více než `max_points` bodů, použije se nejbližší hrubší (den → týden → měsíc),
+    a kdyby se nevešly ani měsíce, ponechá se každý k-tý měsíc (vždy včetně posledního).
+
+    :param period: Nejjemnější požadované období z PERIODS.
+    :return: {'period': použité období, 'dates': [první den období (ISO)], 'balances': [zůstatek na konci období]}
+    :raises ValueError: Pokud období není v PERIODS.
+    """
+    if period not in PERIODS:
+        raise ValueError(f'Neznámé období: {period!r}')
+    daily = list(queryset.daily_balances())
+    if not daily:
+        return {'period': period, 'dates': [], 'balances': []}
+
+    first, last = daily[0][0], daily[-1][0]
+    for period in PERIODS[PERIODS.index(period):]:
+        if period_count(first, last, period) <= max_points:
+            break
+
+    # Zůstatek na konci každého období s transakcemi (řádky jsou seřazené podle data, poslední den přepíše předchozí)
+    closing = {}
+    for day, balance in daily:
+        closing[period_start(day, period)] = balance
+
+    dates = []
+    balances = []
+    balance = Decimal('0')
+    start, end = period_start(first, period), period_start(last, period)
+    while start <= end:
+        balance = closing.get(start, balance)
+        dates.append(start)
+        balances.append(balance)
+        start = next_period(start, period)
+
+    step = math.ceil(len(dates) / max_points)
+    if step > 1:
+        offset = (len(dates) - 1) % step
+        dates, balances = dates[offset::step], balances[offset::step]
+
+    return {
+        'period': period,
+        'dates': [start.isoformat() for start in dates],
+        # Součet se v SQLite počítá v plovoucí čárce, zůstatky se zaokrouhlí na haléře
+        'balances': [float(balance.quantize(Decimal('0.01'))) for balance in balances],
+    }
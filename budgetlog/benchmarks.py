@@ -0,0 +1,154 @@
+"""
+Pomocné nástroje pro výkonnostní měření (management příkazy benchmark_*).
+
+Syntetická data se vytvářejí uvnitř transakce, která se na konci vždy vrátí zpět, takže měření lze spustit
+i nad produkční databází bez trvalých změn.
+"""
+
+# Standardní knihovny Pythonu
+import random
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+
+# Django importy
+from django.db import connection, transaction as db_transaction
+from django.test.utils import CaptureQueriesContext
+
+# Lokální aplikace
+from . import rollups
+from .models import AppUser, Book, Category, Tag, Transaction
+
+
+class _Rollback(Exception):
+    """Výjimka pro vrácení transakce se syntetickými daty."""
+
+
+@contextmanager
+def synthetic_book(transactions=100_000, categories=12, tags=20, start=date(2020, 1, 1), days=5 * 365, seed=42,
+                   words=None):
+    """
+    Vytvoří dočasného uživatele a knihu s náhodnými transakcemi a po skončení bloku vše vrátí zpět.
+
+    :param transactions: Počet vygenerovaných transakcí.
+    :param categories: Počet kategorií (mimo výchozí kategorii).
+    :param tags: Počet tagů; každá transakce dostane 0 až 3 náhodné tagy.
+    :param start: Datum nejstarší transakce.
+    :param days: Rozsah dnů, do kterého se transakce rozprostřou.
+    :param seed: Semínko generátoru, aby byla měření opakovatelná.
+    :param words: Slova, ze kterých se náhodně skládají popisy transakcí (výchozí "Popis transakce N").
+    :return: Instance knihy s vygenerovanými daty.
+    """
+    rng = random.Random(seed)
+    try:
+        with db_transaction.atomic():
+            user = AppUser.objects.create_user(email=f'benchmark-{rng.randrange(10**9)}@budgetlog.cz',
+                                               password='benchmark')
+            book = Book.objects.create(name='Benchmark', owner=user)
+            category_objs = Category.objects.bulk_create([
+                Category(name=f'Kategorie {i + 1}', color=f'#{rng.randint(0, 0xFFFFFF):06x}', book=book)
+                for i in range(categories)
+            ])
+            tag_objs = Tag.objects.bulk_create([
+                Tag(name=f'Tag {i + 1}', color=f'#{rng.randint(0, 0xFFFFFF):06x}', book=book)
+                for i in range(tags)
+            ])
+
+            with rollups.suspended():
+                created = Transaction.objects.bulk_create([
+                    Transaction(
+                        book=book,
+                        amount=Decimal(rng.randint(1000, 1_000_000)) / 100,
+                        category=rng.choice(category_objs),
+                        datestamp=start + timedelta(days=rng.randrange(days)),
+                        description=(' '.join(rng.choices(words, k=rng.randint(2, 6))) if words
+                                     else f'Popis transakce {i + 1}'),
+                        type=rng.choice(('income', 'expense')),
+                    )
+                    for i in range(transactions)
+                ], batch_size=2000)
+                through = Transaction.tags.through
+                links = [
+                    through(transaction_id=created_transaction.id, tag_id=tag.id)
+                    for created_transaction in created
+                    for tag in rng.sample(tag_objs, rng.randint(0, min(3, len(tag_objs))))
+                ]
+                through.objects.bulk_create(links, batch_size=5000)
+            rollups.rebuild([book.id])
+
+            yield book
+            raise _Rollback
+    except _Rollback:
+        pass
+
+
+@contextmanager
+def temporary_book(seed=42):
+    """
+    Vytvoří dočasného uživatele a prázdnou knihu mimo transakci a po skončení bloku je smaže.
+
+    Na rozdíl od `synthetic_book` se zápisy uvnitř bloku skutečně potvrzují, takže měření zahrnuje i cenu
+    commitů (např. u importu).
+    """
+    rng = random.Random(seed)
+    user = AppUser.objects.create_user(email=f'benchmark-{rng.randrange(10**9)}@budgetlog.cz', password='benchmark')
+    book = Book.objects.create(name='Benchmark', owner=user)
+    try:
+        yield book
+    finally:
+        with rollups.suspended():
+            user.delete()
+
+
+def synthetic_csv(rows=20_000, categories=12, tags=20, seed=42):
+    """
+    Vygeneruje obsah CSV souboru pro import (bajty v UTF-8, oddělovač středník) s náhodnými transakcemi.
+    Formáty částek i dat se střídají, jako v exportech z bank.
+    """
+    rng = random.Random(seed)
+    lines = ['amount;datestamp;type;category;tags;description']
+    start = date(2020, 1, 1)
+    for i in range(rows):
+        amount = f'{rng.randint(100, 1_000_000) / 100:.2f}'
+        day = start + timedelta(days=rng.randrange(5 * 365))
+        if i % 2:
+            amount = amount.replace('.', ',')
+            datestamp = day.strftime('%d.%m.%Y')
+        else:
+            datestamp = day.isoformat()
+        row_tags = ', '.join(f'Tag {t + 1}' for t in rng.sample(range(tags), rng.randint(0, 3)))
+        lines.append(f'{amount};{datestamp};{rng.choice(("income", "expense"))};'
+                     f'Kategorie {rng.randrange(categories) + 1};{row_tags};Popis transakce {i + 1}')
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+# Slova pro popisy transakcí ve výkonnostních měřeních vyhledávání
+DESCRIPTION_WORDS = (
+    'nákup', 'potraviny', 'Albert', 'Lidl', 'Billa', 'káva', 'kavárna', 'oběd', 'večeře', 'restaurace', 'nájem',
+    'elektřina', 'plyn', 'internet', 'telefon', 'benzín', 'jízdenka', 'vlak', 'tramvaj', 'lékárna', 'léky',
+    'dárek', 'narozeniny', 'dovolená', 'hotel', 'letenka', 'pojištění', 'výplata', 'prémie', 'vrácení', 'převod',
+    'spoření', 'kino', 'divadlo', 'knihy', 'oblečení', 'boty', 'opravy', 'servis', 'pneumatiky', 'škola',
+    'kroužek', 'sport', 'posilovna', 'bazén', 'předplatné', 'hypotéka', 'úroky', 'poplatek', 'daně', 'zahrada',
+)
+
+
+def measure(func, repeat=5):
+    """
+    Spustí funkci opakovaně a vrátí (počet SQL dotazů při jednom běhu, nejlepší čas v ms, medián v ms).
+    """
+    timings = []
+    queries = 0
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        queries = len(context.captured_queries)
+    timings.sort()
+    return queries, timings[0], timings[len(timings) // 2]
+
+
+def format_row(label, queries, best, median):
+    """Naformátuje jeden řádek výsledku měření."""
+    return f'{label:<40} {queries:>8} dotazů {best:>10.1f} ms (nejlepší) {median:>10.1f} ms (medián)'
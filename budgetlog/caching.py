@@ -0,0 +1,218 @@
+"""
+Cache souhrnů a přehledů podle verze knihy.
+
+Každá kniha má v cache verzi (náhodnou hodnotu), která se nahradí novou při každém zápisu do jejích transakcí,
+kategorií nebo tagů (signály v budgetlog.signals a hromadné operace v rollups / TransactionQuerySet). Výsledky
+agregací se ukládají pod klíčem (kniha, verze, druh výsledku, normalizované parametry), takže se po změně dat nikdy
+nemažou ručně: staré záznamy se už jen nenačtou a časem vyprší.
+
+Používá se Django cache framework (alias BUDGETLOG_CACHE). Počty zásahů a minutí si každý proces drží v paměti; do
+sdílené cache (společně pro všechny workery) se zapisují jen se zapnutým BUDGETLOG_CACHE_STATS, protože každý zápis
+stojí u souborové cache víc než samotný zásah.
+"""
+
+# Standardní knihovny Pythonu
+import hashlib
+import json
+import uuid
+from collections import Counter
+from datetime import date
+from decimal import Decimal
+
+# Django importy
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, models, transaction as db_transaction
+
+# Klíče čítačů zásahů a minutí
+STATS_KEYS = ('hits', 'misses')
+
+# Počty zásahů a minutí v tomto procesu
+_local_stats = Counter()
+
+
+def get_cache():
+    return caches[getattr(settings, 'BUDGETLOG_CACHE', 'default')]
+
+
+def key_prefix():
+    """
+    Předpona klíčů odvozená od databáze, aby testovací databáze (nebo jiná kopie dat) nesdílela záznamy se
+    stejnými ID knih.
+    """
+    database = str(connection.settings_dict['NAME'])
+    return 'budgetlog:' + hashlib.sha256(database.encode('utf-8')).hexdigest()[:12]
+
+
+def version_key(book_id):
+    return f'{key_prefix()}:book:{book_id}:version'
+
+
+def new_version():
+    """
+    Nová, dosud nepoužitá hodnota verze. Verze se nezvyšuje pomocí cache.incr: u souborové cache je to načtení a
+    zápis, takže dva souběžné zápisy by mohly uložit stejnou hodnotu a jedno zneplatnění by se ztratilo.
+    """
+    return uuid.uuid4().hex
+
+
+def _get_version(key):
+    """
+    Vrátí verzi uloženou pod klíčem `key`. Chybějící verze (nový záznam, vypršení) se založí novou hodnotou, takže
+    se po její ztrátě nikdy znovu nepoužije některá ze starších verzí.
+    """
+    cache = get_cache()
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, new_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _replace_versions(keys):
+    """
+    Nahradí verze pod klíči `keys` novými hodnotami. Uvnitř databázové transakce se nahradí ještě jednou po
+    commitu, aby souběžný požadavek neuložil pod novou verzi data načtená před commitem.
+    """
+    if not keys:
+        return
+    get_cache().set_many({key: new_version() for key in keys}, timeout=None)
+    if not db_transaction.get_autocommit():
+        db_transaction.on_commit(lambda: get_cache().set_many({key: new_version() for key in keys}, timeout=None))
+
+
+def get_book_version(book_id):
+    """Vrátí aktuální verzi knihy."""
+    return _get_version(version_key(book_id))
+
+
+def bump_book_version(*book_ids):
+    """Zneplatní uložené výsledky knih změnou jejich verze."""
+    _replace_versions([version_key(book_id) for book_id in set(book_ids) if book_id is not None])
+
+
+def user_books_version_key(user_id):
+    return f'{key_prefix()}:user:{user_id}:books-version'
+
+
+def user_books_key(user_id):
+    """
+    Klíč seznamu knih uživatele (viz budgetlog.middleware). Obsahuje verzi seznamu, takže seznam načtený souběžným
+    požadavkem před zneplatněním se uloží pod klíč, který už se nikdy nepřečte. Nezávisí na verzích knih.
+    """
+    return f'{key_prefix()}:user:{user_id}:books:v{_get_version(user_books_version_key(user_id))}'
+
+
+def invalidate_user_books(*user_ids):
+    """Zneplatní uložený seznam knih uživatelů (po vytvoření, přejmenování nebo smazání knihy) změnou jeho verze."""
+    _replace_versions([user_books_version_key(user_id) for user_id in set(user_ids) if user_id is not None])
+
+
+def user_key(user_id):
+    """Klíč uloženého přihlášeného uživatele (viz budgetlog.middleware.CachedAuthenticationMiddleware)."""
+    return f'{key_prefix()}:user:{user_id}'
+
+
+def invalidate_user(*user_ids):
+    """
+    Smaže uloženého uživatele i seznam jeho knih, takže se změna hesla, deaktivace nebo smazání účtu projeví hned
+    při dalším požadavku. Uvnitř databázové transakce se klíče smažou ještě jednou po commitu.
+    """
+    keys = [user_key(user_id) for user_id in set(user_ids) if user_id is not None]
+    if not keys:
+        return
+    get_cache().delete_many(keys)
+    if not db_transaction.get_autocommit():
+        db_transaction.on_commit(lambda: get_cache().delete_many(keys))
+    invalidate_user_books(*user_ids)
+
+
+def _normalize(value):
+    """Převede hodnotu parametru (modely, querysety, data, částky) na stabilní JSON reprezentaci."""
+    if isinstance(value, models.Model):
+        return value.pk
+    if isinstance(value, (models.QuerySet, list, tuple, set)):
+        return sorted(_normalize(item) for item in value)
+    if isinstance(value, Decimal):
+        return format(value.normalize(), 'f')  # 150 a 150.00 jsou tentýž filtr
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def normalize_params(params):
+    """
+    Normalizuje parametry (např. cleaned_data filtru) na řetězec nezávislý na pořadí; prázdné hodnoty se
+    vynechají, takže "bez filtru" a "prázdný filtr" sdílí jeden záznam.
+    """
+    normalized = {name: _normalize(value) for name, value in params.items()
+                  if value not in (None, '', [], ()) and not (isinstance(value, models.QuerySet) and not value)}
+    return json.dumps(normalized, sort_keys=True, separators=(',', ':'), default=str)
+
+
+def cache_key(book_id, kind, params=None):
+    digest = hashlib.sha256(normalize_params(params or {}).encode('utf-8')).hexdigest()[:32]
+    return f'{key_prefix()}:book:{book_id}:v{get_book_version(book_id)}:{kind}:{digest}'
+
+
+def get_or_compute(book, kind, params, compute):
+    """
+    Vrátí výsledek z cache, nebo ho spočítá funkcí `compute` a uloží.
+
+    :param book: Kniha (nebo její ID), ke které výsledek patří.
+    :param kind: Druh výsledku, např. 'transaction-aggregates'.
+    :param params: Slovník parametrů, na kterých výsledek závisí.
+    :param compute: Funkce bez argumentů, která výsledek spočítá.
+    """
+    book_id = book.pk if isinstance(book, models.Model) else book
+    cache = get_cache()
+    key = cache_key(book_id, kind, params)
+    sentinel = object()
+    value = cache.get(key, sentinel)
+    if value is not sentinel:
+        _count('hits')
+        return value
+    _count('misses')
+    value = compute()
+    cache.set(key, value, getattr(settings, 'BUDGETLOG_CACHE_TIMEOUT', 3600))
+    return value
+
+
+def shared_stats_enabled():
+    """Počty zásahů a minutí se sčítají i ve sdílené cache (nastavení BUDGETLOG_CACHE_STATS)."""
+    return getattr(settings, 'BUDGETLOG_CACHE_STATS', False)
+
+
+def _count(name):
+    _local_stats[name] += 1
+    if not shared_stats_enabled():
+        return
+    # Přesné počty ze souběžných workerů jen s atomickým incr (Redis, Memcached); u souborové cache je to odhad
+    cache = get_cache()
+    key = f'budgetlog:stats:{name}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def stats():
+    """
+    Vrátí {'hits': …, 'misses': …, 'hit_ratio': …} od posledního vynulování: se zapnutým BUDGETLOG_CACHE_STATS za
+    všechny workery, jinak jen za tento proces.
+    """
+    if shared_stats_enabled():
+        values = get_cache().get_many([f'budgetlog:stats:{name}' for name in STATS_KEYS])
+        result = {name: values.get(f'budgetlog:stats:{name}', 0) for name in STATS_KEYS}
+    else:
+        result = {name: _local_stats[name] for name in STATS_KEYS}
+    total = result['hits'] + result['misses']
+    result['hit_ratio'] = result['hits'] / total if total else 0.0
+    return result
+
+
+def reset_stats():
+    _local_stats.clear()
+    if shared_stats_enabled():
+        get_cache().delete_many([f'budgetlog:stats:{name}' for name in STATS_KEYS])
@@ -0,0 +1,291 @@
+"""
+Vykreslování grafů a jejich obsahově adresovaná cache.
+
+Graf je identifikován hashem svých vstupů (data, popisky, barvy, velikost). Vykreslené PNG se drží v omezené LRU
+cache v paměti procesu a zároveň na disku pod MEDIA_ROOT/charts, takže ho sdílí všechny workery a stejný graf
+se nikdy nevykresluje dvakrát. Disková cache je omezená velikostí (CHART_DISK_CACHE_BYTES, nejdéle nepoužité
+soubory se mažou) a není nutná: když do ní nejde zapisovat, zadání grafu zůstane v paměti workeru a graf se
+vykreslí bez uložení na disk.
+"""
+
+# Standardní knihovny Pythonu
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+# Django importy
+from django.conf import settings
+
+# Velikost koláčového grafu v palcích (matplotlib figsize)
+PIE_CHART_SIZE = (6, 6)
+# Jak dlouho (v sekundách) čekat na vykreslení grafu jiným workerem; starší zámek po něm zůstal a smaže se
+CHART_LOCK_TIMEOUT = 10
+
+logger = logging.getLogger(__name__)
+
+
+class LRUBytesCache:
+    """Vláknově bezpečná LRU cache bajtů omezená celkovou velikostí uložených hodnot."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                self._size -= len(self._items.pop(key))
+            self._items[key] = value
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+
+
+memory_cache = LRUBytesCache(getattr(settings, 'CHART_MEMORY_CACHE_BYTES', 8 * 1024 * 1024))
+# Zadání grafů zaregistrovaných tímto workerem (JSON); záloha, když se zadání nepodaří uložit na disk
+spec_cache = LRUBytesCache(getattr(settings, 'CHART_SPEC_CACHE_BYTES', 1024 * 1024))
+
+
+def chart_cache_dir():
+    """Adresář diskové cache grafů (vytvoří se při prvním zápisu)."""
+    return Path(settings.MEDIA_ROOT) / 'charts'
+
+
+def pie_chart_key(data, labels, colors, size=PIE_CHART_SIZE):
+    """Vrátí hash vstupů koláčového grafu, který slouží jako jeho identifikátor i ETag."""
+    spec = json.dumps([list(data), list(labels), list(colors), list(size)], ensure_ascii=False,
+                      separators=(',', ':'))
+    return hashlib.sha256(spec.encode('utf-8')).hexdigest()
+
+
+def _write_atomic(path, content):
+    """Zapíše soubor přes dočasný soubor a přejmenování, aby souběžné workery nikdy nečetly rozepsaná data."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def prune_disk_cache(max_bytes=None):
+    """
+    Omezí diskovou cache grafů na `max_bytes` (výchozí CHART_DISK_CACHE_BYTES): smaže nejdéle nepoužité soubory
+    (podle času změny, který čtení PNG z disku obnovuje), dokud se zbytek nevejde do limitu. Volá se po každém
+    novém souboru, tedy jen při registraci nového grafu nebo jeho prvním vykreslení. Smaže také zámky, které
+    zůstaly po nedokončeném vykreslování (starší než CHART_LOCK_TIMEOUT).
+
+    :return: Počet smazaných souborů.
+    """
+    if max_bytes is None:
+        max_bytes = getattr(settings, 'CHART_DISK_CACHE_BYTES', 64 * 1024 * 1024)
+    entries = []
+    total = 0
+    removed = 0
+    try:
+        with os.scandir(chart_cache_dir()) as directory:
+            for entry in directory:
+                if entry.name.endswith(('.png', '.json')) and entry.is_file():
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+                # Zámky patří právě běžícímu vykreslování, smažou se jen ty, které po workeru zůstaly
+                elif entry.name.endswith('.lock') and _remove_stale_lock(Path(entry.path)):
+                    removed += 1
+    except FileNotFoundError:
+        return removed
+
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.unlink(path)
+            removed += 1
+        except FileNotFoundError:
+            pass  # Soubor mezitím smazal jiný worker
+        total -= size
+    return removed
+
+
+def register_pie_chart(data, labels, colors, size=PIE_CHART_SIZE):
+    """
+    Zaregistruje koláčový graf a vrátí jeho klíč. Graf se nevykresluje, uloží se jen jeho zadání (na disk a do
+    paměti workeru), ze kterého ho endpoint vykreslí při prvním požadavku.
+    """
+    key = pie_chart_key(data, labels, colors, size)
+    spec = {'data': list(data), 'labels': list(labels), 'colors': list(colors), 'size': list(size)}
+    spec_json = json.dumps(spec, ensure_ascii=False).encode('utf-8')
+    spec_cache.set(key, spec_json)
+    directory = chart_cache_dir()
+    try:
+        if not (directory / f'{key}.png').exists() and not (directory / f'{key}.json').exists():
+            _write_atomic(directory / f'{key}.json', spec_json)
+            prune_disk_cache()
+    except OSError:
+        # Bez diskové cache stránka funguje dál, graf vykreslí worker ze zadání v paměti
+        logger.warning("Zadání grafu %s nelze uložit do %s", key, directory, exc_info=True)
+    return key
+
+
+def _load_spec(directory, key):
+    """Načte zadání grafu z disku, nebo z paměti workeru; None, pokud graf není známý."""
+    try:
+        return json.loads((directory / f'{key}.json').read_text(encoding='utf-8'))
+    except OSError:
+        spec_json = spec_cache.get(key)
+        return None if spec_json is None else json.loads(spec_json)
+
+
+def get_chart_png(key):
+    """
+    Vrátí PNG grafu podle klíče: z paměti, z disku, nebo ho vykreslí ze zadání uloženého na disku.
+
+    :return: Bajty PNG, nebo None, pokud graf s tímto klíčem není známý.
+    """
+    png = memory_cache.get(key)
+    if png is not None:
+        return png
+
+    directory = chart_cache_dir()
+    png_path = directory / f'{key}.png'
+    try:
+        png = png_path.read_bytes()
+        os.utime(png_path)  # Čas použití pro prune_disk_cache
+    except OSError:
+        spec = _load_spec(directory, key)
+        if spec is None:
+            return None
+        png = _render_once(png_path, spec)
+
+    memory_cache.set(key, png)
+    return png
+
+
+def _remove_stale_lock(lock_path, max_age=None):
+    """
+    Smaže zámek starší než `max_age` sekund (výchozí CHART_LOCK_TIMEOUT), který zůstal po workeru, jenž nedokončil
+    vykreslení. Vrací True, pokud byl zámek smazán.
+    """
+    if max_age is None:
+        max_age = CHART_LOCK_TIMEOUT
+    try:
+        if time.time() - lock_path.stat().st_mtime < max_age:
+            return False
+        os.unlink(lock_path)
+    except FileNotFoundError:
+        return False  # Vykreslování mezitím skončilo, nebo zámek smazal jiný worker
+    return True
+
+
+def _render_once(png_path, spec, wait_seconds=CHART_LOCK_TIMEOUT):
+    """
+    Vykreslí graf ze zadání a uloží ho na disk. Zámkový soubor zajistí, že když o stejný graf požádá více
+    workerů současně, vykreslí ho jen jeden a ostatní počkají na jeho výsledek. Zámek starší než `wait_seconds`
+    zůstal po workeru, který vykreslení nedokončil, a smaže se. Pokud disková cache není dostupná, graf se jen
+    vykreslí.
+    """
+    lock_path = png_path.with_suffix('.lock')
+    lock_fd = None
+    try:
+        png_path.parent.mkdir(parents=True, exist_ok=True)
+        deadline = time.monotonic() + wait_seconds
+        while lock_fd is None:
+            try:
+                lock_fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if png_path.exists():
+                    return png_path.read_bytes()
+                if _remove_stale_lock(lock_path, wait_seconds):
+                    continue
+                if time.monotonic() >= deadline:
+                    break  # Jiný worker kreslí příliš dlouho – graf vykreslíme sami bez zámku
+                time.sleep(0.05)
+    except OSError:
+        logger.warning("Graf %s nelze uložit do %s", png_path.stem, png_path.parent, exc_info=True)
+        return generate_pie_chart(spec['data'], spec['labels'], spec['colors'], size=tuple(spec['size']))
+
+    try:
+        png = generate_pie_chart(spec['data'], spec['labels'], spec['colors'], size=tuple(spec['size']))
+        try:
+            _write_atomic(png_path, png)
+            prune_disk_cache()
+        except OSError:
+            logger.warning("Graf %s nelze uložit do %s", png_path.stem, png_path.parent, exc_info=True)
+    finally:
+        if lock_fd is not None:
+            os.close(lock_fd)
+            os.unlink(lock_path)
+    return png
+
+
+def load_pyplot():
+    """
+    Načte matplotlib až při prvním vykreslení grafu. Import trvá stovky milisekund a zabírá desítky MB,
+    což by jinak platil každý worker už při startu.
+    """
+    import matplotlib
+    matplotlib.use('Agg')  # Nastavení non-GUI backendu
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def generate_pie_chart(data, labels, colors, title="Výdaje podle kategorií", size=PIE_CHART_SIZE):
+    """
+    Vytvoří koláčový graf na základě poskytnutých dat a vrátí jej jako PNG.
+
+    Args:
+        data (list): Seznam hodnot reprezentující jednotlivé části koláče.
+        labels (list): Seznam názvů odpovídajících jednotlivým částem.
+        colors (list): Seznam barev odpovídajících jednotlivým částem.
+        title (str): Název grafu.
+        size (tuple): Velikost grafu v palcích.
+
+    Returns:
+        bytes: Obrázek grafu ve formátu PNG.
+    """
+
+    plt = load_pyplot()
+
+    # Vytvoření grafu
+    fig, ax = plt.subplots(figsize=size)
+    total = sum(data)
+    explode = [0.2 if (value / total) < 0.05 else 0 for value in data]
+    ax.pie(data, labels=labels, colors=colors, explode=explode, autopct=lambda pct: '' if pct < 5 else f'{pct:.1f}%', startangle=180)  # autopct=lambda p: f'{p:.1f}%\n({p*total/100:.2f})' pro zobrazení konkrétní hodnoty pod x.x%
+    # ax.set_title(title)
+    # ax.legend(loc='upper right', bbox_to_anchor=(1.3, 1))
+
+    # Uložení grafu do PNG
+    buf = io.BytesIO()  # Vytváří objekt paměťového bufferu pro uložení obrázku.
+    fig.savefig(buf, format="png")  # Uloží graf do bufferu ve formátu PNG.
+    plt.close(fig)  # Zavře graf, aby se uvolnila paměť.
+    png = buf.getvalue()
+    buf.close()  # Zavře buffer.
+
+    return png
@@ -0,0 +1,74 @@
+"""
+Streamovaný export transakcí do CSV.
+
+Soubor se nikdy nesestavuje celý v paměti: transakce se načítají po dávkách (kategorie, tagy a kniha
+předem načtené pro celou dávku), každá dávka se převede na CSV a hned odešle klientovi. Paměť tak zůstává
+stejná bez ohledu na počet exportovaných řádků.
+"""
+
+# Standardní knihovny Pythonu
+import csv
+import zlib
+
+# Záhlaví exportovaného souboru
+CSV_HEADER = ['ID', 'Datum', 'Kategorie', 'Částka', 'Tagy', 'Popis', 'Typ', 'Kniha']
+
+# BOM na začátku souboru, aby Excel správně zobrazil diakritiku
+CSV_BOM = '\ufeff'.encode('utf-8')
+
+
+class _LineBuffer:
+    """Pseudo-soubor pro csv.writer: místo zápisu vrací zapsaný řádek."""
+
+    def write(self, value):
+        return value
+
+
+def transaction_row(transaction):
+    """Převede transakci na řádek exportu."""
+    return [
+        transaction.id,
+        transaction.datestamp,
+        transaction.category.name if transaction.category else '',
+        transaction.signed_amount,
+        ', '.join([tag.name for tag in transaction.tags.all()]),
+        transaction.description,
+        transaction.type,
+        transaction.book,
+    ]
+
+
+def iter_transactions(queryset, chunk_size=2000):
+    """
+    Prochází transakce po dávkách. Pro každou dávku se jedním dotazem načtou tagy, kategorie a kniha
+    s majitelem jsou připojené JOINem.
+    """
+    queryset = queryset.for_display().select_related('book__owner').order_by('-datestamp', '-id')
+    return queryset.iterator(chunk_size=chunk_size)
+
+
+def csv_chunks(queryset, chunk_size=2000):
+    """
+    Generátor bajtových bloků CSV: nejprve BOM a záhlaví, poté jeden blok na každých `chunk_size` transakcí.
+    """
+    writer = csv.writer(_LineBuffer())
+    yield CSV_BOM + writer.writerow(CSV_HEADER).encode('utf-8')
+
+    lines = []
+    for transaction in iter_transactions(queryset, chunk_size):
+        lines.append(writer.writerow(transaction_row(transaction)))
+        if len(lines) >= chunk_size:
+            yield ''.join(lines).encode('utf-8')
+            lines = []
+    if lines:
+        yield ''.join(lines).encode('utf-8')
+
+
+def gzip_chunks(chunks, level=6):
+    """Průběžně komprimuje bajtové bloky do formátu gzip (pro Content-Encoding: gzip)."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -5,10 +5,34 @@ from django import forms
 import django_filters
 
 # Lokální aplikace
+from . import search
 from .forms import TransactionFilterForm, ColoredTagWidget
 from .models import Category, Transaction, Tag
 
 
+# Režimy filtru tagů (viz TransactionQuerySet.with_tags); výchozí je první
+TAG_MODE_CHOICES = (
+    ('all', 'všechny vybrané tagy'),
+    ('any', 'alespoň jeden z vybraných tagů'),
+    ('none', 'žádný z vybraných tagů'),
+)
+
+
+# Parametry stránkování seznamu transakcí; nejsou součástí filtru
+PAGINATION_PARAMS = ('page', 'cursor', 'pagination')
+
+
+def without_pagination(query):
+    """
+    Vrátí kopii query stringu seznamu transakcí (QueryDict) bez parametrů stránkování, tedy jen samotný filtr;
+    stejný filtr má na každé stránce stejný tvar.
+    """
+    query = query.copy()
+    for key in PAGINATION_PARAMS:
+        query.pop(key, None)
+    return query
+
+
 class TransactionFilter(django_filters.FilterSet):
     """Filtrovat transakce podle různých kritérií."""
 
@@ -42,18 +66,25 @@ class TransactionFilter(django_filters.FilterSet):
         label='Kategorie',
     )
 
-    # Tagy
+    # Tagy (jeden poddotaz nad propojovací tabulkou bez ohledu na počet vybraných tagů, viz filter_tags)
     tags = django_filters.ModelMultipleChoiceFilter(
         queryset=Tag.objects.all(),
         label='Tagy',
-        conjoined=True,  # Pokud `False`, filtruje transakce, které mají alespoň jeden ze zadaných tagů
+        method='filter_tags',
         widget=ColoredTagWidget  # Vlastní widget
     )
+    tag_mode = django_filters.ChoiceFilter(
+        choices=TAG_MODE_CHOICES,
+        empty_label=None,
+        method='filter_tag_mode',
+        label='Transakce mají',
+        widget=forms.RadioSelect,
+    )
 
-    # Popis transakce (fulltext)
+    # Popis transakce (fulltext, výsledky seřazené podle relevance)
     description = django_filters.CharFilter(
         field_name='description',
-        lookup_expr='icontains',
+        method='filter_description',
         label='Popis obsahuje',
     )
 
@@ -67,8 +98,21 @@ class TransactionFilter(django_filters.FilterSet):
             self.filters['category'].queryset = Category.objects.filter(book=book)
             self.filters['tags'].queryset = Tag.objects.filter(book=book)
 
+    def filter_tags(self, queryset, name, value):
+        """Vybrané tagy v režimu z pole tag_mode (všechny / alespoň jeden / žádný)."""
+        mode = self.form.cleaned_data.get('tag_mode') or TAG_MODE_CHOICES[0][0]
+        return queryset.with_tags(value, mode)
+
+    def filter_tag_mode(self, queryset, name, value):
+        """Režim se uplatní v filter_tags, samotný queryset nemění."""
+        return queryset
+
+    def filter_description(self, queryset, name, value):
+        """Hledá slova v popisu přes fulltextový index (prefixy, bez ohledu na diakritiku), viz budgetlog.search."""
+        return search.search_description(queryset, value)
+
     class Meta:
         model = Transaction
         form = TransactionFilterForm
         fields = ['amount_min', 'amount_max', 'type', 'datestamp__gte', 'datestamp__lte', 'category', 'tags',
-                  'description']
+                  'tag_mode', 'description']
@@ -2,7 +2,7 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm, PasswordChangeForm, SetPasswordForm
 from django.forms.widgets import CheckboxSelectMultiple
-from django.utils.safestring import mark_safe
+from django.utils.html import format_html
 from django.utils.translation import gettext_lazy
 
 # Lokální aplikace
@@ -12,21 +12,31 @@ from budgetlog.models import Transaction, Category, Tag, AppUser
 class ColoredTagWidget(CheckboxSelectMultiple):
     """Vlastní widget pro výběr tagů s barvami, kde jsou tagy zobrazeny vedle sebe."""
 
+    default_color = "#000000"  # Barva, pokud u volby není k dispozici tag
+
+    def optgroups(self, name, value, attrs=None):
+        # Barvy se načtou jednou za vykreslení a jen z querysetu tagů pole (tagy aktuální knihy)
+        self.tag_colors = self.get_tag_colors()
+        return super().optgroups(name, value, attrs)
+
+    def get_tag_colors(self):
+        """Vrátí {id tagu: barva} pro tagy nabízené v tomto widgetu."""
+        queryset = getattr(self.choices, 'queryset', None)
+        if queryset is None:
+            return {}
+        return dict(queryset.values_list('pk', 'color'))
+
     def create_option(self, name, value, label, selected, index, subindex=None, attrs=None):
         option = super().create_option(name, value, label, selected, index, subindex=subindex, attrs=attrs)
-        self.tag_colors = {tag.pk: tag.color for tag in Tag.objects.all()}  # Načtení všech tagů s barvou
 
-        # Načtení barvy tagu dynamicky podle ID
-        try:
-            tag_color = self.tag_colors.get(value, "#000000")
-        except Tag.DoesNotExist:
-            tag_color = "#000000"  # Defaultní barva, pokud tag není nalezen
+        # Barva tagu podle ID z mapy sestavené pro toto vykreslení
+        tag_color = getattr(self, 'tag_colors', {}).get(value, self.default_color)
 
         # Přidání stylu a labelu s barvou
         option['attrs']['style'] = 'flex: 1 1 auto; margin: 5px;'
-        option['label'] = mark_safe(
-            f'<span style="background-color: {tag_color}; color: white; padding: 2px 5px; '
-            f'border-radius: 5px; display: inline-block;">{label}</span>'
+        option['label'] = format_html(
+            '<span style="background-color: {}; color: white; padding: 2px 5px; '
+            'border-radius: 5px; display: inline-block;">{}</span>', tag_color, label
         )
         return option
 
@@ -78,7 +88,8 @@ class TransactionFilterForm(forms.Form):
 
     class Meta:
         model = Transaction
-        fields = ['amount_min', 'amount_max', 'type', 'datestamp__gte', 'datestamp__lte', 'category', 'tags', 'description']
+        fields = ['amount_min', 'amount_max', 'type', 'datestamp__gte', 'datestamp__lte', 'category', 'tags', 'tag_mode',
+                  'description']
         widgets = {
             'type': forms.Select(attrs={'class': 'form-select'}),
             'category': forms.Select(attrs={'class': 'form-select'}),
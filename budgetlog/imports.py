@@ -0,0 +1,583 @@
+"""
+Import transakcí z CSV souboru.
+
+Řádky se nejprve převedou a ověří, platné transakce se hromadí do dávek a každá dávka se zapíše najednou
+(bulk_create transakcí i vazeb na tagy) v jedné databázové transakci. Zámek databáze se tak drží jen po dobu
+zápisu jedné dávky, ne po celý import.
+"""
+
+# Standardní knihovny Pythonu
+import codecs
+import csv
+import io
+import logging
+import re
+from datetime import datetime
+from decimal import Decimal
+
+# Django importy
+from django.conf import settings
+from django.db import DatabaseError, transaction as db_transaction
+from django.utils import timezone
+
+# Třetí strany
+import chardet
+
+# Lokální aplikace
+from . import rollups
+from .models import Category, ImportJob, Tag, Transaction
+
+logger = logging.getLogger(__name__)
+
+# Mapování názvů sloupců (české i anglické verze)
+COLUMN_MAPPING = {
+    "částka": "amount",
+    "datum": "datestamp",
+    "typ": "type",
+    "kategorie": "category",
+    "tagy": "tags",
+    "popis": "description",
+
+    "amount": "amount",
+    "datestamp": "datestamp",
+    "type": "type",
+    "category": "category",
+    "tags": "tags",
+    "description": "description"
+}
+
+# Sloupce, které musí soubor obsahovat
+REQUIRED_COLUMNS = {"amount", "datestamp", "type", "category", "tags"}
+
+# Sloupce, jejichž hodnota nesmí být v řádku prázdná
+REQUIRED_FIELDS = ["amount", "datestamp", "type", "category"]
+
+MISSING_COLUMNS_ERROR = ("Transakce nenahrány! Soubor neobsahuje všechny požadované sloupce nebo hodnoty nejsou "
+                         "správně odděleny. Zkontrolujte, zda jsou názvy sloupců správné, oddělovač hodnot je "
+                         "středník (;), uložte soubor ve formátu UTF-8 a opět jej nahrajte.")
+
+
+class ImportFileError(Exception):
+    """Soubor nelze importovat jako celek (kódování, chybějící sloupce); zpráva je určena uživateli."""
+
+
+class TransactionImporter:
+    """
+    Importuje transakce z CSV souboru do knihy po dávkách.
+
+    Výsledek importu je slovník {"added": počet přidaných transakcí, "skipped": [popisy vynechaných řádků]},
+    případně {"error": zpráva}, pokud soubor nelze zpracovat vůbec.
+    """
+
+    def __init__(self, book, create_missing=False, batch_size=None, progress=None):
+        """
+        :param book: Instance knihy, do které se mají transakce přidat.
+        :param create_missing: Bool indikující, zda se mají vytvořit chybějící tagy/kategorie.
+        :param batch_size: Počet transakcí zapsaných v jedné databázové transakci (výchozí IMPORT_BATCH_SIZE).
+        :param progress: Volitelná funkce volaná po každé zapsané dávce s argumenty (zpracováno, přidáno,
+            vynecháno); slouží k hlášení průběhu importů na pozadí.
+        """
+        self.book = book
+        self.create_missing = create_missing
+        self.batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+        self.progress = progress
+        self.processed = 0
+        self.added = 0
+        self.skipped = []
+
+        # Načtení všech kategorií a tagů pro knihu, abychom minimalizovali dotazy do DB
+        self.existing_categories = {c.name.capitalize(): c for c in book.categories.all()}
+        self.existing_tags = {t.name.capitalize(): t for t in book.tag_set.all()}
+
+    def run(self, file, delimiter=";"):
+        """
+        Zpracuje nahraný CSV soubor a přidá platné transakce do knihy.
+
+        :param file: CSV soubor s daty transakcí.
+        :param delimiter: Oddělovač sloupců.
+        :return: Slovník s informacemi o úspěšně přidaných a vynechaných transakcích.
+        """
+        try:
+            rows = self.read_rows(file, delimiter)
+        except ImportFileError as e:
+            return {"error": str(e)}
+
+        batch = []
+        try:
+            for parsed in self.parse_rows(rows):
+                batch.append(parsed)
+                if len(batch) >= self.batch_size:
+                    self.write_batch(batch)
+                    self.report_progress()
+                    batch = []
+        except UnicodeDecodeError:
+            # Soubor se dekóduje průběžně, chyba se tak může objevit až uprostřed; dosud přečtené řádky se uloží
+            error = (f"Nepodařilo se dekódovat soubor v kódování {self.encoding}, import byl přerušen po "
+                     f"{self.processed} řádcích. Zkuste soubor uložit v UTF-8.")
+        except ImportFileError as e:
+            error = str(e)
+        else:
+            error = None
+        if batch:
+            self.write_batch(batch)
+        self.report_progress()
+
+        result = {"added": self.added, "skipped": self.skipped}
+        if error:
+            result["error"] = error
+        return result
+
+    def report_progress(self):
+        """Předá aktuální počty funkci `progress`, pokud byla zadána."""
+        if self.progress:
+            self.progress(self.processed, self.added, len(self.skipped))
+
+    def detect_encoding(self, file):
+        """
+        Určí kódování souboru a uloží ho do `self.encoding`.
+
+        :raises ImportFileError: Pokud kódování nelze spolehlivě určit.
+        """
+        self.encoding = detect_encoding(file)  # Nejprve zkusíme detekci
+        if not self.encoding:
+            raise ImportFileError("Nepodařilo se určit kódování souboru. Zkuste soubor uložit v UTF-8.")
+        if self.encoding.lower() == 'ascii':
+            # Detekce vidí jen začátek souboru; diakritika se může objevit až dál, UTF-8 je nadmnožinou ASCII
+            self.encoding = 'utf-8'
+        return self.encoding
+
+    def read_rows(self, file, delimiter):
+        """
+        Ověří kódování a sloupce souboru a vrátí iterátor řádků (slovníků podle záhlaví souboru).
+
+        Soubor se čte a dekóduje průběžně po blocích (viz `iter_lines`), v paměti je vždy jen jeden blok.
+
+        :raises ImportFileError: Pokud nelze určit kódování, přečíst záhlaví nebo v něm chybí požadované sloupce.
+        """
+        self.detect_encoding(file)
+        try:
+            lines = iter_lines(file, self.encoding)
+            reader = csv.DictReader(lines, delimiter=delimiter)  # Použití vybraného oddělovače
+            fieldnames = reader.fieldnames  # Přečte záhlaví
+        except (UnicodeDecodeError, LookupError):
+            raise ImportFileError(f"Nepodařilo se dekódovat soubor v kódování {self.encoding}. "
+                                  f"Zkuste soubor uložit v UTF-8.")
+
+        self.normalized_fieldnames = normalize_fieldnames(fieldnames)
+        return reader
+
+    def parse_rows(self, rows):
+        """Převede řádky z `read_rows` a vrací jen platné transakce (viz `parse_row`)."""
+        for row in rows:
+            self.processed += 1
+            parsed = self.parse_row(row)
+            if parsed is not None:
+                yield parsed
+
+    def parse_row(self, row):
+        """
+        Převede a ověří jeden řádek. Neplatný řádek zapíše do `skipped` a vrátí None.
+
+        :return: Trojice (neuložená transakce, seznam tagů, řádek), nebo None.
+        """
+        try:
+            # Převod klíčů v řádku podle normalizovaných názvů
+            row = {self.normalized_fieldnames[k.lower().strip()]: v for k, v in row.items() if
+                   k.lower().strip() in self.normalized_fieldnames}
+
+            # Ověření, že všechny požadované hodnoty nejsou prázdné
+            missing_fields = [field for field in REQUIRED_FIELDS if not row.get(field)]
+            if missing_fields:
+                self.skipped.append(f"Řádek přeskočen – chybějící hodnoty: {', '.join(missing_fields)} na řádku: {row}")
+                return None
+
+            # Převod částky na správný formát
+            try:
+                amount = parse_amount(row["amount"])
+            except ValueError as e:
+                self.skipped.append(f"Chybný formát částky v řádku: {row}, Chyba: {str(e)}")
+                return None
+
+            # Ověření a převod formátu datumu
+            try:
+                datestamp = parse_date(row["datestamp"])
+            except ValueError as e:
+                self.skipped.append(f"Chybný formát data transakce v řádku: {row}, Chyba: {str(e)}")
+                return None
+
+            transaction_type = row['type'].lower()
+
+            # Ověření správnosti typu transakce
+            if transaction_type not in ['income', 'expense']:
+                self.skipped.append(f"Neplatný typ transakce v řádku: {row} (typ musí být 'income' nebo 'expense').")
+                return None
+
+            category = self.get_category(row['category'].strip().capitalize())
+            if category is None:
+                return None
+
+            tags = self.get_tags([tag.strip().capitalize() for tag in row['tags'].split(',') if tag.strip()])
+
+            description = row['description'].capitalize()
+
+            transaction = Transaction(
+                book=self.book,
+                amount=amount,
+                datestamp=datestamp,
+                category=category,
+                type=transaction_type,
+                description=description,
+            )
+            return transaction, tags, row
+
+        except Exception as e:
+            self.skipped.append(f"Chyba v řádku: {row}, Chyba: {str(e)}")
+            return None
+
+    def get_category(self, category_name):
+        """Vrátí kategorii podle názvu, případně ji vytvoří; chybějící kategorii zapíše do `skipped`."""
+        category = self.existing_categories.get(category_name)
+        if not category:
+            if self.create_missing:
+                category = Category.objects.create(name=category_name, book=self.book, color='#000000')
+                self.existing_categories[category_name] = category
+            else:
+                self.skipped.append(f"Chybějící kategorie: {category_name}")
+        return category
+
+    def get_tags(self, tag_names):
+        """Vrátí tagy podle názvů, případně je vytvoří; chybějící tagy se zapíší do `skipped` a vynechají."""
+        tags = []
+        for tag_name in tag_names:
+            tag = self.existing_tags.get(tag_name)
+            if not tag:
+                if self.create_missing:
+                    tag = Tag.objects.create(name=tag_name, book=self.book, color='#000000')
+                    self.existing_tags[tag_name] = tag
+                else:
+                    self.skipped.append(f"Chybějící tag: {tag_name}")
+                    continue
+            tags.append(tag)
+        return tags
+
+    def write_batch(self, batch):
+        """
+        Zapíše dávku transakcí, jejich vazby na tagy a měsíční souhrny v jedné databázové transakci.
+
+        Pokud databáze odmítne dávku jako celek, zapíší se její řádky jednotlivě, aby se vadné řádky
+        vynechaly a ohlásily stejně jako při validaci.
+        """
+        try:
+            with db_transaction.atomic():
+                created = self.create_transactions(batch)
+        except DatabaseError:
+            created = []
+            for item in batch:
+                try:
+                    with db_transaction.atomic():
+                        created += self.create_transactions([item])
+                except DatabaseError as e:
+                    self.skipped.append(f"Chyba v řádku: {item[2]}, Chyba: {str(e)}")
+        self.added += len(created)
+        return created
+
+    def create_transactions(self, batch):
+        """Vloží transakce a jejich tagy hromadně a započítá je do měsíčních souhrnů."""
+        created = Transaction.objects.bulk_create([transaction for transaction, _, _ in batch])
+        through = Transaction.tags.through
+        through.objects.bulk_create([
+            through(transaction_id=transaction.id, tag_id=tag_id)
+            for transaction, tags, _ in batch
+            for tag_id in dict.fromkeys(tag.id for tag in tags)
+        ])
+        rollups.add_instances(created)
+        return created
+
+
+class PandasTransactionImporter(TransactionImporter):
+    """
+    Import, který převádí hodnoty po celých sloupcích pomocí pandas místo po jednotlivých buňkách.
+
+    Soubor se čte stejně jako v řádkovém importu (průběžně dekódovaný, csv.reader) a po blocích řádků se skládá
+    do DataFrame. V každém bloku se částky, obě podoby data a typy převedou a ověří najednou. Řádky, které
+    sloupcovou kontrolou neprojdou, se předají řádkovému `parse_row`, takže hlášení o vynechaných řádcích je
+    stejné jako u řádkového importu.
+    """
+
+    # Počet řádků souboru složených do jednoho DataFrame
+    chunk_rows = 10_000
+
+    # Částka po odstranění nežádoucích znaků, kterou přijme Decimal (bez nejednoznačné kombinace čárky a tečky)
+    AMOUNT_PATTERN = r'-?(?:\d+\.?\d*|\.\d+)'
+
+    def read_rows(self, file, delimiter):
+        """
+        Ověří kódování a sloupce souboru a vrátí iterátor bloků řádků (seznamů hodnot).
+
+        :raises ImportFileError: Pokud nelze určit kódování, přečíst záhlaví nebo v něm chybí požadované sloupce.
+        """
+        self.detect_encoding(file)
+        try:
+            reader = csv.reader(iter_lines(file, self.encoding), delimiter=delimiter)
+            self.fieldnames = next(reader, None)  # Záhlaví
+        except (UnicodeDecodeError, LookupError):
+            raise ImportFileError(f"Nepodařilo se dekódovat soubor v kódování {self.encoding}. "
+                                  f"Zkuste soubor uložit v UTF-8.")
+        self.normalized_fieldnames = normalize_fieldnames(self.fieldnames)
+        return self.iter_chunks(reader)
+
+    def iter_chunks(self, reader):
+        """Seskupí řádky souboru do bloků po `chunk_rows`; prázdné řádky vynechá stejně jako csv.DictReader."""
+        chunk = []
+        for row in reader:
+            if row:
+                chunk.append(row)
+                if len(chunk) >= self.chunk_rows:
+                    yield chunk
+                    chunk = []
+        if chunk:
+            yield chunk
+
+    def parse_rows(self, chunks):
+        """Převede bloky souboru sloupcově a vrací platné transakce ve stejném pořadí jako řádkový import."""
+        for chunk in chunks:
+            yield from self.parse_chunk(chunk)
+
+    def as_dict_row(self, row):
+        """Vrátí řádek ve stejné podobě, jakou by vrátil csv.DictReader (chybějící hodnoty None, přebytečné pod None)."""
+        values = dict(zip(self.fieldnames, row))
+        if len(row) > len(self.fieldnames):
+            values[None] = row[len(self.fieldnames):]
+        for name in self.fieldnames[len(row):]:
+            values[name] = None
+        return values
+
+    def parse_chunk(self, rows):
+        """Sloupcově převede a ověří jeden blok řádků souboru."""
+        # pandas se načítá až při použití, import knihovny by jinak zpomalil start každého workeru
+        import pandas as pd
+
+        width = len(self.fieldnames)
+        frame = pd.DataFrame(rows)  # Kratší řádky pandas doplní hodnotou None
+        for position in range(frame.shape[1], width):
+            frame[position] = None
+
+        # Řádky s chybějícími nebo přebytečnými hodnotami zpracuje řádkový import, aby hlášení sedělo
+        clean = frame.iloc[:, :width].notna().all(axis=1)
+        if frame.shape[1] > width:
+            clean &= frame.iloc[:, width:].isna().all(axis=1)
+
+        names = [self.normalized_fieldnames[name.lower().strip()] for name in self.fieldnames]
+        columns = {}
+        for position, name in enumerate(names):
+            columns[name] = frame[position]  # Při opakovaném názvu platí poslední sloupec, jako v csv.DictReader
+        if 'description' not in columns:
+            clean &= False  # Řádkový import takové řádky vynechá s chybou, projdou tedy přes parse_row
+            columns['description'] = pd.Series('', index=frame.index)
+        for field in REQUIRED_FIELDS:
+            clean &= columns[field].fillna('').ne('')
+
+        # Částky: stejné čištění jako parse_amount, ale pro celý sloupec najednou
+        amounts = columns['amount'].fillna('').str.strip().str.replace(r'[^\d,.-]', '', regex=True)
+        clean &= ~(amounts.str.contains(',', regex=False) & amounts.str.contains('.', regex=False))
+        amounts = amounts.str.replace(',', '.', regex=False)
+        clean &= amounts.str.fullmatch(self.AMOUNT_PATTERN)
+
+        # Data: oba podporované formáty; hodnoty mimo rozsah pandas (a jiné odchylky) dořeší parse_row
+        dates = pd.to_datetime(columns['datestamp'], format='%Y-%m-%d', errors='coerce')
+        dates = dates.fillna(pd.to_datetime(columns['datestamp'], format='%d.%m.%Y', errors='coerce'))
+        clean &= dates.notna()
+
+        types = columns['type'].fillna('').str.lower()
+        clean &= types.isin(['income', 'expense'])
+
+        category_names = columns['category'].fillna('').str.strip().str.capitalize()
+        tag_names = columns['tags'].fillna('').str.split(',')
+        descriptions = columns['description'].fillna('').str.capitalize()
+
+        for values in zip(clean, amounts, dates, types, category_names, tag_names, descriptions, rows):
+            is_clean, amount_str, day, transaction_type, category_name, row_tags, description, row = values
+            self.processed += 1
+            if not is_clean:
+                parsed = self.parse_row(self.as_dict_row(row))
+                if parsed is not None:
+                    yield parsed
+                continue
+
+            category = self.get_category(category_name)
+            if category is None:
+                continue
+            tags = self.get_tags([name.strip().capitalize() for name in row_tags if name.strip()])
+            transaction = Transaction(
+                book=self.book,
+                amount=Decimal(amount_str),
+                datestamp=day.date(),
+                category=category,
+                type=transaction_type,
+                description=description,
+            )
+            yield transaction, tags, dict(zip(names, row))
+
+
+# Dostupné implementace importu; výchozí určuje nastavení IMPORT_ENGINE
+IMPORT_ENGINES = {
+    'rows': TransactionImporter,
+    'pandas': PandasTransactionImporter,
+}
+
+
+def get_importer(book, create_missing=False, engine=None, **kwargs):
+    """
+    Vytvoří importér zvolené implementace.
+
+    :param engine: Klíč z IMPORT_ENGINES; výchozí je nastavení IMPORT_ENGINE.
+    :raises ValueError: Pokud implementace neexistuje.
+    """
+    engine = engine or settings.IMPORT_ENGINE
+    try:
+        importer_class = IMPORT_ENGINES[engine]
+    except KeyError:
+        raise ValueError(f"Neznámá implementace importu: {engine}")
+    return importer_class(book, create_missing, **kwargs)
+
+
+def claim_next_job():
+    """
+    Převezme nejstarší čekající import a označí ho jako zpracovávaný.
+
+    Převzetí je podmíněný UPDATE (status='pending' → 'running'), takže stejnou úlohu nezíská více workerů.
+
+    :return: Převzatý ImportJob, nebo None, pokud žádný import nečeká.
+    """
+    pending = ImportJob.objects.filter(status=ImportJob.STATUS_PENDING).order_by('created_at', 'id')
+    for job_id in pending.values_list('id', flat=True)[:10]:
+        claimed = ImportJob.objects.filter(id=job_id, status=ImportJob.STATUS_PENDING).update(
+            status=ImportJob.STATUS_RUNNING, started_at=timezone.now())
+        if claimed:
+            return ImportJob.objects.select_related('book').get(id=job_id)
+    return None
+
+
+def process_job(job):
+    """
+    Zpracuje převzatý import, průběžně ukládá jeho postup a nakonec zapíše výsledek a smaže nahraný soubor.
+
+    :param job: ImportJob ve stavu 'running'.
+    """
+    jobs = ImportJob.objects.filter(id=job.id)
+
+    def save_progress(processed, added, skipped_count):
+        jobs.update(processed=processed, added=added, skipped_count=skipped_count)
+
+    importer = get_importer(job.book, job.create_missing, progress=save_progress)
+    try:
+        with job.file.open('rb') as file:
+            result = importer.run(file)
+    except Exception as e:
+        logger.exception("Import #%s selhal", job.id)
+        result = {"error": f"Import selhal: {e}"}
+
+    job.processed, job.added = importer.processed, importer.added
+    job.skipped, job.skipped_count = importer.skipped, len(importer.skipped)
+    job.error = result.get("error", "")
+    job.status = ImportJob.STATUS_FAILED if job.error else ImportJob.STATUS_DONE
+    job.finished_at = timezone.now()
+    if job.file:
+        job.file.delete(save=False)
+    job.save()
+    return job
+
+
+def normalize_fieldnames(fieldnames):
+    """
+    Vrátí {normalizovaný název sloupce: interní název} a ověří, že soubor obsahuje všechny požadované sloupce.
+
+    :raises ImportFileError: Pokud některý požadovaný sloupec chybí.
+    """
+    normalized = {col.lower().strip(): COLUMN_MAPPING.get(col.lower().strip()) for col in fieldnames or []}
+    if not REQUIRED_COLUMNS.issubset(set(normalized.values())):
+        raise ImportFileError(MISSING_COLUMNS_ERROR)
+    return normalized
+
+
+def iter_lines(file, encoding, chunk_size=64 * 1024):
+    """
+    Čte binární soubor po blocích, průběžně je dekóduje a vrací jednotlivé řádky včetně konců řádků.
+
+    Inkrementální dekodér správně naváže vícebajtové znaky rozdělené mezi bloky a rozpracovaný řádek se přenáší
+    do dalšího bloku, takže paměť odpovídá velikosti bloku, ne velikosti souboru. BOM na začátku se odstraní.
+
+    :raises LookupError: Pokud kódování neexistuje.
+    :raises UnicodeDecodeError: Pokud soubor v daném kódování nelze dekódovat.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    file.seek(0)  # Reset ukazatele souboru
+    pending = ''
+    at_start = True
+    while True:
+        chunk = file.read(chunk_size)
+        text = pending + decoder.decode(chunk, final=not chunk)
+        if at_start and text:
+            # Odstranění BOM (pokud existuje)
+            text = text.lstrip("\ufeff")
+            at_start = False
+
+        # StringIO s newline='' rozdělí řádky podle \n, \r\n i \r a konce řádků zachová (jak vyžaduje csv)
+        lines = io.StringIO(text, newline='').readlines()
+        # Nedokončený řádek (i řádek končící \r, za kterým může v dalším bloku následovat \n) čeká na další blok
+        pending = lines.pop() if chunk and lines and not lines[-1].endswith('\n') else ''
+        yield from lines
+        if not chunk:
+            return
+
+
+#Pomocné funkce pro kódování a parsování hodnot v CSV souboru
+def detect_encoding(file):
+    """
+    Detekuje kódování souboru na základě prvních několika tisíc bajtů.
+
+    :param file: CSV soubor s daty transakcí.
+    """
+    file.seek(0)
+    raw_data = file.read(4096)  # Přečte první blok dat
+    file.seek(0)  # Vrátí ukazatel na začátek souboru
+    result = chardet.detect(raw_data)  # Odhadne kódování
+    return result['encoding'] if result['confidence'] > 0.5 else None  # Pouze pokud je detekce spolehlivá
+
+
+def parse_amount(amount_str):
+    """
+    Převádí zadanou částku na formát s desetinnou tečkou.
+    - Podporuje desetinnou čárku i desetinnou tečku.
+    - Odstraní mezery nebo jiné než číselné znaky kromě čísel, tečky a čárky.
+    """
+    amount_str = amount_str.strip()  # Odstranění mezer na začátku a konci
+    amount_str = re.sub(r"[^\d,.-]", "", amount_str)  # Odstranění nežádoucích znaků (kromě číslic, čárky, tečky, mínusu)
+
+    # Pokud je v čísle čárka i tečka, ignorujeme formát a vyhodíme chybu
+    if "," in amount_str and "." in amount_str:
+        raise ValueError(f"Nejednoznačný formát čísla: {amount_str}")
+
+    # Pokud obsahuje čárku (ale ne tečku), nahradíme ji tečkou
+    """
+    if "," in amount_str:
+        amount_str = amount_str.replace(",", ".")
+    """
+    amount_str = amount_str.replace(",", ".")
+
+    return Decimal(amount_str)
+
+
+def parse_date(date_str):
+    """
+    Pokusí se rozpoznat a převést datum na standardní formát YYYY-MM-DD.
+    Podporované formáty:
+    - 'YYYY-MM-DD'
+    - 'DD.MM.YYYY'
+    """
+    for fmt in ("%Y-%m-%d", "%d.%m.%Y"):
+        try:
+            return datetime.strptime(date_str, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Neznámý formát data: {date_str}")
@@ -0,0 +1,78 @@
+from datetime import timedelta
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+
+from budgetlog.benchmarks import synthetic_book, measure, format_row
+from budgetlog.models import Category, MonthlyCategoryRollup, Tag, Transaction
+from budgetlog.reports import BookAnalytics, YearlyCategoryPivot
+from budgetlog.views import MonthDetailView
+
+
+class Command(BaseCommand):
+    help = 'Benchmark report computations: SQL aggregates vs. the in-memory NumPy columns of BookAnalytics'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transactions', type=int, default=100_000, help='Počet syntetických transakcí.')
+        parser.add_argument('--repeat', type=int, default=5, help='Počet opakování každého měření.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Generuji knihu s {options['transactions']} transakcemi...")
+        with synthetic_book(transactions=options['transactions']) as book:
+            view = MonthDetailView()
+            view.request = SimpleNamespace(book=book)
+            transactions = Transaction.objects.filter(book=book)
+            last = transactions.latest('datestamp', 'id').datestamp
+            category = Category.objects.filter(book=book, is_default=False).first()
+            tags = list(Tag.objects.filter(book=book)[:3])
+
+            self.stdout.write('Načtení sloupců knihy:')
+            self.stdout.write(format_row('Z databáze', *measure(lambda: BookAnalytics.load(book),
+                                                                 repeat=options['repeat'])))
+            BookAnalytics.for_book(book)
+            self.stdout.write(format_row('Z paměti workeru (platná verze)', *measure(
+                lambda: BookAnalytics.for_book(book), repeat=options['repeat'])))
+            analytics = BookAnalytics.load(book)
+
+            filters = [
+                ('Bez filtru', {}),
+                ('Kategorie + částka', {'category': category, 'amount_min': 1000}),
+                ('Tři tagy (všechny)', {'tags': tags}),
+                ('Tři tagy (alespoň jeden)', {'tags': tags, 'tag_mode': 'any'}),
+                ('Rok', {'datestamp__gte': last.replace(month=1, day=1), 'datestamp__lte': last}),
+            ]
+            for label, params in filters:
+                queryset = transactions
+                if 'category' in params:
+                    queryset = queryset.filter(category=category, amount__gte=params['amount_min'])
+                if 'tags' in params:
+                    queryset = queryset.with_tags(tags, params.get('tag_mode', 'all'))
+                if 'datestamp__gte' in params:
+                    queryset = queryset.filter(datestamp__range=(params['datestamp__gte'], params['datestamp__lte']))
+                self.stdout.write(f'Souhrny seznamu transakcí – {label}:')
+                self.stdout.write(format_row('  SQL', *measure(
+                    lambda: view.get_aggregates(queryset), repeat=options['repeat'])))
+                self.stdout.write(format_row('  NumPy', *measure(
+                    lambda: analytics.aggregates(analytics.select(**params)), repeat=options['repeat'])))
+
+            def sql_month():
+                month_rollups = MonthlyCategoryRollup.objects.filter(book=book, year=last.year, month=last.month)
+                return view.calculate_totals(month_rollups), view.get_category_summaries(last.year, last.month)
+
+            def numpy_month():
+                rows = analytics.period(last.replace(day=1), last + timedelta(days=1))
+                return analytics.totals(rows), view.get_analytics_category_summaries(analytics, rows)
+
+            def year_summary(engine):
+                pivot = YearlyCategoryPivot(book, last.year, engine)
+                return pivot.totals(), pivot.category_summaries(12), pivot.monthly_data()
+
+            self.stdout.write(f'Měsíční přehled {last.month}/{last.year}:')
+            self.stdout.write(format_row('  Měsíční souhrny (SQL)', *measure(sql_month, repeat=options['repeat'])))
+            self.stdout.write(format_row('  NumPy', *measure(numpy_month, repeat=options['repeat'])))
+            self.stdout.write(f'Roční přehled {last.year}:')
+            self.stdout.write(format_row('  Měsíční souhrny (SQL)', *measure(
+                lambda: year_summary(None), repeat=options['repeat'])))
+            self.stdout.write(format_row('  NumPy', *measure(
+                lambda: year_summary(analytics), repeat=options['repeat'])))
+            self.stdout.write(f'Percentily částek (25/50/75/90): {analytics.percentiles((25, 50, 75, 90))}')
@@ -0,0 +1,57 @@
+from itertools import accumulate
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from budgetlog import balances
+from budgetlog.benchmarks import synthetic_book, measure, format_row
+from budgetlog.models import Transaction
+
+
+def python_balances(book):
+    """Původní přístup: všechny transakce do Pythonu a průběžný součet v cyklu."""
+    rows = Transaction.objects.filter(book=book).order_by('datestamp', 'id').values_list('datestamp', 'signed_amount')
+    days = {}
+    for day, balance in zip((day for day, _ in rows), accumulate(amount for _, amount in rows)):
+        days[day] = balance
+    return days
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the running balance series: Python accumulation vs. a SUM() OVER window in the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transactions', type=int, default=100_000, help='Počet syntetických transakcí.')
+        parser.add_argument('--repeat', type=int, default=5, help='Počet opakování každého měření.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Generuji knihu s {options['transactions']} transakcemi...")
+        with synthetic_book(transactions=options['transactions']) as book, \
+                override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            transactions = Transaction.objects.filter(book=book)
+            self.stdout.write('Průběžný zůstatek po dnech:')
+            self.stdout.write(format_row('Python (všechny transakce)', *measure(
+                lambda: python_balances(book), repeat=options['repeat'])))
+            self.stdout.write(format_row('Okenní funkce v databázi', *measure(
+                lambda: list(transactions.daily_balances()), repeat=options['repeat'])))
+            for period in balances.PERIODS:
+                series = balances.balance_series(transactions, period, settings.BALANCE_SERIES_MAX_POINTS)
+                self.stdout.write(format_row(f'  + období {period} ({len(series["dates"])} bodů, {series["period"]})',
+                                             *measure(lambda: balances.balance_series(
+                                                 transactions, period, settings.BALANCE_SERIES_MAX_POINTS),
+                                                 repeat=options['repeat'])))
+
+            client = Client()
+            client.force_login(book.owner)
+            client.get(reverse('select-book', args=[book.id]))
+            url = reverse('balance-series')
+            client.get(url)  # Zahřátí cache
+
+            def request():
+                response = client.get(url)
+                assert response.status_code == 200, response.status_code
+
+            self.stdout.write(format_row('Endpoint (z cache)', *measure(request, repeat=options['repeat'])))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from budgetlog import search
+from budgetlog.benchmarks import DESCRIPTION_WORDS, synthetic_book, measure, format_row
+from budgetlog.models import Transaction
+
+
+class Command(BaseCommand):
+    help = 'Benchmark description search: LIKE %...% (icontains) vs. the FTS5 full-text index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transactions', type=int, default=200_000, help='Počet syntetických transakcí.')
+        parser.add_argument('--repeat', type=int, default=5, help='Počet opakování každého měření.')
+        parser.add_argument('--query', action='append', dest='queries',
+                            help='Hledaný text; lze zadat vícekrát (výchozí několik běžných i vzácných slov).')
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            self.stderr.write(self.style.ERROR('Databáze nemá fulltextový index (SQLite s FTS5, migrace 0005).'))
+            return
+
+        queries = options['queries'] or ['káva', 'hypot', 'oběd restaurace', 'pneumatiky servis']
+        self.stdout.write(f"Generuji knihu s {options['transactions']} transakcemi...")
+        with synthetic_book(transactions=options['transactions'], words=DESCRIPTION_WORDS) as book:
+            transactions = Transaction.objects.filter(book=book).order_by('-datestamp', '-id')
+            for query in queries:
+                matches = search.search_description(transactions, query).count()
+                self.stdout.write(f'Dotaz "{query}" ({matches} shod), první stránka (30 řádků) a počet:')
+                for label, func in (
+                    ('icontains (LIKE %...%)',
+                     lambda: (list(transactions.filter(description__icontains=query)[:30]),
+                              transactions.filter(description__icontains=query).count())),
+                    ('FTS5 (MATCH, řazeno podle relevance)',
+                     lambda: (list(search.search_description(transactions, query)[:30]),
+                              search.search_description(transactions, query).count())),
+                ):
+                    self.stdout.write(format_row(label, *measure(func, repeat=options['repeat'])))
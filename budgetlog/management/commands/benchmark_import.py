@@ -0,0 +1,83 @@
+import time
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from budgetlog import rollups
+from budgetlog.benchmarks import temporary_book, synthetic_csv
+from budgetlog.imports import IMPORT_ENGINES, TransactionImporter
+
+
+class RowByRowImporter(TransactionImporter):
+    """Původní způsob zápisu: create() a tags.set() pro každý řádek, každý ve vlastní transakci."""
+
+    def write_batch(self, batch):
+        created = []
+        with rollups.suspended():
+            for transaction, tags, _ in batch:
+                transaction.save()
+                transaction.tags.set(tags)
+                created.append(transaction)
+        rollups.add_instances(created)
+        self.added += len(created)
+        return created
+
+
+class DryRunMixin:
+    """Dávky se nezapisují do databáze, měří se jen čtení, převod a ověření řádků."""
+
+    def write_batch(self, batch):
+        self.added += len(batch)
+        return []
+
+
+class Command(BaseCommand):
+    help = 'Benchmark CSV import throughput (rows/second): row-by-row inserts vs. batched bulk_create, per engine'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20_000, help='Počet řádků syntetického CSV.')
+        parser.add_argument('--batch-size', type=int, action='append', dest='batch_sizes',
+                            help='Velikost dávky; lze zadat vícekrát (výchozí 100, 1000 a 5000).')
+        parser.add_argument('--engine', action='append', dest='engines', choices=sorted(IMPORT_ENGINES),
+                            help='Implementace importu; lze zadat vícekrát (výchozí všechny).')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Nezapisovat do databáze, měřit jen čtení a převod hodnot.')
+        parser.add_argument('--skip-legacy', action='store_true', help='Neměřit původní zápis po řádcích.')
+
+    def run_import(self, importer_class, content, **kwargs):
+        with temporary_book() as book:
+            importer = importer_class(book, create_missing=True, **kwargs)
+            upload = SimpleUploadedFile('import.csv', content, content_type='text/csv')
+            queries = []
+
+            def count_query(execute, sql, params, many, context):
+                queries.append(1)
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(count_query):
+                started = time.perf_counter()
+                result = importer.run(upload)
+                elapsed = time.perf_counter() - started
+        return result, len(queries), elapsed
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        content = synthetic_csv(rows)
+        mode = ' bez zápisu do databáze' if options['dry_run'] else ''
+        self.stdout.write(f'Import {rows} řádků ({len(content) / 1024 / 1024:.1f} MB){mode}:')
+
+        cases = [
+            (f'{engine}, dávka {size}', IMPORT_ENGINES[engine], {'batch_size': size})
+            for engine in options['engines'] or sorted(IMPORT_ENGINES)
+            for size in options['batch_sizes'] or [100, 1000, 5000]
+        ]
+        if not options['skip_legacy'] and not options['dry_run']:
+            cases.insert(0, ('Po řádcích (create + tags.set)', RowByRowImporter, {}))
+
+        for label, importer_class, kwargs in cases:
+            if options['dry_run']:
+                importer_class = type(f'DryRun{importer_class.__name__}', (DryRunMixin, importer_class), {})
+            result, queries, elapsed = self.run_import(importer_class, content, **kwargs)
+            self.stdout.write(f'{label:<40} {result["added"]:>8} přidáno {queries:>8} dotazů '
+                              f'{elapsed * 1000:>10.1f} ms {result["added"] / elapsed:>10.0f} řádků/s')
@@ -0,0 +1,79 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Moduly, které se nesmí načítat při startu workeru (patří jen ke grafům a přehledům)
+HEAVY_MODULES = ('numpy', 'pandas', 'matplotlib')
+
+# Kód spuštěný v čistém interpretu: stejné kroky, jaké udělá WSGI worker před prvním požadavkem
+STARTUP_SCRIPT = 'import django; django.setup(); import {module}'
+
+
+def parse_importtime(stderr):
+    """
+    Zpracuje výstup `python -X importtime` na seznam (modul, vlastní čas µs, kumulativní čas µs).
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        entries.append((name.strip(), int(self_us), int(cumulative_us)))
+    return entries
+
+
+class Command(BaseCommand):
+    help = 'Measure cold import time of budgetlog.urls (python -X importtime) and detect heavy imports'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--module', default='budgetlog.urls', help='Měřený modul (výchozí budgetlog.urls).')
+        parser.add_argument('--top', type=int, default=15, help='Počet nejpomalejších modulů ve výpisu.')
+        parser.add_argument('--repeat', type=int, default=3, help='Počet běhů; vypíše se nejrychlejší.')
+        parser.add_argument('--max-ms', type=float, default=None,
+                            help='Selže, pokud kumulativní import modulu trvá déle (v ms).')
+        parser.add_argument('--fail-on-heavy', action='store_true',
+                            help=f'Selže, pokud se při startu načte některý z modulů {", ".join(HEAVY_MODULES)}.')
+
+    def run_once(self, module):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE',
+                                                                     settings.SETTINGS_MODULE))
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT.format(module=module)],
+            capture_output=True, text=True, env=env, cwd=settings.BASE_DIR,
+        )
+        if result.returncode != 0:
+            raise CommandError(f'Import modulu {module} selhal:\n{result.stderr[-2000:]}')
+        return parse_importtime(result.stderr)
+
+    def handle(self, *args, **options):
+        module = options['module']
+        runs = [self.run_once(module) for _ in range(options['repeat'])]
+
+        def module_time(entries):
+            return next((cumulative for name, _, cumulative in entries if name == module), 0)
+
+        entries = min(runs, key=module_time)
+        module_ms = module_time(entries) / 1000
+        total_ms = sum(self_us for _, self_us, _ in entries) / 1000
+        heavy = sorted({name.split('.')[0] for name, _, _ in entries if name.split('.')[0] in HEAVY_MODULES})
+
+        self.stdout.write(f'Start interpretu + django.setup() + import {module}: {total_ms:.1f} ms '
+                          f'({len(entries)} modulů)')
+        self.stdout.write(f'Kumulativní import {module}: {module_ms:.1f} ms')
+        self.stdout.write('Nejpomalejší moduly (vlastní čas):')
+        slowest = sorted(entries, key=lambda entry: entry[1], reverse=True)[:options['top']]
+        for name, self_us, cumulative_us in slowest:
+            self.stdout.write(f'  {name:<60} {self_us / 1000:>8.1f} ms {cumulative_us / 1000:>8.1f} ms kumulativně')
+
+        if heavy:
+            self.stdout.write(self.style.WARNING(f'Při startu se načítají těžké moduly: {", ".join(heavy)}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Při startu se nenačítá žádný z těžkých modulů.'))
+
+        if options['fail_on_heavy'] and heavy:
+            raise CommandError(f'Start workeru načítá {", ".join(heavy)}.')
+        if options['max_ms'] is not None and module_ms > options['max_ms']:
+            raise CommandError(f'Import {module} trval {module_ms:.1f} ms, limit je {options["max_ms"]:.1f} ms.')
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from budgetlog.benchmarks import synthetic_book, measure, format_row
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the fixed per-request overhead (session and user lookups) of each REQUEST_PROFILE'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transactions', type=int, default=1000, help='Počet syntetických transakcí.')
+        parser.add_argument('--repeat', type=int, default=20, help='Počet opakování každého měření.')
+
+    @staticmethod
+    def overhead(client, url):
+        """Počet dotazů jednoho požadavku na sezení a na uživatele."""
+        with CaptureQueriesContext(connection) as context:
+            client.get(url)
+        sql = [query['sql'] for query in context.captured_queries]
+        return (sum('"django_session"' in query for query in sql),
+                sum('FROM "budgetlog_appuser"' in query for query in sql))
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Generuji knihu s {options['transactions']} transakcemi...")
+        urls = [('Seznam knih', reverse('book-list')), ('Seznam transakcí', reverse('transaction-list'))]
+        with synthetic_book(transactions=options['transactions']) as book:
+            for profile, profile_settings in settings.REQUEST_PROFILES.items():
+                with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], **profile_settings):
+                    client = Client()
+                    client.force_login(book.owner)
+                    # Výběr knihy zapíše sezení stejně jako v prohlížeči (i do cookie u podepsaného sezení)
+                    client.get(reverse('select-book', args=[book.id]))
+
+                    self.stdout.write(f'Profil "{profile}" ({profile_settings["SESSION_ENGINE"].rsplit(".", 1)[-1]}'
+                                      f', uživatel z cache: {"ano" if profile_settings["BUDGETLOG_USER_CACHE"] else "ne"}):')
+                    for label, url in urls:
+                        client.get(url)  # Zahřátí cache (sezení, uživatel, seznam knih, souhrny)
+                        session_queries, user_queries = self.overhead(client, url)
+
+                        def request():
+                            response = client.get(url)
+                            assert response.status_code == 200, response.status_code
+
+                        self.stdout.write(format_row(f'  {label}', *measure(request, repeat=options['repeat']))
+                                          + f'   sezení: {session_queries}, uživatel: {user_queries}')
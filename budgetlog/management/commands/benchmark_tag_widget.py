@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand
+from django.utils.html import format_html
+
+from budgetlog.benchmarks import synthetic_book, measure, format_row
+from budgetlog.filters import TransactionFilter
+from budgetlog.forms import ColoredTagWidget, TransactionForm
+from budgetlog.models import Book, Tag, Transaction
+
+
+class LegacyColoredTagWidget(ColoredTagWidget):
+    """Původní widget: pro každou vykreslenou volbu načte barvy všech tagů v databázi."""
+
+    def optgroups(self, name, value, attrs=None):
+        return super(ColoredTagWidget, self).optgroups(name, value, attrs)
+
+    def create_option(self, name, value, label, selected, index, subindex=None, attrs=None):
+        option = super(ColoredTagWidget, self).create_option(name, value, label, selected, index,
+                                                             subindex=subindex, attrs=attrs)
+        tag_colors = {tag.pk: tag.color for tag in Tag.objects.all()}
+        option['attrs']['style'] = 'flex: 1 1 auto; margin: 5px;'
+        option['label'] = format_html(
+            '<span style="background-color: {}; color: white; padding: 2px 5px; '
+            'border-radius: 5px; display: inline-block;">{}</span>', tag_colors.get(value, '#000000'), label
+        )
+        return option
+
+
+def render_filter(book, widget_class):
+    """Vykreslí pole tagů ve filtru transakcí, jako při načtení seznamu transakcí."""
+    filterset = TransactionFilter({}, queryset=Transaction.objects.filter(book=book), book=book)
+    field = filterset.form.fields['tags']
+    field.widget = widget_class(choices=field.choices)
+    return str(filterset.form['tags'])
+
+
+def render_transaction_form(book, widget_class):
+    """Vykreslí pole tagů ve formuláři transakce."""
+    form = TransactionForm(book=book)
+    field = form.fields['tags']
+    field.widget = widget_class(choices=field.choices)
+    return str(form['tags'])
+
+
+class Command(BaseCommand):
+    help = 'Benchmark rendering of the tag checkbox widget: per-option tag scans vs. one color map per render'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tags', type=int, default=200, help='Počet tagů v měřené knize.')
+        parser.add_argument('--books', type=int, default=1000, help='Počet knih v databázi (včetně měřené).')
+        parser.add_argument('--other-tags', type=int, default=20,
+                            help='Počet tagů v každé další knize (původní widget je načítá všechny u každé volby).')
+        parser.add_argument('--repeat', type=int, default=5, help='Počet opakování měření nového widgetu.')
+        parser.add_argument('--legacy-repeat', type=int, default=1,
+                            help='Počet opakování měření původního widgetu (0 = neměřit).')
+
+    def handle(self, *args, **options):
+        tag_count, book_count, other_tags = options['tags'], options['books'], options['other_tags']
+        total_tags = tag_count + (book_count - 1) * other_tags
+        self.stdout.write(f'Generuji {book_count} knih, měřená kniha má {tag_count} tagů '
+                          f'(celkem {total_tags} tagů)...')
+        with synthetic_book(transactions=0, categories=0, tags=tag_count) as book:
+            other_books = Book.objects.bulk_create([
+                Book(name=f'Kniha {index + 2}', owner=book.owner) for index in range(book_count - 1)
+            ], batch_size=2000)
+            Tag.objects.bulk_create([
+                Tag(name=f'Tag {index + 1}', color='#123456', book=other_book)
+                for other_book in other_books for index in range(other_tags)
+            ], batch_size=5000)
+
+            for form_label, render in (('Filtr', render_filter), ('Formulář', render_transaction_form)):
+                cases = [('nový widget', ColoredTagWidget, options['repeat'])]
+                if options['legacy_repeat']:
+                    cases.insert(0, ('původní widget', LegacyColoredTagWidget, options['legacy_repeat']))
+                for label, widget_class, repeat in cases:
+                    result = measure(lambda: render(book, widget_class), repeat=repeat)
+                    self.stdout.write(format_row(f'{form_label}: {label}', *result))
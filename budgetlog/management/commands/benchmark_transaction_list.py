@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from budgetlog.benchmarks import synthetic_book, measure, format_row
+from budgetlog.models import Category, Tag, Transaction
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the transaction list page (query count and latency) for unfiltered and filtered requests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transactions', type=int, default=100_000, help='Počet syntetických transakcí.')
+        parser.add_argument('--repeat', type=int, default=5, help='Počet opakování každého měření.')
+
+    def cases(self, book):
+        """Měřené požadavky: (popis, query string)."""
+        category = Category.objects.filter(book=book, is_default=False).first()
+        tags = list(Tag.objects.filter(book=book)[:5])
+        tag = tags[0]
+        several_tags = '&'.join(f'tags={tag.pk}' for tag in tags[:3])
+        last_page = Transaction.objects.filter(book=book).count() // 30
+        return [
+            ('Bez filtru, 1. stránka', ''),
+            (f'Bez filtru, stránka {last_page}', f'page={last_page}'),
+            ('Bez filtru, kurzor', 'pagination=cursor'),
+            ('Kategorie', f'category={category.pk}'),
+            ('Kategorie + tag + částka', f'category={category.pk}&tags={tag.pk}&amount_min=1000'),
+            ('Tři tagy (všechny)', several_tags),
+            ('Tři tagy (alespoň jeden)', f'{several_tags}&tag_mode=any'),
+            ('Tři tagy (žádný)', f'{several_tags}&tag_mode=none'),
+            ('Popis obsahuje', 'description=transakce 99'),
+            ('Datum od-do', 'datestamp__gte=2021-01-01&datestamp__lte=2021-12-31'),
+        ]
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Generuji knihu s {options['transactions']} transakcemi...")
+        with synthetic_book(transactions=options['transactions']) as book, \
+                override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            client = Client()
+            client.force_login(book.owner)
+            session = client.session
+            session['current_book_id'] = book.id
+            session.save()
+
+            url = reverse('transaction-list')
+            self.stdout.write('Seznam transakcí (celý požadavek včetně sezení a vykreslení šablony):')
+            for label, query in self.cases(book):
+                def request():
+                    response = client.get(f'{url}?{query}')
+                    assert response.status_code == 200, response.status_code
+
+                self.stdout.write(format_row(label, *measure(request, repeat=options['repeat'])))
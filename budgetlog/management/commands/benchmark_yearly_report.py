@@ -0,0 +1,68 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db.models import Sum, DecimalField, Q, F, Case, When
+from django.db.models.functions import Coalesce
+
+from budgetlog.benchmarks import synthetic_book, measure, format_row
+from budgetlog.models import Category, Transaction
+from budgetlog.reports import YearlyCategoryPivot
+
+
+def signed_amount(prefix=''):
+    return Case(
+        When(**{f'{prefix}type': 'expense'}, then=-F(f'{prefix}amount')),
+        default=F(f'{prefix}amount'),
+        output_field=DecimalField()
+    )
+
+
+def legacy_yearly_report(book, year):
+    """Původní výpočet ročního přehledu: jeden anotovaný dotaz nad transakcemi pro každý měsíc."""
+    transactions = Transaction.objects.filter(book=book, datestamp__year=year)
+    transactions.aggregate(
+        total_income=Coalesce(Sum('amount', filter=Q(type='income'), output_field=DecimalField()), Decimal('0')),
+        total_expense=Coalesce(Sum('amount', filter=Q(type='expense'), output_field=DecimalField()), Decimal('0'))
+    )
+    category_summaries = list(Category.objects.filter(book=book).annotate(
+        total=Coalesce(Sum(signed_amount('transaction__'), filter=Q(transaction__datestamp__year=year),
+                           output_field=DecimalField()), Decimal('0')),
+        monthly_average=Coalesce(Sum(signed_amount('transaction__'), filter=Q(transaction__datestamp__year=year),
+                                     output_field=DecimalField()) / 12, Decimal('0'))
+    ).order_by('-total'))
+    monthly_balances = {category.name: {} for category in category_summaries}
+    for month in transactions.dates('datestamp', 'month', order='ASC'):
+        month_balances = Category.objects.filter(book=book).annotate(
+            monthly_total=Coalesce(Sum(signed_amount('transaction__'), filter=Q(
+                transaction__datestamp__year=year, transaction__datestamp__month=month.month),
+                output_field=DecimalField()), Decimal('0'))
+        )
+        for balance in month_balances:
+            monthly_balances[balance.name][month] = float(balance.monthly_total)
+    return monthly_balances
+
+
+def pivot_yearly_report(book, year):
+    """Současný výpočet: jeden dotaz nad měsíčními souhrny a pivot do matice kategorie × měsíc."""
+    pivot = YearlyCategoryPivot(book, year)
+    pivot.totals()
+    pivot.category_summaries(12)
+    return pivot.monthly_balances()
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the yearly report: per-month category queries vs. one grouped query with a NumPy pivot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transactions', type=int, default=100_000, help='Počet syntetických transakcí.')
+        parser.add_argument('--repeat', type=int, default=5, help='Počet opakování každého měření.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Generuji knihu s {options['transactions']} transakcemi...")
+        with synthetic_book(transactions=options['transactions']) as book:
+            year = Transaction.objects.filter(book=book).dates('datestamp', 'year').last().year
+            self.stdout.write(f'Roční přehled za rok {year}:')
+            for label, func in (('Původní (dotaz na každý měsíc)', legacy_yearly_report),
+                                ('Souhrny + NumPy pivot', pivot_yearly_report)):
+                result = measure(lambda: func(book, year), repeat=options['repeat'])
+                self.stdout.write(format_row(label, *result))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from budgetlog import caching
+
+
+class Command(BaseCommand):
+    help = 'Show hit/miss counters of the per-book aggregate cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Po vypsání čítače vynuluje.')
+
+    def handle(self, *args, **options):
+        if not caching.shared_stats_enabled():
+            self.stdout.write(self.style.WARNING('Čítače za všechny workery jsou vypnuté (BUDGETLOG_CACHE_STATS), '
+                                                 'vypisují se jen počty tohoto procesu.'))
+        stats = caching.stats()
+        self.stdout.write(f"Zásahy: {stats['hits']}, minutí: {stats['misses']}, "
+                          f"úspěšnost: {stats['hit_ratio'] * 100:.1f} %")
+        if options['reset']:
+            caching.reset_stats()
+            self.stdout.write(self.style.SUCCESS('Čítače byly vynulovány.'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from budgetlog import rollups
+from budgetlog.models import Book
+
+
+class Command(BaseCommand):
+    help = 'Rebuild monthly category rollups from the transaction table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--book', type=int, action='append', dest='book_ids',
+                            help='ID knihy, jejíž souhrny se mají přepočítat (lze zadat vícekrát). '
+                                 'Bez parametru se přepočítají všechny knihy.')
+
+    def handle(self, *args, **options):
+        book_ids = options['book_ids']
+        if book_ids:
+            missing = set(book_ids) - set(Book.objects.filter(id__in=book_ids).values_list('id', flat=True))
+            if missing:
+                self.stderr.write(self.style.ERROR(f'Knihy s id={sorted(missing)} neexistují.'))
+                return
+
+        count = rollups.rebuild(book_ids)
+        scope = f'knihy s id={book_ids}' if book_ids else 'všechny knihy'
+        self.stdout.write(self.style.SUCCESS(f'Přepočítáno {count} měsíčních souhrnů pro {scope}'))
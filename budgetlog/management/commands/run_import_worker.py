@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from budgetlog.imports import claim_next_job, process_job
+from budgetlog.models import ImportJob
+
+
+class Command(BaseCommand):
+    help = 'Process queued CSV imports (ImportJob) by polling the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Zpracuje čekající importy a skončí.')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Prodleva v sekundách mezi dotazy na nové importy.')
+        parser.add_argument('--max-jobs', type=int, default=None, help='Skončí po zpracování daného počtu importů.')
+        parser.add_argument('--requeue-running', action='store_true',
+                            help='Při startu vrátí importy ve stavu "running" do fronty (po pádu workeru).')
+
+    def handle(self, *args, **options):
+        if options['requeue_running']:
+            requeued = ImportJob.objects.filter(status=ImportJob.STATUS_RUNNING).update(
+                status=ImportJob.STATUS_PENDING, started_at=None)
+            self.stdout.write(f'Vráceno do fronty: {requeued} importů.')
+
+        processed = 0
+        try:
+            while options['max_jobs'] is None or processed < options['max_jobs']:
+                job = claim_next_job()
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                job = process_job(job)
+                processed += 1
+                self.stdout.write(f'Import #{job.id}: {job.get_status_display()}, přidáno {job.added}, '
+                                  f'vynecháno {job.skipped_count}.')
+        except KeyboardInterrupt:
+            self.stdout.write('Worker ukončen.')
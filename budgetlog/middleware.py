@@ -0,0 +1,88 @@
+"""
+Přihlášený uživatel a aktuální kniha jednou za požadavek.
+
+CachedAuthenticationMiddleware nahrazuje AuthenticationMiddleware z Djanga: při zapnutém BUDGETLOG_USER_CACHE
+načte přihlášeného uživatele z cache místo dotazu do databáze. Uložený uživatel se použije jen tehdy, když hash
+hesla uložený v sezení (session auth hash) odpovídá jeho aktuálnímu heslu, takže odhlášení a změna hesla fungují
+stejně jako bez cache; při uložení nebo smazání uživatele se záznam smaže (viz caching.invalidate_user).
+
+CurrentBookMiddleware nastaví `request.books` (knihy přihlášeného uživatele) a `request.book` (aktuální kniha
+podle `current_book_id` v session, nebo None). Pohledy a mixiny čtou knihu odsud, takže žádný z nich už nedotazuje
+tabulku knih sám.
+
+Seznam knih se ukládá do cache (alias BUDGETLOG_CACHE) pro každého uživatele zvlášť pod klíčem s verzí seznamu;
+signály verzi změní, když se některá z jeho knih vytvoří, upraví nebo smaže (viz caching.invalidate_user_books).
+"""
+
+# Django importy
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user, get_user_model
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+# Lokální aplikace
+from . import caching
+from .models import Book
+
+
+def get_cached_user(request):
+    """
+    Vrátí přihlášeného uživatele z cache. Pokud v cache není, nebo se hash v sezení neshoduje (změněné heslo),
+    použije se standardní django.contrib.auth.get_user (ten při neshodě sezení zruší) a výsledek se uloží.
+    """
+    try:
+        user_id = get_user_model()._meta.pk.to_python(request.session[SESSION_KEY])
+        backend_path = request.session[BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    cache = caching.get_cache()
+    key = caching.user_key(user_id)
+    session_hash = request.session.get(HASH_SESSION_KEY)
+    user = cache.get(key)
+    if (user is not None and backend_path in settings.AUTHENTICATION_BACKENDS and session_hash
+            and constant_time_compare(session_hash, user.get_session_auth_hash())):
+        return user
+    user = get_user(request)
+    if user.is_authenticated:
+        cache.set(key, user, getattr(settings, 'BUDGETLOG_CACHE_TIMEOUT', 3600))
+    return user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """AuthenticationMiddleware, který s BUDGETLOG_USER_CACHE čte přihlášeného uživatele z cache."""
+
+    def process_request(self, request):
+        super().process_request(request)
+        if getattr(settings, 'BUDGETLOG_USER_CACHE', False):
+            request.user = SimpleLazyObject(lambda: get_cached_user(request))
+
+
+def get_user_books(user):
+    """Vrátí seznam knih uživatele z cache, nebo ho načte jedním dotazem a uloží."""
+    cache = caching.get_cache()
+    key = caching.user_books_key(user.pk)
+    books = cache.get(key)
+    if books is None:
+        books = list(Book.objects.filter(owner=user).order_by('pk'))
+        cache.set(key, books, getattr(settings, 'BUDGETLOG_CACHE_TIMEOUT', 3600))
+    for book in books:
+        book.owner = user  # Vlastník je známý, __str__ ani šablony pro něj nespustí dotaz
+    return books
+
+
+class CurrentBookMiddleware:
+    """Nastaví `request.books` a `request.book`; musí být zařazen za (Cached)AuthenticationMiddleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.books = []
+        request.book = None
+        if request.user.is_authenticated:
+            request.books = get_user_books(request.user)
+            current_book_id = request.session.get('current_book_id')
+            request.book = next((book for book in request.books if book.pk == current_book_id), None)
+        return self.get_response(request)
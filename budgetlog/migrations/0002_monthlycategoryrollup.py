@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def build_rollups(apps, schema_editor):
+    """Naplní souhrny z již existujících transakcí."""
+    Transaction = apps.get_model('budgetlog', 'Transaction')
+    MonthlyCategoryRollup = apps.get_model('budgetlog', 'MonthlyCategoryRollup')
+    rows = Transaction.objects.order_by().values(
+        'book_id', 'category_id', 'type', year=ExtractYear('datestamp'), month=ExtractMonth('datestamp')
+    ).annotate(total=Sum('amount'), count=Count('id'))
+    MonthlyCategoryRollup.objects.bulk_create([MonthlyCategoryRollup(**row) for row in rows], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgetlog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyCategoryRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField(verbose_name='Rok')),
+                ('month', models.PositiveSmallIntegerField(verbose_name='Měsíc')),
+                ('type', models.CharField(choices=[('income', 'Příjem'), ('expense', 'Výdaj')], max_length=7, verbose_name='Typ')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Součet částek')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Počet transakcí')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='budgetlog.book', verbose_name='Kniha')),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='budgetlog.category', verbose_name='Kategorie')),
+            ],
+            options={
+                'verbose_name': 'Měsíční souhrn kategorie',
+                'verbose_name_plural': 'Měsíční souhrny kategorií',
+                'constraints': [models.UniqueConstraint(fields=('book', 'year', 'month', 'category', 'type'), name='unique_rollup_book_period_category_type')],
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgetlog', '0002_monthlycategoryrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['book', 'datestamp'], name='transaction_book_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['book', 'type', 'datestamp'], name='transaction_book_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['book', 'category', 'datestamp'], name='transaction_book_cat_date_idx'),
+        ),
+        # Automatická spojovací tabulka tagů má unikátní index (transaction_id, tag_id); pro filtr podle tagu
+        # je potřeba i opačné pořadí, aby se transakce daného tagu četly jen z indexu.
+        migrations.RunSQL(
+            sql='CREATE INDEX transaction_tags_tag_txn_idx ON budgetlog_transaction_tags (tag_id, transaction_id);',
+            reverse_sql='DROP INDEX transaction_tags_tag_txn_idx;',
+        ),
+    ]
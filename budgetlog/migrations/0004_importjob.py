@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgetlog', '0003_transaction_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(blank=True, upload_to='imports/%Y/%m/', verbose_name='Soubor')),
+                ('create_missing', models.BooleanField(default=False, verbose_name='Vytvořit chybějící kategorie a tagy')),
+                ('status', models.CharField(choices=[('pending', 'Čeká na zpracování'), ('running', 'Zpracovává se'), ('done', 'Dokončeno'), ('failed', 'Selhalo')], default='pending', max_length=7, verbose_name='Stav')),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='Zpracované řádky')),
+                ('added', models.PositiveIntegerField(default=0, verbose_name='Přidané transakce')),
+                ('skipped', models.JSONField(blank=True, default=list, verbose_name='Vynechané řádky')),
+                ('skipped_count', models.PositiveIntegerField(default=0, verbose_name='Počet vynechaných řádků')),
+                ('error', models.TextField(blank=True, verbose_name='Chyba')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Vytvořeno')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Zahájeno')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Dokončeno')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='import_jobs', to='budgetlog.book', verbose_name='Kniha')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='import_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Uživatel')),
+            ],
+            options={
+                'verbose_name': 'Import transakcí',
+                'verbose_name_plural': 'Importy transakcí',
+                'indexes': [models.Index(fields=['status', 'created_at'], name='importjob_status_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:12
+
+import budgetlog.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Triggery udržují index v souladu s tabulkou transakcí při jakémkoli zápisu (i bulk_create a queryset.update).
+# Neindexovaný sloupec id slouží ke spojení s transakcemi: FTS5 pro něj nemá index (na rozdíl od rowid), takže
+# SQLite vždy nejdřív vyhodnotí MATCH a transakce dohledá podle primárního klíče, místo aby pro každou transakci
+# knihy spouštěl MATCH znovu.
+FTS_SQL = [
+    "CREATE VIRTUAL TABLE budgetlog_transaction_fts USING fts5("
+    "id UNINDEXED, description, content='budgetlog_transaction', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER budgetlog_transaction_fts_ai AFTER INSERT ON budgetlog_transaction BEGIN "
+    "INSERT INTO budgetlog_transaction_fts(rowid, id, description) VALUES (new.id, new.id, new.description); END",
+    "CREATE TRIGGER budgetlog_transaction_fts_ad AFTER DELETE ON budgetlog_transaction BEGIN "
+    "INSERT INTO budgetlog_transaction_fts(budgetlog_transaction_fts, rowid, id, description) "
+    "VALUES ('delete', old.id, old.id, old.description); END",
+    "CREATE TRIGGER budgetlog_transaction_fts_au AFTER UPDATE OF description ON budgetlog_transaction BEGIN "
+    "INSERT INTO budgetlog_transaction_fts(budgetlog_transaction_fts, rowid, id, description) "
+    "VALUES ('delete', old.id, old.id, old.description); "
+    "INSERT INTO budgetlog_transaction_fts(rowid, id, description) VALUES (new.id, new.id, new.description); END",
+    # Naplnění indexu z již existujících transakcí
+    "INSERT INTO budgetlog_transaction_fts(budgetlog_transaction_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS budgetlog_transaction_fts_au",
+    "DROP TRIGGER IF EXISTS budgetlog_transaction_fts_ad",
+    "DROP TRIGGER IF EXISTS budgetlog_transaction_fts_ai",
+    "DROP TABLE IF EXISTS budgetlog_transaction_fts",
+]
+
+
+def fts5_supported(schema_editor):
+    """FTS5 je jen na SQLite a jen pokud je zkompilované (jinak vyhledávání použije icontains)."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return False
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def create_fts_index(apps, schema_editor):
+    if fts5_supported(schema_editor):
+        for sql in FTS_SQL:
+            schema_editor.execute(sql)
+
+
+def drop_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in DROP_SQL:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgetlog', '0004_importjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionSearch',
+            fields=[
+                ('transaction', models.OneToOneField(db_column='id', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search', serialize=False, to='budgetlog.transaction')),
+                ('description', budgetlog.search.FullTextField()),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'budgetlog_transaction_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:58
+
+from importlib import import_module
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+# Přidání uloženého generovaného sloupce SQLite provede přestavbou tabulky transakcí, při které zaniknou triggery
+# fulltextového indexu z migrace 0005; po přestavbě (i při vrácení migrace) se proto vytvoří znovu. ID transakcí
+# se nemění, takže obsah indexu zůstává platný.
+fts_migration = import_module('budgetlog.migrations.0005_transactionsearch')
+
+
+def recreate_fts_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'budgetlog_transaction_fts'")
+        if cursor.fetchone() is None:
+            return
+    for sql in fts_migration.FTS_SQL:
+        if sql.startswith('CREATE TRIGGER'):
+            schema_editor.execute(sql.replace('CREATE TRIGGER', 'CREATE TRIGGER IF NOT EXISTS', 1))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgetlog', '0005_transactionsearch'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, recreate_fts_triggers),
+        migrations.AddField(
+            model_name='transaction',
+            name='signed_amount',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(then=django.db.models.expressions.CombinedExpression(models.F('amount'), '*', models.Value(-1)), type='expense'), default=models.F('amount')), output_field=models.DecimalField(decimal_places=2, max_digits=10), verbose_name='Částka se znaménkem'),
+        ),
+        migrations.RunPython(recreate_fts_triggers, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['book', 'signed_amount'], name='transaction_book_signed_idx'),
+        ),
+    ]
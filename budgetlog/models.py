@@ -1,8 +1,12 @@
 # Django importy
-from django.db import models
+from django.db import connections, models, transaction as db_transaction
 from django.utils import timezone
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager
 
+# Lokální aplikace
+from . import caching
+from .search import FTS_TABLE, FullTextField
+
 
 # Create your models here.
 class UserManager(BaseUserManager):
@@ -144,6 +148,117 @@ class Tag(models.Model):
         return self.name
 
 
+class RunningTotal(models.Func):
+    """
+    Průběžný součet agregace přes skupiny GROUP BY: SUM(<agregace>) OVER (ORDER BY <klíč skupiny>).
+
+    Django Window nepřijme agregaci jako svůj výraz ("is an aggregate"), okenní funkce nad výsledkem GROUP BY je
+    ale v SQL běžná; SQLite ji podporuje od verze 3.25.
+    """
+    output_field = models.DecimalField(max_digits=14, decimal_places=2)
+
+    def __init__(self, aggregate, order_by, **extra):
+        super().__init__(aggregate, order_by, **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        aggregate, order_by = self.get_source_expressions()
+        aggregate_sql, aggregate_params = compiler.compile(aggregate)
+        order_sql, order_params = compiler.compile(order_by)
+        return f'SUM({aggregate_sql}) OVER (ORDER BY {order_sql})', [*aggregate_params, *order_params]
+
+
+class TransactionQuerySet(models.QuerySet):
+    """Queryset transakcí s pomocnými metodami pro načtení souvisejících objektů."""
+
+    def for_display(self):
+        """Načte kategorie (JOIN) a tagy (jeden dotaz navíc), aby vykreslení řádků nespouštělo dotaz pro každý řádek."""
+        return self.select_related('category').prefetch_related('tags')
+
+    def delete(self):
+        """
+        Smaže transakce a odečte je od měsíčních souhrnů najednou po skupinách.
+
+        Transakce záměrně nemají příjemce signálů pre_delete/post_delete: Django je pak při kaskádě ze smazané knihy
+        nebo uživatele maže po dávkách podle ID, aniž by načítal celé objekty (souhrny knihy zaniknou kaskádou s ní).
+        Souhrny a verzi knihy proto místo signálů upravuje tato metoda a Transaction.delete.
+        """
+        from . import rollups  # rollups importuje modely
+
+        if rollups.is_suspended():
+            return super().delete()
+        with db_transaction.atomic(using=self.db), rollups.suspended():
+            rollups.subtract_queryset(self)
+            return super().delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def daily_balances(self):
+        """
+        Průběžný zůstatek po dnech s transakcemi: (datum, zůstatek na konci dne), vzestupně podle data.
+
+        Součty dní (GROUP BY datestamp nad indexem knihy a data) i jejich průběžný součet (SUM() OVER (ORDER BY
+        datestamp)) spočítá databáze jedním dotazem, do Pythonu se přenese jen jeden řádek za den.
+        """
+        return (self.order_by().values('datestamp')
+                .annotate(balance=RunningTotal(models.Sum('signed_amount'), models.F('datestamp')))
+                .order_by('datestamp').values_list('datestamp', 'balance'))
+
+    def with_tags(self, tags, mode='all'):
+        """
+        Vyfiltruje transakce podle tagů jedním poddotazem nad propojovací tabulkou, takže počet JOINů nezávisí na
+        počtu vybraných tagů.
+
+        :param tags: Tagy (nebo jejich ID).
+        :param mode: 'all' – transakce má všechny tagy (GROUP BY transakce HAVING COUNT(DISTINCT tag) = počet tagů),
+                     'any' – má alespoň jeden z tagů, 'none' – nemá žádný z tagů.
+        """
+        tag_ids = {tag.pk if isinstance(tag, models.Model) else tag for tag in tags}
+        if not tag_ids:
+            return self
+        links = self.model.tags.through.objects.using(self.db).filter(tag_id__in=tag_ids)
+        if mode == 'all':
+            matching = (links.values('transaction_id')
+                        .annotate(matched_tags=models.Count('tag_id', distinct=True))
+                        .filter(matched_tags=len(tag_ids))
+                        .values('transaction_id'))
+            return self.filter(pk__in=matching)
+        if mode == 'any':
+            return self.filter(pk__in=links.values('transaction_id'))
+        if mode == 'none':
+            return self.exclude(pk__in=links.values('transaction_id'))
+        raise ValueError(f'Neznámý režim filtru tagů: {mode!r}')
+
+    def add_tag(self, tag):
+        """
+        Přiřadí tag všem transakcím querysetu jedním INSERT ... SELECT do propojovací tabulky; dvojice, které už
+        existují, se přeskočí. Vrátí počet nově otagovaných transakcí.
+        """
+        through = self.model.tags.through
+        qn = connections[self.db].ops.quote_name
+        table, transaction_col, tag_col = (qn(name) for name in (
+            through._meta.db_table, 'transaction_id', 'tag_id'))
+        selected_sql, selected_params = self.order_by().values('id').query.get_compiler(self.db).as_sql()
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} ({transaction_col}, {tag_col}) '
+                f'SELECT selected.id, %s FROM ({selected_sql}) selected '
+                f'WHERE NOT EXISTS (SELECT 1 FROM {table} existing '
+                f'WHERE existing.{transaction_col} = selected.id AND existing.{tag_col} = %s)',
+                (tag.pk, *selected_params, tag.pk),
+            )
+            added = cursor.rowcount
+        caching.bump_book_version(tag.book_id)
+        return added
+
+    def remove_tag(self, tag):
+        """Odebere tag všem transakcím querysetu jedním DELETE. Vrátí počet transakcí, kterým byl tag odebrán."""
+        through = self.model.tags.through
+        deleted, _ = through.objects.using(self.db).filter(tag=tag, transaction__in=self.values('id')).delete()
+        caching.bump_book_version(tag.book_id)
+        return deleted
+
+
 class Transaction(models.Model):
     """Model reprezentující záznam o finanční transakci."""
 
@@ -168,10 +283,33 @@ class Transaction(models.Model):
                                    help_text="Zadejte detailnější popis transakce (volitelný).")
     type = models.CharField(max_length=7, choices=TYPE_CHOICES, default='expense', verbose_name="Typ",
                             help_text="Zvolte, zda je tato transakce výdaj nebo příjem.")
+    # Částka se znaménkem (výdaj záporný) jako uložený generovaný sloupec: databáze ho přepočítá při každém zápisu
+    # (i bulk_create a queryset.update), takže souhrny jsou prosté SUM/AVG/MIN/MAX nad jedním sloupcem
+    signed_amount = models.GeneratedField(
+        expression=models.Case(
+            models.When(type='expense', then=-models.F('amount')),
+            default=models.F('amount'),
+        ),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        db_persist=True,
+        verbose_name="Částka se znaménkem",
+    )
+
+    objects = TransactionQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Transakce"
         verbose_name_plural = "Transakce"
+        indexes = [
+            # Seznam transakcí, filtry podle data a měsíční/roční přehledy (řazení podle data a id)
+            models.Index(fields=['book', 'datestamp'], name='transaction_book_date_idx'),
+            # Filtr podle typu transakce (příjem/výdaj) v kombinaci s datem
+            models.Index(fields=['book', 'type', 'datestamp'], name='transaction_book_type_date_idx'),
+            # Filtr podle kategorie v kombinaci s datem
+            models.Index(fields=['book', 'category', 'datestamp'], name='transaction_book_cat_date_idx'),
+            # Souhrny částek knihy (SUM/AVG/MIN/MAX nad signed_amount)
+            models.Index(fields=['book', 'signed_amount'], name='transaction_book_signed_idx'),
+        ]
 
     object_plural_genitiv = "transakcí"
     object_singular_akluzativ = "transakci"
@@ -185,14 +323,136 @@ class Transaction(models.Model):
         type_display = dict(self.TYPE_CHOICES).get(self.type, self.type)
         return f"{type_display}: {self.adjusted_amount} CZK {self.datestamp}"
 
+    def delete(self, *args, **kwargs):
+        """Smaže transakci a odečte ji od měsíčního souhrnu (viz TransactionQuerySet.delete, proč ne signálem)."""
+        from . import rollups  # rollups importuje modely
+
+        with db_transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            if not rollups.is_suspended():
+                rollups.apply(rollups.group_instances([self]), -1)
+        caching.bump_book_version(self.book_id)
+        return result
+
     @property
     def adjusted_amount(self):
-        """Vrátí částku s upraveným znaménkem podle typu transakce (výdaj bude záporný)."""
+        """
+        Vrátí částku s upraveným znaménkem podle typu transakce (výdaj bude záporný) i pro neuloženou transakci.
+        Načtené transakce mají stejnou hodnotu v poli signed_amount, které lze použít i v dotazech a agregacích.
+        """
         if self.type == 'expense':
             return -self.amount
         return self.amount
+
+
+class TransactionSearch(models.Model):
     """
-    Django neumožňuje použít adjusted_amount přímo v anotacích a agregacích, protože adjusted_amount je vlastnost (
-    property) modelu a ne skutečné pole v databázi. Pokud chceme filtrovat nebo agregovat ve views podle upravených 
-    částek, musíme to udělat pomocí amount a přizpůsobit SQL dotaz.
+    Fulltextový index popisů transakcí (virtuální tabulka SQLite FTS5, viz budgetlog.search).
+
+    Tabulku nevytváří Django, ale migrace 0005, a plní ji databázové triggery nad tabulkou transakcí; model slouží
+    jen ke spojení (JOIN) v dotazech a k řazení podle relevance.
+    """
+
+    transaction = models.OneToOneField(Transaction, primary_key=True, db_column='id', db_constraint=False,
+                                       on_delete=models.DO_NOTHING, related_name='search')
+    description = FullTextField()
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = FTS_TABLE
+
+
+class MonthlyCategoryRollup(models.Model):
     """
+    Předpočítaný měsíční souhrn transakcí pro kombinaci kniha / rok / měsíc / kategorie / typ.
+
+    Řádky se průběžně aktualizují ze signálů a hromadných operací (viz budgetlog.rollups), takže přehledy nemusí
+    při každém zobrazení procházet všechny transakce knihy.
+    """
+
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='rollups', verbose_name="Kniha")
+    year = models.PositiveSmallIntegerField(verbose_name="Rok")
+    month = models.PositiveSmallIntegerField(verbose_name="Měsíc")
+    category = models.ForeignKey(Category, null=True, on_delete=models.CASCADE, related_name='rollups',
+                                 verbose_name="Kategorie")
+    type = models.CharField(max_length=7, choices=Transaction.TYPE_CHOICES, verbose_name="Typ")
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Součet částek")
+    count = models.PositiveIntegerField(default=0, verbose_name="Počet transakcí")
+
+    class Meta:
+        verbose_name = "Měsíční souhrn kategorie"
+        verbose_name_plural = "Měsíční souhrny kategorií"
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'year', 'month', 'category', 'type'],
+                                    name='unique_rollup_book_period_category_type')
+        ]
+
+    def __str__(self):
+        """Textová reprezentace měsíčního souhrnu."""
+        return f"{self.month}/{self.year} {self.category} ({self.type}): {self.total} CZK / {self.count}"
+
+
+class ImportJob(models.Model):
+    """
+    Import CSV souboru zpracovávaný na pozadí.
+
+    Nahraný soubor se uloží a úlohu převezme worker (management příkaz run_import_worker), který ji zpracuje
+    a průběžně zapisuje počty zpracovaných, přidaných a vynechaných řádků.
+    """
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Čeká na zpracování'),
+        (STATUS_RUNNING, 'Zpracovává se'),
+        (STATUS_DONE, 'Dokončeno'),
+        (STATUS_FAILED, 'Selhalo'),
+    ]
+
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='import_jobs', verbose_name="Kniha")
+    owner = models.ForeignKey(AppUser, on_delete=models.CASCADE, related_name='import_jobs',
+                              verbose_name="Uživatel")
+    file = models.FileField(upload_to='imports/%Y/%m/', blank=True, verbose_name="Soubor")
+    create_missing = models.BooleanField(default=False, verbose_name="Vytvořit chybějící kategorie a tagy")
+    status = models.CharField(max_length=7, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name="Stav")
+    processed = models.PositiveIntegerField(default=0, verbose_name="Zpracované řádky")
+    added = models.PositiveIntegerField(default=0, verbose_name="Přidané transakce")
+    skipped = models.JSONField(default=list, blank=True, verbose_name="Vynechané řádky")
+    skipped_count = models.PositiveIntegerField(default=0, verbose_name="Počet vynechaných řádků")
+    error = models.TextField(blank=True, verbose_name="Chyba")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Vytvořeno")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Zahájeno")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Dokončeno")
+
+    class Meta:
+        verbose_name = "Import transakcí"
+        verbose_name_plural = "Importy transakcí"
+        indexes = [models.Index(fields=['status', 'created_at'], name='importjob_status_created_idx')]
+
+    def __str__(self):
+        """Textová reprezentace importu."""
+        return f"Import #{self.pk} ({self.book}): {self.get_status_display()}"
+
+    @property
+    def is_finished(self):
+        """Vrací True, pokud import skončil (úspěšně nebo chybou)."""
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED)
+
+    def progress(self):
+        """Stav importu pro JSON endpoint; seznam vynechaných řádků se posílá až po dokončení."""
+        data = {
+            'id': self.pk,
+            'status': self.status,
+            'status_display': self.get_status_display(),
+            'processed': self.processed,
+            'added': self.added,
+            'skipped': self.skipped_count,
+            'finished': self.is_finished,
+            'error': self.error,
+        }
+        if self.is_finished:
+            data['skipped_rows'] = self.skipped
+        return data
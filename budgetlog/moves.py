@@ -0,0 +1,81 @@
+"""
+Hromadný přesun transakcí do jiné knihy.
+
+Kategorie a tagy patří knize, proto se při přesunu transakcí nahradí stejnojmennými kategoriemi a tagy cílové
+knihy (chybějící se vytvoří jako kopie). Vše probíhá po množinách v jedné databázové transakci: počet dotazů je
+stejný pro jednu transakci i pro celý rok dat.
+"""
+
+# Django importy
+from django.db import transaction as db_transaction
+from django.db.models import Case, Value, When
+
+# Lokální aplikace
+from . import rollups
+from .models import Category, Tag, Transaction
+
+# Tag, kterým se označí přesunuté transakce
+MOVED_TAG_NAME = 'Přesunuto'
+
+
+def counterparts(model, sources, book, extra_names=()):
+    """
+    Najde v cílové knize objekty (kategorie / tagy) se stejnými názvy jako `sources` a chybějící vytvoří jedním
+    bulk_create s kopií barvy a popisu. Pokud v cílové knize objekt s daným názvem už existuje, zůstávají jeho
+    barva a popis beze změny.
+
+    :param extra_names: Názvy, které musí v cílové knize existovat, i když nejsou mezi `sources`.
+    :return: Slovník {název: objekt v cílové knize}.
+    """
+    sources = list(sources)
+    names = {source.name for source in sources} | set(extra_names)
+    existing = {obj.name: obj for obj in model.objects.filter(book=book, name__in=names)}
+    missing = {}
+    for source in sources:
+        if source.name not in existing and source.name not in missing:
+            missing[source.name] = model(name=source.name, book=book, color=source.color,
+                                         description=source.description)
+    for name in set(extra_names) - existing.keys() - missing.keys():
+        missing[name] = model(name=name, book=book)
+    existing.update({obj.name: obj for obj in model.objects.bulk_create(missing.values())})
+    return existing
+
+
+def move_transactions(queryset, book):
+    """
+    Přesune transakce z querysetu do knihy `book` a označí je tagem "Přesunuto".
+
+    Kategorie a tagy se přemapují na stejnojmenné v cílové knize: kniha a kategorie jedním UPDATE transakcí (souhrny
+    se posunou na nové klíče), vazby na tagy jedním UPDATE propojovací tabulky.
+
+    :return: Počet přesunutých transakcí.
+    """
+    through = Transaction.tags.through
+    with db_transaction.atomic():
+        categories = list(Category.objects.filter(pk__in=queryset.order_by().values('category_id')))
+        target_categories = counterparts(Category, categories, book)
+        category_map = {category.pk: target_categories[category.name] for category in categories}
+
+        tags = list(Tag.objects.filter(pk__in=through.objects.filter(
+            transaction__in=queryset.order_by().values('id')).values('tag_id')))
+        target_tags = counterparts(Tag, tags, book, extra_names=[MOVED_TAG_NAME])
+        moved_tag = target_tags[MOVED_TAG_NAME]
+
+        # Tag "Přesunuto" se přidá dřív, než se transakce přesunou, protože queryset může filtrovat podle knihy
+        queryset.add_tag(moved_tag)
+        moved = rollups.update_transactions(queryset, book=book, category=category_map)
+
+        # Vazby přesunutých transakcí jsou teď jediné, které v cílové knize ukazují na tagy jiné knihy
+        tag_map = {tag.pk: target_tags[tag.name].pk for tag in tags if tag.book_id != book.pk}
+        links = through.objects.filter(transaction__book=book)
+        # Původní "Přesunuto" by kolidovalo s právě přidaným tagem cílové knihy
+        duplicates = [old for old, new in tag_map.items() if new == moved_tag.pk]
+        if duplicates:
+            links.filter(tag_id__in=duplicates).delete()
+            for old in duplicates:
+                del tag_map[old]
+        if tag_map:
+            links.filter(tag_id__in=tag_map).update(
+                tag=Case(*[When(tag_id=old, then=Value(new)) for old, new in tag_map.items()]),
+            )
+        return moved
@@ -0,0 +1,114 @@
+"""
+Stránkování podle klíče (keyset / seek) pro dlouhé seznamy transakcí.
+
+Místo OFFSET se další stránka vybírá podmínkou "za posledním zobrazeným řádkem" nad řazením (datum, id), takže
+každá stránka stojí stejně bez ohledu na to, jak hluboko v seznamu je, a není potřeba COUNT přes celý výsledek.
+Pozice se předává jako neprůhledný kurzor v URL.
+"""
+
+# Standardní knihovny Pythonu
+import base64
+import binascii
+import json
+from datetime import date
+
+# Django importy
+from django.core.paginator import Paginator
+from django.db.models import Q
+
+
+class InvalidCursor(Exception):
+    """Kurzor z URL nelze dekódovat."""
+
+
+def encode_cursor(datestamp, pk, direction):
+    """Zakóduje pozici (datum, id) a směr ('next' / 'prev') do neprůhledného řetězce pro URL."""
+    payload = json.dumps([datestamp.isoformat(), pk, direction], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('ascii')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Dekóduje kurzor na (datum, id, směr). Při neplatném kurzoru vyhodí InvalidCursor."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        datestamp, pk, direction = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if direction not in ('next', 'prev'):
+            raise ValueError(direction)
+        return date.fromisoformat(datestamp), int(pk), direction
+    except (binascii.Error, UnicodeError, TypeError, ValueError) as e:
+        raise InvalidCursor(cursor) from e
+
+
+class CountedPaginator(Paginator):
+    """Číslované stránkování s předem známým počtem řádků (např. z agregačního dotazu), bez vlastního COUNT."""
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count = count
+
+
+class KeysetPage:
+    """Jedna stránka výsledků; rozhraní se podobá django.core.paginator.Page (iterace, has_next, has_previous)."""
+
+    def __init__(self, object_list, has_next, has_previous):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    @property
+    def next_cursor(self):
+        """Kurzor na následující stránku, nebo None na poslední stránce."""
+        if not self._has_next or not self.object_list:
+            return None
+        last = self.object_list[-1]
+        return encode_cursor(last.datestamp, last.pk, 'next')
+
+    @property
+    def previous_cursor(self):
+        """Kurzor na předchozí stránku, nebo None na první stránce."""
+        if not self._has_previous or not self.object_list:
+            return None
+        first = self.object_list[0]
+        return encode_cursor(first.datestamp, first.pk, 'prev')
+
+
+class KeysetPaginator:
+    """Stránkování transakcí sestupně podle (datestamp, id) bez OFFSET a bez COUNT."""
+
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset
+        self.per_page = per_page
+
+    def page(self, cursor=None):
+        """
+        Vrátí stránku za (směr 'next') nebo před (směr 'prev') pozicí v kurzoru; bez kurzoru první stránku.
+
+        :raises InvalidCursor: Pokud kurzor nelze dekódovat.
+        """
+        if not cursor:
+            rows = list(self.queryset.order_by('-datestamp', '-id')[:self.per_page + 1])
+            return KeysetPage(rows[:self.per_page], has_next=len(rows) > self.per_page, has_previous=False)
+
+        datestamp, pk, direction = decode_cursor(cursor)
+        if direction == 'next':
+            after = Q(datestamp__lt=datestamp) | Q(datestamp=datestamp, id__lt=pk)
+            rows = list(self.queryset.filter(after).order_by('-datestamp', '-id')[:self.per_page + 1])
+            return KeysetPage(rows[:self.per_page], has_next=len(rows) > self.per_page, has_previous=True)
+
+        before = Q(datestamp__gt=datestamp) | Q(datestamp=datestamp, id__gt=pk)
+        rows = list(self.queryset.filter(before).order_by('datestamp', 'id')[:self.per_page + 1])
+        page_rows = rows[:self.per_page]
+        page_rows.reverse()
+        return KeysetPage(page_rows, has_next=True, has_previous=len(rows) > self.per_page)
@@ -0,0 +1,345 @@
+"""
+Výpočty pro roční a měsíční přehledy nad předpočítanými měsíčními souhrny, nebo nad sloupci transakcí knihy
+načtenými do paměti (BookAnalytics, nastavení ANALYTICS_ENGINE = 'numpy').
+"""
+
+# Standardní knihovny Pythonu
+from datetime import date
+from decimal import Decimal
+
+# Django importy
+from django.db import connections
+
+# Třetí strany
+import numpy as np
+
+# Lokální aplikace
+from . import caching
+from .models import Category, MonthlyCategoryRollup, Transaction
+
+# Počet knih, jejichž sloupce si worker drží v paměti (vedle sdílené cache)
+ANALYTICS_MEMORY_BOOKS = 8
+
+_loaded = {}
+
+
+class YearlyCategoryPivot:
+    """
+    Matice kategorie × měsíc pro jeden rok knihy, sestavená z jediného dotazu nad měsíčními souhrny.
+
+    Částky jsou uloženy jako celé haléře (int64), takže součty a průměry nejsou zatíženy chybou plovoucí čárky.
+    Poslední řádek matic patří transakcím bez kategorie, aby seděly celkové součty.
+    """
+
+    def __init__(self, book, year, analytics=None):
+        """
+        :param analytics: BookAnalytics knihy; pokud je zadán, matice se sečtou z něj místo z měsíčních souhrnů.
+        """
+        self.year = year
+        self.categories = list(Category.objects.filter(book=book))
+        row_index = {category.id: index for index, category in enumerate(self.categories)}
+        uncategorized = len(self.categories)
+
+        shape = (len(self.categories) + 1, 12)
+        self.income = np.zeros(shape, dtype=np.int64)
+        self.expense = np.zeros(shape, dtype=np.int64)
+        self.counts = np.zeros(shape, dtype=np.int64)
+
+        if analytics is not None:
+            analytics.fill_pivot(year, row_index, self.income, self.expense, self.counts)
+        else:
+            rows = MonthlyCategoryRollup.objects.filter(book=book, year=year).values_list(
+                'category_id', 'month', 'type', 'total', 'count')
+            for category_id, month, type_, total, count in rows:
+                row = row_index.get(category_id, uncategorized)
+                target = self.expense if type_ == 'expense' else self.income
+                target[row, month - 1] += int(total * 100)
+                self.counts[row, month - 1] += count
+
+        self.balances = self.income - self.expense
+
+    @staticmethod
+    def to_decimal(cents):
+        """Převede částku v haléřích na Decimal v korunách."""
+        return Decimal(int(cents)) / 100
+
+    @property
+    def month_columns(self):
+        """Indexy sloupců (0–11) měsíců, ve kterých existuje alespoň jedna transakce."""
+        return np.flatnonzero(self.counts.sum(axis=0))
+
+    @property
+    def months(self):
+        """Seznam měsíců (date, první den v měsíci) s alespoň jednou transakcí."""
+        return [date(self.year, column + 1, 1) for column in self.month_columns]
+
+    def totals(self):
+        """Vrací (příjmy, výdaje, bilance) za celý rok jako float."""
+        total_income = float(self.to_decimal(self.income.sum()))
+        total_expense = float(self.to_decimal(self.expense.sum()))
+        return total_income, total_expense, total_income - total_expense
+
+    def category_summaries(self, month_count):
+        """
+        Vrátí kategorie seřazené podle roční bilance s atributy `total` a `monthly_average`.
+
+        :param month_count: Počet měsíců, kterými se dělí roční bilance pro výpočet průměru.
+        """
+        yearly = self.balances[:-1].sum(axis=1)
+        for category, cents in zip(self.categories, yearly):
+            category.total = self.to_decimal(cents)
+            category.monthly_average = category.total / month_count
+        return sorted(self.categories, key=lambda category: category.total, reverse=True)
+
+    def monthly_data(self):
+        """Vrátí {název kategorie: [bilance po měsících]} pro graf; sloupce odpovídají `months`."""
+        values = self.balances[:-1, self.month_columns] / 100
+        return {category.name: row for category, row in zip(self.categories, values.tolist())}
+
+    def monthly_balances(self):
+        """Vrátí {název kategorie: {měsíc: bilance}} pro měsíce s transakcemi."""
+        months = self.months
+        return {name: dict(zip(months, row)) for name, row in self.monthly_data().items()}
+
+
+def to_cents(amount):
+    """Převede částku (Decimal, int, float) na celé haléře."""
+    return int((Decimal(str(amount)) * 100).to_integral_value())
+
+
+def fetch_columns(queryset, width):
+    """
+    Vrátí sloupce querysetu (values_list s `width` poli) jako pole NumPy typu object (řádek × sloupec). Řádky se
+    čtou přímo z kurzoru databáze, bez převodu částek na Decimal po řádcích; typy se převedou po celých sloupcích.
+    """
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    columns = np.empty((len(rows), width), dtype=object)
+    if rows:
+        columns[:] = rows
+    return columns
+
+
+class BookAnalytics:
+    """
+    Transakce jedné knihy jako sloupce NumPy pro přehledy počítané v paměti.
+
+    Sloupce se načtou jedním dotazem nad transakcemi a jedním nad propojovací tabulkou tagů a do změny dat knihy
+    se drží v cache (viz for_book). Filtr je booleovská maska nad sloupci (viz select), součty, průměry, extrémy,
+    percentily i pivot kategorie × měsíc jsou vektorové operace bez dalších dotazů. Parametr `mask` výpočtů
+    přijímá masku ze select(), úsek řádků z period() (bez kopírování sloupců), nebo None pro celou knihu.
+
+    Částky jsou celé haléře (int64) se znaménkem jako Transaction.signed_amount (výdaj záporný). Tagy jsou bitmapa
+    (transakce × bajty, np.packbits): bit tagu `tag_ids[i]` je i-tý bit řádku.
+    """
+
+    # Podmínky filtru seznamu transakcí, které umí select(); ostatní (fulltext v popisu) se počítají v SQL
+    FILTERS = ('amount_min', 'amount_max', 'type', 'datestamp__gte', 'datestamp__lte', 'category', 'tags',
+               'tag_mode')
+
+    def __init__(self, ids, dates, cents, category_ids, expense, tag_ids, tag_bitmap):
+        self.ids = ids                    # ID transakcí (int64); řádky jsou seřazené podle data a ID
+        self.dates = dates                # Datum transakce (datetime64[D], dny od 1. 1. 1970)
+        self.cents = cents                # Částka se znaménkem v haléřích (int64)
+        self.category_ids = category_ids  # ID kategorie, -1 = bez kategorie (int64)
+        self.expense = expense            # True u výdajů
+        self.tag_ids = tag_ids            # Seřazená ID tagů použitých v knize (int64)
+        self.tag_bitmap = tag_bitmap      # Bitmapa tagů (uint8, transakce × ceil(počet tagů / 8))
+        self.years = dates.astype('datetime64[Y]').astype(np.int64) + 1970
+        self.months = dates.astype('datetime64[M]').astype(np.int64) % 12 + 1
+
+    @classmethod
+    def load(cls, book):
+        """Načte sloupce transakcí knihy dvěma dotazy."""
+        columns = fetch_columns(Transaction.objects.filter(book=book).order_by('id').values_list(
+            'id', 'datestamp', 'signed_amount', 'category_id', 'type'), 5)
+
+        ids = columns[:, 0].astype(np.int64)
+        # Převod z date přes ordinál je řádově rychlejší než astype('datetime64[D]') nad objekty
+        epoch = date(1970, 1, 1).toordinal()
+        dates = (np.fromiter((day.toordinal() for day in columns[:, 1]), dtype=np.int64, count=len(columns))
+                 - epoch).astype('datetime64[D]')
+        # Částky mají nejvýše 10 číslic, v float64 se po zaokrouhlení na haléře nic neztratí
+        cents = np.rint(columns[:, 2].astype(np.float64) * 100).astype(np.int64)
+        category_ids = columns[:, 3]
+        category_ids = np.where(category_ids == None, -1, category_ids).astype(np.int64)  # noqa: E711
+        expense = columns[:, 4] == 'expense'
+
+        through = Transaction.tags.through
+        links = fetch_columns(through.objects.filter(transaction__book=book).values_list(
+            'transaction_id', 'tag_id'), 2).astype(np.int64)
+        link_transactions, link_tags = links[:, 0], links[:, 1]
+        tag_ids = np.unique(link_tags)
+        tag_bitmap = np.zeros((len(ids), (len(tag_ids) + 7) // 8), dtype=np.uint8)
+        bits = np.searchsorted(tag_ids, link_tags)
+        np.bitwise_or.at(tag_bitmap, (np.searchsorted(ids, link_transactions), bits // 8),
+                         (128 >> (bits % 8)).astype(np.uint8))
+
+        # Řádky podle data (a ID), takže období je souvislý úsek sloupců (viz period)
+        order = np.lexsort((ids, dates))
+        return cls(ids[order], dates[order], cents[order], category_ids[order], expense[order], tag_ids,
+                   tag_bitmap[order])
+
+    @classmethod
+    def for_book(cls, book):
+        """
+        Vrátí sloupce knihy platné pro její aktuální verzi: z paměti workeru, ze sdílené cache, nebo z databáze.
+        Po změně dat knihy se verze zvýší (viz caching) a sloupce se načtou znovu.
+        """
+        key = caching.cache_key(book.pk, 'analytics')
+        loaded = _loaded.get(book.pk)
+        if loaded is not None and loaded[0] == key:
+            return loaded[1]
+        analytics = caching.get_or_compute(book, 'analytics', {}, lambda: cls.load(book))
+        if len(_loaded) >= ANALYTICS_MEMORY_BOOKS:
+            _loaded.clear()
+        _loaded[book.pk] = (key, analytics)
+        return analytics
+
+    @classmethod
+    def supports(cls, params):
+        """Vrátí True, pokud select() umí všechny vyplněné podmínky filtru (cleaned_data seznamu transakcí)."""
+        return all(name in cls.FILTERS for name, value in params.items() if value not in (None, '', [], ()))
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def amounts(self):
+        """Částky bez znaménka (hodnota pole amount) v haléřích."""
+        return np.where(self.expense, -self.cents, self.cents)
+
+    def period(self, start, end):
+        """Úsek řádků (slice) s datem v intervalu [start, end); řádky jsou seřazené podle data."""
+        first, last = np.searchsorted(self.dates, [np.datetime64(start, 'D'), np.datetime64(end, 'D')])
+        return slice(int(first), int(last))
+
+    def has_tag(self, tag_id):
+        """Maska transakcí s daným tagem."""
+        position = np.searchsorted(self.tag_ids, tag_id)
+        if position == len(self.tag_ids) or self.tag_ids[position] != tag_id:
+            return np.zeros(len(self), dtype=bool)
+        return (self.tag_bitmap[:, position // 8] & (128 >> (position % 8))) != 0
+
+    def select(self, amount_min=None, amount_max=None, type=None, datestamp__gte=None, datestamp__lte=None,
+               category=None, tags=None, tag_mode=None, year=None, month=None, **params):
+        """
+        Vrátí masku transakcí odpovídajících filtru; podmínky mají stejný význam jako v TransactionFilter
+        (tagy v režimu tag_mode jako TransactionQuerySet.with_tags), navíc lze vybrat rok a měsíc.
+
+        :raises ValueError: Pokud filtr obsahuje vyplněnou podmínku, kterou engine neumí (viz supports).
+        """
+        unsupported = [name for name, value in params.items() if value not in (None, '', [], ())]
+        if unsupported:
+            raise ValueError(f'Podmínky filtru {unsupported} nelze vyhodnotit nad sloupci knihy')
+        mask = np.ones(len(self), dtype=bool)
+        if amount_min is not None:
+            mask &= self.amounts >= to_cents(amount_min)
+        if amount_max is not None:
+            mask &= self.amounts <= to_cents(amount_max)
+        if type:
+            mask &= self.expense == (type == 'expense')
+        if datestamp__gte is not None:
+            mask &= self.dates >= np.datetime64(datestamp__gte, 'D')
+        if datestamp__lte is not None:
+            mask &= self.dates <= np.datetime64(datestamp__lte, 'D')
+        if category is not None:
+            mask &= self.category_ids == getattr(category, 'pk', category)
+        if year is not None:
+            mask &= self.years == year
+        if month is not None:
+            mask &= self.months == month
+
+        tag_ids = {getattr(tag, 'pk', tag) for tag in tags or ()}
+        if tag_ids:
+            tag_mode = tag_mode or 'all'
+            if tag_mode not in ('all', 'any', 'none'):
+                raise ValueError(f'Neznámý režim filtru tagů: {tag_mode!r}')
+            tagged = [self.has_tag(tag_id) for tag_id in tag_ids]
+            if tag_mode == 'all':
+                mask &= np.logical_and.reduce(tagged)
+            elif tag_mode == 'any':
+                mask &= np.logical_or.reduce(tagged)
+            else:
+                mask &= ~np.logical_or.reduce(tagged)
+        return mask
+
+    def totals(self, mask=None):
+        """Vrací (příjmy, výdaje, bilance) vybraných transakcí jako float (jako calculate_totals)."""
+        cents = self.cents if mask is None else self.cents[mask]
+        is_expense = self.expense if mask is None else self.expense[mask]
+        income = int(cents[~is_expense].sum())
+        expense = -int(cents[is_expense].sum())
+        return (float(YearlyCategoryPivot.to_decimal(income)), float(YearlyCategoryPivot.to_decimal(expense)),
+                float(YearlyCategoryPivot.to_decimal(income - expense)))
+
+    def aggregates(self, mask=None):
+        """Vrací statistiky vybraných transakcí ve tvaru TransactionSummaryMixin.get_aggregates."""
+        cents = self.cents if mask is None else self.cents[mask]
+        if not cents.size:
+            return {'average_amount': 0, 'max_transaction_amount': 0, 'min_transaction_amount': 0, 'balance': 0,
+                    'transaction_count': 0}
+        total = int(cents.sum())
+        return {
+            # Stejně jako průměr z SQL (DecimalField se dvěma desetinnými místy) zaokrouhlený na haléře
+            'average_amount': (Decimal(total) / cents.size / 100).quantize(Decimal('0.01')),
+            'max_transaction_amount': YearlyCategoryPivot.to_decimal(cents.max()),
+            'min_transaction_amount': YearlyCategoryPivot.to_decimal(cents.min()),
+            'balance': YearlyCategoryPivot.to_decimal(total),
+            'transaction_count': int(cents.size),
+        }
+
+    def percentiles(self, percents=(25, 50, 75), mask=None):
+        """Vrátí percentily částek se znaménkem vybraných transakcí v korunách (lineární interpolace)."""
+        cents = self.cents if mask is None else self.cents[mask]
+        if not cents.size:
+            return [None] * len(percents)
+        return [(Decimal(str(value)) / 100).quantize(Decimal('0.01'))
+                for value in np.percentile(cents, percents).tolist()]
+
+    def category_totals(self, mask=None):
+        """
+        Vrátí součty vybraných transakcí po kategoriích: ({ID kategorie: bilance}, {ID kategorie: výdaje}) v
+        haléřích; transakce bez kategorie jsou pod klíčem None.
+        """
+        category_ids = self.category_ids if mask is None else self.category_ids[mask]
+        cents = self.cents if mask is None else self.cents[mask]
+        is_expense = self.expense if mask is None else self.expense[mask]
+        keys, rows = np.unique(category_ids, return_inverse=True)
+        balances = np.zeros(len(keys), dtype=np.int64)
+        expenses = np.zeros(len(keys), dtype=np.int64)
+        np.add.at(balances, rows, cents)
+        np.add.at(expenses, rows, np.where(is_expense, -cents, 0))
+        keys = [None if key == -1 else key for key in keys.tolist()]
+        return dict(zip(keys, balances.tolist())), dict(zip(keys, expenses.tolist()))
+
+    def fill_pivot(self, year, row_index, income, expense, counts):
+        """
+        Přičte transakce roku do matic kategorie × měsíc (viz YearlyCategoryPivot).
+
+        :param row_index: {ID kategorie: řádek}; ostatní transakce patří do posledního řádku.
+        """
+        rows = self.period(date(year, 1, 1), date(year + 1, 1, 1))
+        category_ids = self.category_ids[rows]
+        columns = self.months[rows] - 1
+        cents = self.cents[rows]
+        is_expense = self.expense[rows]
+
+        # Řádky matice pro ID kategorií přes seřazené klíče (searchsorted), neznámé kategorie do posledního řádku
+        rows = np.full(len(category_ids), len(row_index), dtype=np.int64)
+        if row_index:
+            keys = np.array(sorted(row_index), dtype=np.int64)
+            values = np.array([row_index[key] for key in keys.tolist()], dtype=np.int64)
+            positions = np.minimum(np.searchsorted(keys, category_ids), len(keys) - 1)
+            found = keys[positions] == category_ids
+            rows[found] = values[positions[found]]
+
+        # Součty po buňkách matice jedním bincount nad indexem řádek × 12 + sloupec; váhy jsou float64, součty
+        # haléřů jsou v něm přesné až do 2^53
+        cells = rows * 12 + columns
+        shape, size = income.shape, income.size
+        income += np.rint(np.bincount(cells, np.where(is_expense, 0, cents), size)).astype(np.int64).reshape(shape)
+        expense += np.rint(np.bincount(cells, np.where(is_expense, -cents, 0), size)).astype(np.int64).reshape(shape)
+        counts += np.bincount(cells, minlength=size).reshape(shape)
@@ -0,0 +1,212 @@
+"""
+Údržba předpočítaných měsíčních souhrnů (MonthlyCategoryRollup).
+
+Souhrny drží součet a počet transakcí pro klíč (kniha, rok, měsíc, kategorie, typ). Jednotlivé uložení transakce je
+zpracováno signály (budgetlog.signals), smazání metodami Transaction.delete a TransactionQuerySet.delete. Hromadné
+operace (queryset.update/delete, import CSV) vypnou signály pomocí `suspended()` a souhrny posunou najednou po
+skupinách, takže počet dotazů závisí na počtu skupin, nikoli na počtu transakcí. Při kaskádě ze smazané knihy nebo
+uživatele se souhrny neupravují vůbec, zaniknou spolu s knihou.
+"""
+
+# Standardní knihovny Pythonu
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from decimal import Decimal
+
+# Django importy
+from django.db import connection, models, transaction as db_transaction
+from django.db.models import Case, Count, F, Sum, Value, When
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+# Lokální aplikace
+from . import caching
+from .models import Book, MonthlyCategoryRollup, Transaction
+
+_state = threading.local()
+
+# Pole transakce, která tvoří klíč souhrnu a lze je měnit hromadným updatem
+KEY_FIELDS = ('book', 'category', 'type')
+
+
+@contextmanager
+def suspended():
+    """Dočasně vypne aktualizaci souhrnů ze signálů; volající je zodpovědný za jejich ruční úpravu."""
+    depth = getattr(_state, 'depth', 0)
+    _state.depth = depth + 1
+    try:
+        yield
+    finally:
+        _state.depth = depth
+
+
+def is_suspended():
+    """Vrací True, pokud je aktualizace souhrnů ze signálů vypnutá."""
+    return getattr(_state, 'depth', 0) > 0
+
+
+def group_queryset(queryset):
+    """Seskupí transakce z querysetu jedním GROUP BY dotazem na {klíč: (součet, počet)}."""
+    rows = queryset.order_by().values(
+        'book_id', 'category_id', 'type', year=ExtractYear('datestamp'), month=ExtractMonth('datestamp')
+    ).annotate(total=Sum('amount'), count=Count('id'))
+    return {
+        (row['book_id'], row['year'], row['month'], row['category_id'], row['type']): (row['total'], row['count'])
+        for row in rows
+    }
+
+
+def group_instances(instances):
+    """Seskupí transakce načtené v paměti (např. čerstvě vytvořené) na {klíč: (součet, počet)}."""
+    date_field = Transaction._meta.get_field('datestamp')
+    amount_field = Transaction._meta.get_field('amount')
+    groups = defaultdict(lambda: [Decimal('0'), 0])
+    for instance in instances:
+        datestamp = date_field.to_python(instance.datestamp)  # default=timezone.now vrací datetime
+        key = (instance.book_id, datestamp.year, datestamp.month, instance.category_id, instance.type)
+        groups[key][0] += amount_field.to_python(instance.amount)
+        groups[key][1] += 1
+    return {key: (total, count) for key, (total, count) in groups.items()}
+
+
+def apply(groups, sign=1):
+    """
+    Přičte (sign=1) nebo odečte (sign=-1) seskupené hodnoty od uložených souhrnů.
+
+    Dotčené souhrny se vyhledají jedním dotazem, přírůstky se zapíšou jedním dávkovým UPDATE (executemany)
+    a chybějící souhrny jedním bulk_create, takže počet dotazů nezávisí na počtu skupin.
+    """
+    groups = {key: value for key, value in groups.items() if value[1]}
+    if not groups:
+        return
+    # Hromadné zápisy obcházejí signály, uložené výsledky dotčených knih se zneplatní zde
+    caching.bump_book_version(*{key[0] for key in groups})
+    with db_transaction.atomic():
+        candidates = MonthlyCategoryRollup.objects.filter(
+            book_id__in={key[0] for key in groups},
+            year__in={key[1] for key in groups},
+            month__in={key[2] for key in groups},
+        ).values_list('pk', 'book_id', 'year', 'month', 'category_id', 'type')
+        increments = []
+        for pk, *key in candidates:
+            key = tuple(key)
+            if key in groups:
+                total, count = groups.pop(key)
+                increments.append((sign * total, sign * count, pk))
+
+        if increments:
+            # Přírůstek přímo v SQL (total = total + ?), aby se souběžné úpravy stejného souhrnu neztratily
+            qn = connection.ops.quote_name
+            table, total_col, count_col, pk_col = (qn(name) for name in (
+                MonthlyCategoryRollup._meta.db_table, 'total', 'count', 'id'))
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f'UPDATE {table} SET {total_col} = {total_col} + %s, {count_col} = {count_col} + %s '
+                    f'WHERE {pk_col} = %s',
+                    increments,
+                )
+
+        if sign > 0:
+            MonthlyCategoryRollup.objects.bulk_create([
+                MonthlyCategoryRollup(book_id=book_id, year=year, month=month, category_id=category_id, type=type_,
+                                      total=total, count=count)
+                for (book_id, year, month, category_id, type_), (total, count) in groups.items()
+            ], batch_size=500)
+        else:
+            # Úklid souhrnů, ve kterých už nezbyla žádná transakce
+            MonthlyCategoryRollup.objects.filter(pk__in=[pk for _, _, pk in increments], count=0).delete()
+
+
+def add_queryset(queryset):
+    """Přičte transakce z querysetu k souhrnům."""
+    apply(group_queryset(queryset), 1)
+
+
+def subtract_queryset(queryset):
+    """Odečte transakce z querysetu od souhrnů (volá se před jejich smazáním)."""
+    apply(group_queryset(queryset), -1)
+
+
+def add_instances(instances):
+    """Přičte transakce načtené v paměti k souhrnům."""
+    apply(group_instances(instances), 1)
+
+
+def update_transactions(queryset, **changes):
+    """
+    Hromadně upraví transakce (queryset.update) a souhrny posune ze starých klíčů na nové.
+
+    :param queryset: Queryset transakcí, které se mají upravit.
+    :param changes: Nové hodnoty; klíč souhrnu mohou měnit pouze pole 'book', 'category' a 'type'. Místo jedné
+        hodnoty lze předat slovník {stará hodnota: nová hodnota}, který se provede jedním UPDATE s CASE.
+    :return: Počet upravených transakcí.
+    """
+    replacements = {}
+    for name, value in list(changes.items()):
+        field_name = name[:-3] if name.endswith('_id') else name
+        if field_name == 'datestamp':
+            raise ValueError("Hromadná změna data transakcí není podporována, souhrny by nešlo posunout.")
+        if isinstance(value, dict):
+            value = {old: new.pk if isinstance(new, models.Model) else new for old, new in value.items()}
+            if not value:
+                del changes[name]
+                continue
+            field = Transaction._meta.get_field(field_name)
+            changes[name] = Case(
+                *[When(**{field.attname: old}, then=Value(new)) for old, new in value.items()],
+                default=F(field.attname), output_field=field,
+            )
+        if field_name in KEY_FIELDS:
+            replacements[field_name] = value.pk if isinstance(value, models.Model) else value
+
+    with db_transaction.atomic(), suspended():
+        groups = group_queryset(queryset) if replacements else {}
+        updated = queryset.update(**changes)
+        if groups:
+            moved = defaultdict(lambda: [Decimal('0'), 0])
+            def replace(field_name, current):
+                replacement = replacements.get(field_name, current)
+                return replacement.get(current, current) if isinstance(replacement, dict) else replacement
+
+            for (book_id, year, month, category_id, type_), (total, count) in groups.items():
+                key = (
+                    replace('book', book_id), year, month, replace('category', category_id), replace('type', type_),
+                )
+                moved[key][0] += total
+                moved[key][1] += count
+            apply(groups, -1)
+            apply({key: tuple(value) for key, value in moved.items()}, 1)
+    return updated
+
+
+def delete_transactions(queryset):
+    """Smaže transakce z querysetu a odečte je od souhrnů. Vrací počet smazaných transakcí."""
+    _, deleted_per_model = queryset.delete()  # Souhrny odečte TransactionQuerySet.delete
+    return deleted_per_model.get(Transaction._meta.label, 0)
+
+
+def rebuild(book_ids=None):
+    """
+    Přepočítá souhrny od začátku z tabulky transakcí.
+
+    :param book_ids: Seznam ID knih, jejichž souhrny se mají přepočítat (None = všechny knihy).
+    :return: Počet vytvořených řádků souhrnů.
+    """
+    rollups = MonthlyCategoryRollup.objects.all()
+    transactions = Transaction.objects.all()
+    if book_ids is not None:
+        rollups = rollups.filter(book_id__in=book_ids)
+        transactions = transactions.filter(book_id__in=book_ids)
+
+    with db_transaction.atomic():
+        rollups.delete()
+        created = MonthlyCategoryRollup.objects.bulk_create(
+            [
+                MonthlyCategoryRollup(book_id=book_id, year=year, month=month, category_id=category_id, type=type_,
+                                      total=total, count=count)
+                for (book_id, year, month, category_id, type_), (total, count) in group_queryset(transactions).items()
+            ],
+            batch_size=500,
+        )
+    caching.bump_book_version(*(book_ids if book_ids is not None else Book.objects.values_list('id', flat=True)))
+    return len(created)
@@ -0,0 +1,76 @@
+"""
+Fulltextové vyhledávání v popisech transakcí.
+
+Na SQLite se popisy indexují ve virtuální tabulce FTS5 (budgetlog_transaction_fts, viz migrace 0005), kterou
+udržují v souladu s tabulkou transakcí databázové triggery, takže se zapíše i hromadný import, queryset.update
+nebo mazání. Tokenizer unicode61 s remove_diacritics ignoruje velikost písmen i českou diakritiku ("kava" najde
+"Káva") a každé slovo dotazu se hledá jako prefix. Výsledky se řadí podle relevance (bm25).
+
+Na ostatních databázích (nebo bez FTS5) se použije původní `icontains`.
+"""
+
+# Standardní knihovny Pythonu
+import re
+
+# Django importy
+from django.db import connections, models
+from django.db.models import Lookup
+
+# Virtuální tabulka s indexem popisů (rowid = id transakce)
+FTS_TABLE = 'budgetlog_transaction_fts'
+
+# Slova dotazu; vše ostatní (uvozovky, operátory FTS5, interpunkce) se zahodí
+WORD_PATTERN = re.compile(r'\w+')
+
+_available = {}
+
+
+class FullTextField(models.TextField):
+    """Sloupec fulltextového indexu; podporuje lookup `match` (operátor MATCH v FTS5)."""
+
+
+@FullTextField.register_lookup
+class Match(Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', [*lhs_params, *rhs_params]
+
+
+def fts_query(text):
+    """
+    Převede text z formuláře na dotaz FTS5: každé slovo v uvozovkách jako prefix, slova spojená operátorem AND.
+    Vrátí None, pokud text neobsahuje žádné slovo.
+    """
+    words = WORD_PATTERN.findall(text)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def is_available(using='default'):
+    """Vrátí True, pokud databáze má fulltextový index popisů (SQLite s FTS5 po migraci 0005)."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    key = (using, str(connection.settings_dict['NAME']))
+    if key not in _available:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            _available[key] = cursor.fetchone() is not None
+    return _available[key]
+
+
+def search_description(queryset, text):
+    """
+    Vyfiltruje transakce, jejichž popis obsahuje všechna slova z `text` (jako prefixy, bez ohledu na diakritiku),
+    a seřadí je podle relevance, při shodě od nejnovější.
+    """
+    if not is_available(queryset.db):
+        return queryset.filter(description__icontains=text)
+    query = fts_query(text)
+    if query is None:
+        return queryset
+    return queryset.filter(search__description__match=query).order_by('search__rank', '-datestamp', '-id')
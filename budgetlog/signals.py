@@ -1,6 +1,7 @@
-from django.db.models.signals import post_save, pre_delete
+from django.db.models.signals import m2m_changed, post_save, pre_delete, pre_save, post_delete
 from django.dispatch import receiver
-from .models import Category, Book, Transaction
+from . import caching, rollups
+from .models import AppUser, Category, Book, Tag, Transaction
 
 
 @receiver(post_save, sender=Book)
@@ -10,11 +11,68 @@ def create_default_category_and_account(sender, instance, created, **kwargs):
 
 
 @receiver(pre_delete, sender=Category)
-def assign_default_category(sender, instance, **kwargs):
+def assign_default_category(sender, instance, origin=None, **kwargs):
+    # Při kaskádě ze smazané knihy nebo uživatele zaniknou transakce i souhrny s knihou, přeřazovat je nemá smysl
+    if origin is not None and getattr(origin, 'model', type(origin)) is not Category:
+        return
     try:
         default_category = Category.objects.get(book=instance.book, is_default=True)
     except Category.DoesNotExist:
         # Zajištění, že existuje výchozí kategorie
         default_category = Category.objects.create(name='Nezařazeno', book=instance.book, is_default=True)
 
-    Transaction.objects.filter(category=instance).update(category=default_category)
+    rollups.update_transactions(Transaction.objects.filter(category=instance), category=default_category)
+
+
+@receiver(pre_save, sender=Transaction)
+def remember_rollup_key(sender, instance, raw=False, **kwargs):
+    # Zapamatování původního klíče souhrnu, aby ho post_save mohl odečíst
+    instance._rollup_previous = None
+    if instance.pk and not raw and not rollups.is_suspended():
+        instance._rollup_previous = rollups.group_queryset(Transaction.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Transaction)
+def update_rollup_on_save(sender, instance, raw=False, **kwargs):
+    if raw or rollups.is_suspended():
+        return
+    previous = getattr(instance, '_rollup_previous', None)
+    if previous:
+        rollups.apply(previous, -1)
+    rollups.add_instances([instance])
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def bump_version_of_book(sender, instance, **kwargs):
+    # Nová verze i pro novou knihu: po smazání knihy může databáze její ID znovu přidělit
+    caching.bump_book_version(instance.pk)
+    # Seznam knih vlastníka (CurrentBookMiddleware) se po vytvoření, přejmenování i smazání načte znovu
+    caching.invalidate_user_books(instance.owner_id)
+
+
+@receiver(post_save, sender=AppUser)
+@receiver(post_delete, sender=AppUser)
+def forget_cached_user(sender, instance, raw=False, **kwargs):
+    # Změna hesla nebo aktivity se musí projevit i v sezeních, která uživatele čtou z cache; nový uživatel zase
+    # nesmí dostat seznam knih uložený pod stejným ID dřív (např. po vrácení transakce)
+    if not raw:
+        caching.invalidate_user(instance.pk)
+
+
+# Smazání transakcí upravuje souhrny i verzi knihy v Transaction.delete a TransactionQuerySet.delete; příjemce
+# post_delete pro transakce by Djangu znemožnil mazat je při kaskádě ze smazané knihy po dávkách
+@receiver(post_save, sender=Transaction)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_version_on_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        caching.bump_book_version(instance.book_id)
+
+
+@receiver(m2m_changed, sender=Transaction.tags.through)
+def bump_version_on_tags_change(sender, instance, action, reverse, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        caching.bump_book_version(instance.book_id)
@@ -6,6 +6,7 @@ function checkAndClearSelectedTransactions() {
     if (!currentUrl.includes('/transaction')) {
         console.log('URL není transakční stránka, mažu vybrané transakce.');
         localStorage.removeItem('selectedTransactions');  // Vymazání uložených transakcí
+        localStorage.removeItem('selectAllFilterQuery');  // Vypnutí režimu "vybrat vše"
     } else {
         console.log('URL je transakční stránka, ponechávám vybrané transakce.');
     }
@@ -0,0 +1,44 @@
+document.addEventListener('DOMContentLoaded', function () {
+    const progressBox = document.getElementById('import-progress');
+    if (!progressBox) {
+        return;
+    }
+
+    const progressUrl = progressBox.dataset.progressUrl;
+    const statusText = document.getElementById('import-status');
+    const processedText = document.getElementById('import-processed');
+    const addedText = document.getElementById('import-added');
+    const skippedText = document.getElementById('import-skipped');
+    const skippedList = document.getElementById('import-skipped-rows');
+    const errorText = document.getElementById('import-error');
+
+    // Dotazuje se na průběh importu, dokud worker import nedokončí
+    function refresh() {
+        fetch(progressUrl, {headers: {'Accept': 'application/json'}})
+            .then(response => response.json())
+            .then(data => {
+                statusText.textContent = data.status_display;
+                processedText.textContent = data.processed;
+                addedText.textContent = data.added;
+                skippedText.textContent = data.skipped;
+
+                if (!data.finished) {
+                    setTimeout(refresh, 2000);
+                    return;
+                }
+                if (data.error) {
+                    errorText.textContent = data.error;
+                    errorText.classList.remove('d-none');
+                }
+                skippedList.innerHTML = '';
+                data.skipped_rows.forEach(function (row) {
+                    const item = document.createElement('li');
+                    item.textContent = row;
+                    skippedList.appendChild(item);
+                });
+            })
+            .catch(() => setTimeout(refresh, 5000));
+    }
+
+    refresh();
+});
@@ -116,7 +116,22 @@ document.getElementById('export-csv-btn').addEventListener('click', function() {
 
 // Uchovávej seznam vybraných transakcí pomocí localStorage
 let selectedTransactions = new Set(JSON.parse(localStorage.getItem('selectedTransactions')) || []);
-let selectAll = false;
+// Režim "vybrat vše": server použije filtr seznamu, pamatujeme si, pro který filtr byl zapnut
+const currentFilterQuery = document.getElementById('filter-query').value;
+let selectAll = localStorage.getItem('selectAllFilterQuery') === currentFilterQuery;
+
+// Funkce pro zapnutí/vypnutí režimu "vybrat vše odpovídající filtru"
+function setSelectAll(enabled) {
+    selectAll = enabled;
+    document.getElementById('select-all').checked = enabled;
+    document.getElementById('select-all-input').value = enabled ? 'true' : 'false';
+    if (enabled) {
+        localStorage.setItem('selectAllFilterQuery', currentFilterQuery);
+    } else {
+        localStorage.removeItem('selectAllFilterQuery');
+        document.getElementById('select-all-status').textContent = '';
+    }
+}
 
 // Funkce pro aktualizaci skrytého pole s vybranými transakcemi před odesláním formuláře
 function updateSelectedTransactionsInput() {
@@ -145,19 +160,11 @@ function checkAllVisibleCheckboxes(checked) {
 
 // Při kliknutí na checkbox "vybrat vše"
 document.getElementById('select-all').addEventListener('click', function() {
-    selectAll = this.checked;
-    document.getElementById('select-all-input').value = selectAll ? 'true' : 'false';
-
-    if (selectAll) {
-        // Při zaškrtnutí "vybrat vše" uložíme všechny transakce z aktuálního filtru
-        fetchAllTransactionIds().then(allTransactionIds => {
-            allTransactionIds.forEach(id => selectedTransactions.add(id.toString()));  // Ukládáme jako řetězce
-            updateSelectedTransactionsInput();
-            saveSelectedTransactions();
-
-            // Po získání všech ID aktualizujeme vizuálně všechny checkboxy
-            checkAllVisibleCheckboxes(true);  // Zajistí zaškrtnutí všech checkboxů na aktuální stránce
-        });
+    if (this.checked) {
+        // Vybereme všechny transakce z aktuálního filtru; server je při akci vybere sám podle filtru
+        setSelectAll(true);
+        checkAllVisibleCheckboxes(true);  // Zajistí zaškrtnutí všech checkboxů na aktuální stránce
+        showMatchingCount();
     } else {
         // Pokud odškrtneme "vybrat vše", vymažeme všechny vybrané transakce
         clearSelectedTransactions()
@@ -168,6 +175,10 @@ document.getElementById('select-all').addEventListener('click', function() {
 document.querySelectorAll('.transaction-checkbox').forEach(function(checkbox) {
     checkbox.addEventListener('change', function() {
         const id = this.value.toString();  // Pracujeme s řetězci
+        if (selectAll && !this.checked) {
+            // Odškrtnutím jedné transakce se režim "vybrat vše" ukončí, zůstanou vybrané zaškrtnuté řádky
+            setSelectAll(false);
+        }
         if (this.checked) {
             selectedTransactions.add(id);
         } else {
@@ -185,6 +196,7 @@ document.querySelectorAll('.transaction-checkbox').forEach(function(checkbox) {
 
 // Funkce pro vymazání vybraných transakcí z localStorage
 function clearSelectedTransactions() {
+    setSelectAll(false);
     selectedTransactions.clear();
     updateSelectedTransactionsInput();
     saveSelectedTransactions();
@@ -200,23 +212,31 @@ window.addEventListener('DOMContentLoaded', function () {
 
     // Při načtení stránky zaškrtni všechny checkboxy, které jsou již vybrané
     document.querySelectorAll('.transaction-checkbox').forEach(function(checkbox) {
-        if (selectedTransactions.has(checkbox.value.toString())) {
+        if (selectAll || selectedTransactions.has(checkbox.value.toString())) {
             checkbox.checked = true;
         }
     });
+    if (selectAll) {
+        setSelectAll(true);
+        showMatchingCount();
+    }
 
     updateSelectedTransactionsInput();
 });
 
-// Funkce pro získání všech transakčních ID z aktuálního filtru (přes AJAX)
-function fetchAllTransactionIds() {
+// Funkce pro zobrazení počtu transakcí odpovídajících aktuálnímu filtru (přes AJAX)
+function showMatchingCount() {
     return fetch(window.location.href, {
         headers: {
             'X-Requested-With': 'XMLHttpRequest'
         }
     })
     .then(response => response.json())
-    .then(data => data.transaction_ids.map(id => id.toString()));  // Konvertujeme všechna ID na řetězce
+    .then(data => {
+        if (selectAll) {
+            document.getElementById('select-all-status').textContent = `(vybráno všech ${data.count} transakcí)`;
+        }
+    });
 }
 
 //Čistič filtrů v localStorage
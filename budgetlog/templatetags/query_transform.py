@@ -5,8 +5,11 @@ register = template.Library()
 
 @register.simple_tag(takes_context=True)
 def query_transform(context, **kwargs):
-    """Přidává nebo aktualizuje parametry dotazu v URL podle zadaných kwargs."""
+    """Přidává nebo aktualizuje parametry dotazu v URL podle zadaných kwargs; hodnota None parametr odebere."""
     query = context['request'].GET.copy()
     for key, value in kwargs.items():
-        query[key] = value
+        if value is None:
+            query.pop(key, None)
+        else:
+            query[key] = value
     return query.urlencode()
@@ -1,7 +1,41 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.models import Count
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from budgetlog import caching, charts, exports, rollups, search
+from budgetlog.filters import TransactionFilter
+from budgetlog.forms import TransactionForm
+from budgetlog.imports import (
+    PandasTransactionImporter, TransactionImporter, claim_next_job, get_importer, iter_lines
+)
+from budgetlog.middleware import get_user_books
 from budgetlog.models import *
+from budgetlog.reports import BookAnalytics, YearlyCategoryPivot
+from budgetlog.views import MonthDetailView, TransactionSummaryMixin
 
 
 # Create your tests here.
@@ -72,3 +106,1637 @@ def test_url_protection(self):
     self.client.login(email='user2@budgetlog.cz', password='password123')
     response = self.client.get(reverse('transaction-detail', kwargs={'pk': book1.id}))
     self.assertEqual(response.status_code, 403)
+
+
+# Testy používají cache v paměti procesu: souborová cache z nastavení (adresář cache/) by přežila do dalšího běhu,
+# ve kterém má testovací databáze stejnou předponu klíčů a knihy stejná ID
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'budgetlog-tests'}}
+
+
+class BookTestMixin:
+    """Společná příprava uživatele, knihy a přihlášení pro testy pohledů."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.enterClassContext(override_settings(CACHES=TEST_CACHES))
+        super().setUpClass()
+
+    @classmethod
+    def _pre_setup(cls):
+        # Vrácení transakce po testu cache nevrátí, ID knih se ale v dalším testu použijí znovu
+        super()._pre_setup()
+        caches['default'].clear()
+
+    def create_book(self, email='testuser@budgetlog.cz', name='Kniha 1'):
+        user = AppUser.objects.create_user(email=email, password='password123')
+        book = Book.objects.create(name=name, owner=user)
+        return user, book
+
+    def use_temporary_media_root(self):
+        """Přesměruje MEDIA_ROOT (disková cache grafů) do dočasného adresáře."""
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        charts.memory_cache.clear()
+        charts.spec_cache.clear()
+
+    def login_to_book(self, user, book):
+        self.client.force_login(user)
+        session = self.client.session
+        session['current_book_id'] = book.id
+        session.save()
+        get_user_books(user)  # Seznam knih je v cache jako u běžně přihlášeného uživatele
+
+
+class MonthlyCategoryRollupTests(BookTestMixin, TestCase):
+    def setUp(self):
+        self.user, self.book = self.create_book()
+        self.food = Category.objects.create(name='Jídlo', book=self.book)
+        self.salary = Category.objects.create(name='Plat', book=self.book)
+        self.march = date(2024, 3, 10)
+
+    def rollup_state(self):
+        return sorted(MonthlyCategoryRollup.objects.filter(book=self.book).values_list(
+            'year', 'month', 'category_id', 'type', 'total', 'count'))
+
+    def assert_matches_rebuild(self):
+        state = self.rollup_state()
+        rollups.rebuild([self.book.id])
+        self.assertEqual(state, self.rollup_state())
+
+    def test_save_and_delete_keep_rollups_in_sync(self):
+        first = Transaction.objects.create(book=self.book, amount=100, category=self.food, datestamp=self.march)
+        Transaction.objects.create(book=self.book, amount=50, category=self.food, datestamp=self.march)
+        rollup = MonthlyCategoryRollup.objects.get(book=self.book, category=self.food, type='expense')
+        self.assertEqual((rollup.total, rollup.count), (150, 2))
+
+        first.category = self.salary
+        first.type = 'income'
+        first.save()
+        self.assert_matches_rebuild()
+
+        first.delete()
+        self.assertFalse(MonthlyCategoryRollup.objects.filter(category=self.salary).exists())
+        self.assert_matches_rebuild()
+
+    def test_bulk_change_category_and_delete(self):
+        for amount in (10, 20, 30):
+            Transaction.objects.create(book=self.book, amount=amount, category=self.food, datestamp=self.march)
+        self.login_to_book(self.user, self.book)
+        ids = ','.join(str(pk) for pk in Transaction.objects.values_list('id', flat=True))
+
+        self.client.post(reverse('bulk-transaction-action'),
+                         {'selected_transactions': ids, 'action': 'change_category', 'bulk_category': self.salary.id})
+        self.assertEqual(self.rollup_state(), [(2024, 3, self.salary.id, 'expense', 60, 3)])
+
+        self.client.post(reverse('bulk-transaction-action'), {'selected_transactions': ids, 'action': 'delete'})
+        self.assertEqual(self.rollup_state(), [])
+
+    def test_category_delete_moves_rollups_to_default(self):
+        Transaction.objects.create(book=self.book, amount=10, category=self.food, datestamp=self.march)
+        self.food.delete()
+        default = Category.objects.get(book=self.book, is_default=True)
+        self.assertEqual(self.rollup_state(), [(2024, 3, default.id, 'expense', 10, 1)])
+
+    def test_book_delete_removes_rollups(self):
+        Transaction.objects.create(book=self.book, amount=10, category=self.food, datestamp=self.march)
+        self.book.delete()
+        self.assertFalse(MonthlyCategoryRollup.objects.exists())
+
+    def test_queryset_delete_updates_rollups_and_version(self):
+        for amount in (10, 20, 30):
+            Transaction.objects.create(book=self.book, amount=amount, category=self.food, datestamp=self.march)
+        version = caching.get_book_version(self.book.id)
+
+        deleted, _ = Transaction.objects.filter(amount__gte=20).delete()
+
+        self.assertEqual(deleted, 2)
+        self.assertEqual(self.rollup_state(), [(2024, 3, self.food.id, 'expense', 10, 1)])
+        self.assertNotEqual(caching.get_book_version(self.book.id), version)
+
+    def delete_book_queries(self, transactions):
+        user, book = self.create_book(email=f'kaskada{transactions}@budgetlog.cz')
+        Transaction.objects.bulk_create(Transaction(book=book, amount=10, datestamp=self.march)
+                                        for _ in range(transactions))
+        with CaptureQueriesContext(connection) as queries:
+            book.delete()
+        self.assertFalse(Transaction.objects.filter(book_id=book.id).exists())
+        return [query['sql'] for query in queries.captured_queries]
+
+    def test_book_delete_does_not_process_transactions_one_by_one(self):
+        # Transakce nemají příjemce post_delete, kaskáda je maže po dávkách bez úprav souhrnů pro každý řádek
+        few, many = self.delete_book_queries(1), self.delete_book_queries(100)
+        self.assertEqual(len(few), len(many))
+        self.assertFalse([sql for sql in many if 'monthlycategoryrollup' in sql and not sql.startswith('DELETE')])
+        self.assertFalse([sql for sql in many if sql.startswith('SELECT "budgetlog_transaction"."id", ')])
+
+    def test_month_and_year_views_read_rollups(self):
+        Transaction.objects.create(book=self.book, amount=100, category=self.food, datestamp=self.march)
+        Transaction.objects.create(book=self.book, amount=300, category=self.salary, datestamp=self.march,
+                                   type='income')
+        self.login_to_book(self.user, self.book)
+        self.use_temporary_media_root()
+
+        response = self.client.get(reverse('month-detail', args=[2024, 3]))
+        self.assertEqual(response.context['total_income'], 300)
+        self.assertEqual(response.context['total_expense'], 100)
+        totals = {category.name: category.total for category in response.context['category_summaries']}
+        self.assertEqual(totals['Jídlo'], -100)
+
+        response = self.client.get(reverse('year-detail', args=[2024]))
+        self.assertEqual(response.context['total_balance'], 200)
+        self.assertEqual(response.context['monthly_balances']['Plat'][self.march.replace(day=1)], 300.0)
+
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual([d.month for d in response.context['months_years']], [3])
+
+
+class YearlyCategoryPivotTests(BookTestMixin, TestCase):
+    def test_pivot_matches_transactions_in_constant_queries(self):
+        user, book = self.create_book()
+        food = Category.objects.create(name='Jídlo', book=book)
+        salary = Category.objects.create(name='Plat', book=book)
+        Transaction.objects.create(book=book, amount='10.10', category=food, datestamp=date(2023, 1, 5))
+        Transaction.objects.create(book=book, amount='20.20', category=food, datestamp=date(2023, 4, 5))
+        Transaction.objects.create(book=book, amount=1000, category=salary, datestamp=date(2023, 4, 6), type='income')
+        Transaction.objects.create(book=book, amount=5, category=food, datestamp=date(2022, 4, 6))
+
+        with self.assertNumQueries(2):
+            pivot = YearlyCategoryPivot(book, 2023)
+
+        self.assertEqual(pivot.months, [date(2023, 1, 1), date(2023, 4, 1)])
+        self.assertEqual(pivot.totals(), (1000.0, 30.3, 969.7))
+        summaries = pivot.category_summaries(12)
+        self.assertEqual([category.name for category in summaries][:2], ['Plat', 'Nezařazeno'])
+        self.assertEqual(summaries[-1].total, Decimal('-30.30'))
+        self.assertEqual(pivot.monthly_data()['Jídlo'], [-10.1, -20.2])
+        self.assertEqual(pivot.monthly_balances()['Plat'], {date(2023, 1, 1): 0.0, date(2023, 4, 1): 1000.0})
+
+
+class ChartImageTests(BookTestMixin, TestCase):
+    def setUp(self):
+        self.use_temporary_media_root()
+        self.user, self.book = self.create_book()
+        food = Category.objects.create(name='Jídlo', book=self.book, color='#ff0000')
+        Transaction.objects.create(book=self.book, amount=100, category=food, datestamp=date(2024, 3, 10))
+        self.login_to_book(self.user, self.book)
+
+    def test_month_page_embeds_chart_url_and_chart_is_rendered_once(self):
+        response = self.client.get(reverse('month-detail', args=[2024, 3]))
+        chart_url = response.context['expense_pie_chart_url']
+        self.assertContains(response, f'<img src="{chart_url}"')
+        self.assertNotContains(response, 'base64')
+
+        with mock.patch.object(charts, 'generate_pie_chart', wraps=charts.generate_pie_chart) as render:
+            first = self.client.get(chart_url)
+            charts.memory_cache.clear()  # Další worker: prázdná paměť, sdílený disk
+            second = self.client.get(chart_url)
+            self.client.get(reverse('month-detail', args=[2024, 3]))
+            self.client.get(chart_url)
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(first['Content-Type'], 'image/png')
+        self.assertEqual(first.content, second.content)
+        self.assertIn('immutable', first['Cache-Control'])
+
+        not_modified = self.client.get(chart_url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_unknown_chart_returns_404(self):
+        response = self.client.get(reverse('chart-image', kwargs={'key': '0' * 64}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_unwritable_media_root_falls_back_to_memory(self):
+        # MEDIA_ROOT pod obyčejným souborem: mkdir i zápis selžou s OSError
+        blocker = Path(settings.MEDIA_ROOT) / 'soubor'
+        blocker.write_bytes(b'')
+        with override_settings(MEDIA_ROOT=str(blocker / 'media')), self.assertLogs('budgetlog.charts', 'WARNING'):
+            response = self.client.get(reverse('month-detail', args=[2024, 3]))
+            self.assertEqual(response.status_code, 200)
+            chart = self.client.get(response.context['expense_pie_chart_url'])
+        self.assertEqual(chart.status_code, 200)
+        self.assertEqual(chart['Content-Type'], 'image/png')
+
+    def test_disk_cache_is_pruned_to_size_limit(self):
+        directory = charts.chart_cache_dir()
+        directory.mkdir(parents=True)
+        for age, name in enumerate(['kresli.lock', 'nejnovejsi.png', 'novy.json', 'stary.png', 'nejstarsi.png',
+                                    'opusteny.lock']):
+            path = directory / name
+            path.write_bytes(b'x' * 100)
+            os.utime(path, (time.time() - age * 60, time.time() - age * 60))
+
+        # Dva nejstarší soubory a zámek, který zůstal po nedokončeném vykreslování
+        self.assertEqual(charts.prune_disk_cache(max_bytes=250), 3)
+        self.assertEqual(sorted(path.name for path in directory.iterdir()),
+                         ['kresli.lock', 'nejnovejsi.png', 'novy.json'])
+
+        with override_settings(CHART_DISK_CACHE_BYTES=0):
+            charts.register_pie_chart([1.0], ['Jídlo'], ['#ff0000'])
+        self.assertEqual([path.name for path in directory.iterdir()], ['kresli.lock'])
+
+    def test_stale_lock_does_not_block_rendering(self):
+        key = charts.register_pie_chart([1.0], ['Jídlo'], ['#ff0000'])
+        lock_path = charts.chart_cache_dir() / f'{key}.lock'
+        lock_path.write_bytes(b'')
+        stale = time.time() - charts.CHART_LOCK_TIMEOUT - 1
+        os.utime(lock_path, (stale, stale))
+
+        started = time.monotonic()
+        self.assertIsNotNone(charts.get_chart_png(key))
+        self.assertLess(time.monotonic() - started, charts.CHART_LOCK_TIMEOUT / 2)
+        self.assertFalse(lock_path.exists())
+        self.assertTrue((charts.chart_cache_dir() / f'{key}.png').exists())
+
+    def test_lru_cache_is_bounded(self):
+        cache = charts.LRUBytesCache(max_bytes=10)
+        cache.set('a', b'12345')
+        cache.set('b', b'12345')
+        cache.get('a')
+        cache.set('c', b'12345')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), b'12345')
+
+
+class StartupImportTests(BookTestMixin, TestCase):
+    def test_urls_do_not_import_scientific_stack(self):
+        script = ('import sys, django; django.setup(); import budgetlog.urls; '
+                  'print(",".join(m for m in ("numpy", "pandas", "matplotlib") if m in sys.modules))')
+        result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True,
+                                cwd=settings.BASE_DIR,
+                                env=dict(os.environ, DJANGO_SETTINGS_MODULE='budgetlog_project.settings'))
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), '')
+
+
+class TransactionListPaginationTests(BookTestMixin, TestCase):
+    def setUp(self):
+        self.user, self.book = self.create_book()
+        category = Category.objects.create(name='Jídlo', book=self.book)
+        # 70 transakcí, vždy několik se stejným datem, aby se ověřilo řazení podle id
+        for index in range(70):
+            Transaction.objects.create(book=self.book, amount=index + 1, category=category,
+                                       datestamp=date(2024, 1, 1 + index // 3))
+        self.login_to_book(self.user, self.book)
+        self.expected = list(Transaction.objects.filter(book=self.book).order_by('-datestamp', '-id')
+                             .values_list('id', flat=True))
+
+    def test_cursor_pages_walk_whole_list_forward_and_back(self):
+        url = reverse('transaction-list')
+        response = self.client.get(url, {'pagination': 'cursor'})
+        pages = []
+        while True:
+            page = response.context['transactions']
+            pages.append([transaction.id for transaction in page])
+            if not page.has_next():
+                break
+            response = self.client.get(url, {'cursor': page.next_cursor})
+        self.assertEqual([pk for ids in pages for pk in ids], self.expected)
+        self.assertEqual([len(ids) for ids in pages], [30, 30, 10])
+
+        previous = self.client.get(url, {'cursor': response.context['transactions'].previous_cursor})
+        self.assertEqual([transaction.id for transaction in previous.context['transactions']], pages[1])
+
+    def test_cursor_page_does_not_count_rows(self):
+        first = self.client.get(reverse('transaction-list'), {'pagination': 'cursor'})
+        cursor = first.context['transactions'].next_cursor
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(reverse('transaction-list'), {'cursor': cursor})
+        counts = [query['sql'] for query in context.captured_queries
+                  if 'COUNT(*)' in query['sql'] and 'budgetlog_transaction' in query['sql']]
+        self.assertEqual(counts, [])
+
+    def test_offset_page_uses_aggregate_count_and_one_page_query(self):
+        category = Category.objects.get(book=self.book, name='Jídlo')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('transaction-list'), {'page': 3, 'category': category.id})
+        transaction_queries = [query['sql'] for query in context.captured_queries
+                               if 'FROM "budgetlog_transaction"' in query['sql']]
+        # Jeden agregační dotaz (souhrny + počet pro stránkování) a jeden dotaz na stránku
+        self.assertEqual(len(transaction_queries), 2, transaction_queries)
+        self.assertIn('AVG(', transaction_queries[0])
+        self.assertEqual(len([query for query in context.captured_queries
+                              if 'FROM "budgetlog_category"' in query['sql'] and f'= {category.id}' in query['sql']
+                              ]), 1)
+        self.assertEqual(response.context['transactions'].paginator.num_pages, 3)
+        self.assertEqual(response.context['transaction_count'], 70)
+        self.assertEqual([t.id for t in response.context['transactions']], self.expected[60:])
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        response = self.client.get(reverse('transaction-list'), {'cursor': 'nesmysl'})
+        self.assertEqual([t.id for t in response.context['transactions']], self.expected[:30])
+
+    def test_offset_mode_renders_elided_page_bar(self):
+        Transaction.objects.bulk_create([
+            Transaction(book=self.book, amount=1, datestamp=date(2023, 1, 1)) for _ in range(600)
+        ])
+        response = self.client.get(reverse('transaction-list'), {'page': 10})
+        self.assertEqual(response.context['transactions'].number, 10)
+        self.assertContains(response, '…')
+        self.assertNotContains(response, 'page=15"')
+
+
+@skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN je specifický pro SQLite.")
+class QueryPlanTests(BookTestMixin, TestCase):
+    """Hlídá, že časté dotazy nad transakcemi používají indexy a nepropadnou na průchod celou tabulkou."""
+
+    # Tabulky, které rostou s počtem transakcí a nesmí se procházet celé
+    LARGE_TABLES = ('budgetlog_transaction', 'budgetlog_transaction_tags', 'budgetlog_monthlycategoryrollup')
+
+    def setUp(self):
+        self.user, self.book = self.create_book()
+        self.category = Category.objects.create(name='Jídlo', book=self.book)
+        self.tag = Tag.objects.create(name='Oběd', book=self.book)
+        transaction = Transaction.objects.create(book=self.book, amount=10, category=self.category,
+                                                 datestamp=date(2024, 3, 10))
+        transaction.tags.add(self.tag)
+        self.login_to_book(self.user, self.book)
+
+    def query_plan(self, sql, params=()):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def full_scans(self, sql, params=()):
+        return [step for step in self.query_plan(sql, params)
+                if any(re.match(rf'SCAN {table}\b', step) for table in self.LARGE_TABLES)]
+
+    def assert_indexed(self, queryset, *constraints, ordered=False):
+        """Ověří, že dotaz nečte celou tabulku, index pokryje zadané podmínky a (volitelně) i řazení."""
+        sql, params = queryset.query.sql_with_params()
+        plan = self.query_plan(sql, params)
+        self.assertEqual(self.full_scans(sql, params), [], plan)
+        search = ' '.join(step for step in plan if step.startswith('SEARCH budgetlog_transaction '))
+        for constraint in constraints:
+            self.assertIn(constraint, search, plan)
+        if ordered:
+            self.assertFalse([step for step in plan if 'TEMP B-TREE' in step], plan)
+
+    def test_transaction_filter_queries_use_indexes(self):
+        base = Transaction.objects.filter(book=self.book).order_by('-datestamp', '-id')
+        # (parametry filtru, podmínky, které musí vyřešit index, zda index pokryje i řazení podle data)
+        cases = [
+            ({}, ['book_id=?'], True),
+            ({'type': 'expense'}, ['book_id=? AND type=?'], False),
+            ({'datestamp__gte': '2024-01-01', 'datestamp__lte': '2024-12-31'}, ['book_id=? AND datestamp>'], True),
+            ({'category': self.category.id}, ['book_id=? AND category_id=?'], False),
+            ({'tags': [self.tag.id]}, ['book_id=?'], False),
+            ({'amount_min': '5', 'amount_max': '50'}, ['book_id=?'], True),
+        ]
+        for params, constraints, ordered in cases:
+            with self.subTest(params=params):
+                filtered = TransactionFilter(params, queryset=base, book=self.book).qs
+                self.assert_indexed(filtered[:30], *constraints, ordered=ordered)
+
+    def test_description_filter_uses_fulltext_index(self):
+        base = Transaction.objects.filter(book=self.book).order_by('-datestamp', '-id')
+        filtered = TransactionFilter({'description': 'oběd'}, queryset=base, book=self.book).qs
+        # Stránka i počet (bez řazení podle relevance): index FTS5 vyhodnotí MATCH jednou a transakce se dohledají
+        # podle primárního klíče, i když filtr na knihu nabízí index transakcí
+        for queryset in (filtered[:30], filtered.order_by().values('id')):
+            sql, params = queryset.query.sql_with_params()
+            plan = self.query_plan(sql, params)
+            self.assertEqual(self.full_scans(sql, params), [], plan)
+            self.assertRegex(plan[0], r'SCAN budgetlog_transaction_fts VIRTUAL TABLE INDEX \d+:M', plan)
+            self.assertIn('SEARCH budgetlog_transaction USING INTEGER PRIMARY KEY (rowid=?)', plan)
+
+    def test_month_transactions_use_date_range_index(self):
+        month = Transaction.objects.filter(book=self.book, datestamp__year=2024, datestamp__month=3)
+        self.assert_indexed(month, 'book_id=? AND datestamp>')
+
+    def test_tag_lookup_uses_reverse_through_index(self):
+        through = Transaction.tags.through.objects.filter(tag=self.tag).values('transaction_id')
+        sql, params = through.query.sql_with_params()
+        plan = self.query_plan(sql, params)
+        self.assertIn('COVERING INDEX transaction_tags_tag_txn_idx', ' '.join(plan), plan)
+
+    def test_report_views_use_indexes(self):
+        urls = [
+            reverse('transaction-list'),
+            reverse('transaction-list') + f'?tags={self.tag.id}&type=expense',
+            reverse('dashboard'),
+            reverse('month-detail', args=[2024, 3]),
+            reverse('year-detail', args=[2024]),
+        ]
+        self.use_temporary_media_root()
+        for url in urls:
+            with self.subTest(url=url), CaptureQueriesContext(connection) as context:
+                self.client.get(url)
+            for query in context.captured_queries:
+                if query['sql'].startswith('SELECT') and any(t in query['sql'] for t in self.LARGE_TABLES):
+                    self.assertEqual(self.full_scans(query['sql']), [], query['sql'])
+
+
+class TransactionRenderingQueryCountTests(BookTestMixin, TestCase):
+    """Počet dotazů při vykreslení transakcí nesmí růst s počtem řádků (kategorie, tagy a kniha bez N+1)."""
+
+    def setUp(self):
+        self.use_temporary_media_root()
+        self.user, self.book = self.create_book()
+        self.tags = [Tag.objects.create(name=f'Tag {index}', book=self.book) for index in range(3)]
+        self.created = 0
+        self.login_to_book(self.user, self.book)
+
+    def add_transactions(self, count):
+        """Přidá transakce, každou s vlastní kategorií a dvěma tagy, aby se nic nenačetlo z cache ORM."""
+        for _ in range(count):
+            self.created += 1
+            category = Category.objects.create(name=f'Kategorie {self.created}', book=self.book)
+            transaction = Transaction.objects.create(book=self.book, amount=self.created, category=category,
+                                                     datestamp=date(2024, 3, 1 + self.created % 28))
+            transaction.tags.set(self.tags[:2])
+
+    def count_queries(self, request):
+        with CaptureQueriesContext(connection) as context:
+            response = request()
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def assert_flat(self, request):
+        """Změří počet dotazů s 5 transakcemi a ověří, že s 25 transakcemi je stejný."""
+        self.add_transactions(5)
+        expected = self.count_queries(request)
+        self.add_transactions(20)
+        with self.assertNumQueries(expected):
+            response = request()
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_transaction_list(self):
+        response = self.assert_flat(lambda: self.client.get(reverse('transaction-list')))
+        self.assertContains(response, 'Kategorie 25')
+
+    def test_transaction_list_cursor_mode(self):
+        self.assert_flat(lambda: self.client.get(reverse('transaction-list') + '?pagination=cursor'))
+
+    def test_month_detail(self):
+        response = self.assert_flat(lambda: self.client.get(reverse('month-detail', args=[2024, 3])))
+        self.assertContains(response, 'Kategorie 25')
+
+    def test_export_csv(self):
+        def export():
+            ids = ','.join(str(pk) for pk in Transaction.objects.values_list('id', flat=True))
+            return self.client.post(reverse('bulk-transaction-action'),
+                                    {'selected_transactions': ids, 'action': 'export_csv'})
+
+        response = self.assert_flat(export)
+        rows = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(len(rows), 26)
+        self.assertIn('Tag 0, Tag 1', rows[1])
+
+    def test_transaction_detail(self):
+        self.add_transactions(1)
+        transaction = Transaction.objects.get()
+        # Sezení + uživatel + kniha, transakce s kategorií (JOIN) a jeden dotaz na tagy
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('transaction-detail', args=[transaction.id]))
+        self.assertContains(response, 'Tag 1')
+        transaction_queries = [query['sql'] for query in context.captured_queries
+                               if 'budgetlog_category' in query['sql'] or 'budgetlog_tag' in query['sql']]
+        self.assertEqual(len(transaction_queries), 2, transaction_queries)
+
+
+class ColoredTagWidgetTests(BookTestMixin, TestCase):
+    def setUp(self):
+        self.user, self.book = self.create_book()
+        self.other_user, self.other_book = self.create_book(email='other@budgetlog.cz', name='Cizí kniha')
+        Tag.objects.bulk_create([Tag(name=f'Cizí {index}', color='#111111', book=self.other_book)
+                                 for index in range(50)])
+
+    def add_tags(self, count):
+        start = Tag.objects.filter(book=self.book).count()
+        Tag.objects.bulk_create([Tag(name=f'Tag {start + index}', color=f'#0000{start + index:02x}', book=self.book)
+                                 for index in range(count)])
+
+    def render_filter(self):
+        filterset = TransactionFilter({}, queryset=Transaction.objects.filter(book=self.book), book=self.book)
+        return str(filterset.form['tags'])
+
+    def render_form(self):
+        return str(TransactionForm(book=self.book)['tags'])
+
+    def test_render_queries_do_not_grow_with_options(self):
+        for render in (self.render_filter, self.render_form):
+            with self.subTest(render=render.__name__):
+                Tag.objects.filter(book=self.book).delete()
+                self.add_tags(3)
+                with CaptureQueriesContext(connection) as context:
+                    render()
+                self.add_tags(40)
+                # Jeden dotaz na volby a jeden na mapu barev
+                with self.assertNumQueries(len(context.captured_queries)):
+                    html = render()
+                self.assertEqual(len(context.captured_queries), 2)
+                self.assertIn('background-color: #00002a', html)
+                self.assertNotIn('Cizí', html)
+
+    def test_label_is_escaped(self):
+        Tag.objects.create(name='<b>tučně</b>', color='#ff0000', book=self.book)
+        html = self.render_form()
+        self.assertIn('&lt;b&gt;tučně&lt;/b&gt;', html)
+        self.assertIn('background-color: #ff0000', html)
+
+
+class StreamingCsvExportTests(BookTestMixin, TestCase):
+    def setUp(self):
+        self.user, self.book = self.create_book()
+        category = Category.objects.create(name='Jídlo', book=self.book)
+        tag = Tag.objects.create(name='Oběd', book=self.book)
+        for index in range(7):
+            transaction = Transaction.objects.create(book=self.book, amount=index + 1, category=category,
+                                                     datestamp=date(2024, 3, index + 1), type='expense')
+            transaction.tags.add(tag)
+        self.login_to_book(self.user, self.book)
+
+    def export(self, **headers):
+        ids = ','.join(str(pk) for pk in Transaction.objects.values_list('id', flat=True))
+        return self.client.post(reverse('bulk-transaction-action'),
+                                {'selected_transactions': ids, 'action': 'export_csv'}, headers=headers)
+
+    def test_export_is_streamed_in_chunks_with_single_bom(self):
+        chunks = list(exports.csv_chunks(Transaction.objects.filter(book=self.book), chunk_size=3))
+        # Záhlaví + 3 + 3 + 1 transakce
+        self.assertEqual(len(chunks), 4)
+        content = b''.join(chunks)
+        self.assertTrue(content.startswith(exports.CSV_BOM))
+        self.assertEqual(content.count(exports.CSV_BOM), 1)
+        rows = content.decode('utf-8-sig').splitlines()
+        self.assertEqual(rows[0], ','.join(exports.CSV_HEADER))
+        self.assertEqual(len(rows), 8)
+        self.assertIn(',Jídlo,-7.00,Oběd,', rows[1])
+
+    def test_response_streams_csv(self):
+        response = self.export()
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="transactions.csv"')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(len(b''.join(response.streaming_content).decode('utf-8-sig').splitlines()), 8)
+
+    @override_settings(CSV_EXPORT_GZIP_MIN_ROWS=5)
+    def test_large_export_is_gzipped_when_accepted(self):
+        response = self.export(accept_encoding='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        content = gzip.decompress(b''.join(response.streaming_content))
+        self.assertTrue(content.startswith(exports.CSV_BOM))
+        self.assertEqual(len(content.decode('utf-8-sig').splitlines()), 8)
+
+        response = self.export()
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+class TransactionImporterTests(BookTestMixin, TestCase):
+    HEADER = 'Částka;Datum;Typ;Kategorie;Tagy;Popis\n'
+
+    def setUp(self):
+        self.user, self.book = self.create_book()
+        self.food = Category.objects.create(name='Jídlo', book=self.book)
+        self.lunch = Tag.objects.create(name='Oběd', book=self.book)
+
+    def upload(self, lines, encoding='utf-8'):
+        return SimpleUploadedFile('import.csv', (self.HEADER + ''.join(lines)).encode(encoding))
+
+    def test_report_matches_row_by_row_behavior(self):
+        lines = [
+            '100,50;2024-03-01;expense;Jídlo;Oběd, Oběd;nákup\n',
+            '200;15.03.2024;income;Jídlo;;výplata\n',
+            ';2024-03-01;expense;Jídlo;;bez částky\n',
+            '1,000.5;2024-03-01;expense;Jídlo;;nejednoznačná částka\n',
+            '10;2024-13-01;expense;Jídlo;;špatné datum\n',
+            '10;2024-03-01;převod;Jídlo;;špatný typ\n',
+            '10;2024-03-01;expense;Bydlení;;chybí kategorie\n',
+            '30;2024-03-02;expense;Jídlo;Oběd, Večeře;chybí tag\n',
+        ]
+        result = TransactionImporter(self.book, batch_size=2).run(self.upload(lines))
+
+        self.assertEqual(result['added'], 3)
+        skipped = result['skipped']
+        self.assertEqual(len(skipped), 6)
+        self.assertTrue(skipped[0].startswith('Řádek přeskočen – chybějící hodnoty: amount'))
+        self.assertTrue(skipped[1].startswith('Chybný formát částky'))
+        self.assertTrue(skipped[2].startswith('Chybný formát data transakce'))
+        self.assertTrue(skipped[3].startswith('Neplatný typ transakce'))
+        self.assertEqual(skipped[4:], ['Chybějící kategorie: Bydlení', 'Chybějící tag: Večeře'])
+
+        first = Transaction.objects.get(description='Nákup')
+        self.assertEqual(first.amount, Decimal('100.50'))
+        self.assertEqual(list(first.tags.all()), [self.lunch])
+        # Řádek s chybějícím tagem se uloží bez něj
+        self.assertEqual(list(Transaction.objects.get(amount=30).tags.all()), [self.lunch])
+        self.assertEqual(Transaction.objects.get(amount=200).datestamp, date(2024, 3, 15))
+        self.assertFalse(Category.objects.filter(name='Bydlení').exists())
+
+        rollup = MonthlyCategoryRollup.objects.get(book=self.book, year=2024, month=3, type='expense')
+        self.assertEqual((rollup.total, rollup.count), (Decimal('130.50'), 2))
+
+    def test_create_missing(self):
+        lines = ['10;2024-03-01;expense;bydlení;nájem;\n', '20;2024-03-02;expense;Bydlení;Nájem;\n']
+        result = TransactionImporter(self.book, create_missing=True).run(self.upload(lines))
+        self.assertEqual((result['added'], result['skipped']), (2, []))
+        self.assertEqual(Category.objects.filter(book=self.book, name='Bydlení').count(), 1)
+        self.assertEqual(Transaction.objects.filter(tags__book=self.book, tags__name='Nájem').count(), 2)
+
+    def test_missing_columns(self):
+        upload = SimpleUploadedFile('import.csv', 'amount;datestamp\n10;2024-03-01\n'.encode('utf-8'))
+        result = TransactionImporter(self.book).run(upload)
+        self.assertTrue(result['error'].startswith('Transakce nenahrány!'))
+
+    def test_writes_are_batched(self):
+        lines = [f'{index + 1};2024-03-01;expense;Jídlo;Oběd;řádek {index}\n' for index in range(50)]
+        importer = TransactionImporter(self.book, batch_size=20)
+        with CaptureQueriesContext(connection) as context:
+            result = importer.run(self.upload(lines))
+        self.assertEqual(result['added'], 50)
+        inserts = [query['sql'] for query in context.captured_queries
+                   if query['sql'].startswith('INSERT INTO "budgetlog_transaction"')]
+        # Tři dávky: transakce a vazby na tagy jedním INSERTem za dávku
+        self.assertEqual(len(inserts), 3)
+        self.assertEqual(Transaction.tags.through.objects.filter(tag=self.lunch).count(), 50)
+
+    def test_rejected_batch_falls_back_to_single_rows(self):
+        lines = [f'{index + 1};2024-03-01;expense;Jídlo;;řádek {index}\n' for index in range(4)]
+        original = Transaction.objects.bulk_create
+
+        def reject_batches(objs, *args, **kwargs):
+            if len(objs) > 1 or objs[0].amount == 3:
+                raise IntegrityError('odmítnuto')
+            return original(objs, *args, **kwargs)
+
+        with mock.patch.object(Transaction.objects, 'bulk_create', side_effect=reject_batches):
+            result = TransactionImporter(self.book, batch_size=10).run(self.upload(lines))
+        self.assertEqual(result['added'], 3)
+        self.assertEqual(len(result['skipped']), 1)
+        self.assertIn('odmítnuto', result['skipped'][0])
+        self.assertEqual(MonthlyCategoryRollup.objects.get(book=self.book).count, 3)
+
+
+class ImportJobTests(BookTestMixin, TestCase):
+    CSV = ('amount;datestamp;type;category;tags;description\n'
+           '10;2024-03-01;expense;Jídlo;;oběd\n'
+           '20;2024-03-02;expense;Bydlení;;nájem\n'
+           '30;2024-03-03;income;Jídlo;;vratka\n')
+
+    def setUp(self):
+        self.use_temporary_media_root()
+        self.user, self.book = self.create_book()
+        Category.objects.create(name='Jídlo', book=self.book)
+        self.login_to_book(self.user, self.book)
+
+    def upload(self):
+        upload = SimpleUploadedFile('import.csv', self.CSV.encode('utf-8'), content_type='text/csv')
+        return self.client.post(reverse('upload-transactions'), {'file': upload})
+
+    @override_settings(IMPORT_INLINE_MAX_BYTES=10)
+    def test_large_upload_is_queued_and_processed_by_worker(self):
+        response = self.upload()
+        job = ImportJob.objects.get()
+        self.assertRedirects(response, f"{reverse('upload-transactions')}?job={job.id}")
+        self.assertEqual(job.status, ImportJob.STATUS_PENDING)
+        self.assertTrue(os.path.exists(job.file.path))
+        self.assertFalse(Transaction.objects.exists())
+
+        progress_url = reverse('import-job-progress', args=[job.id])
+        self.assertEqual(self.client.get(progress_url).json()['status'], 'pending')
+
+        call_command('run_import_worker', '--once', stdout=StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.STATUS_DONE)
+        self.assertFalse(job.file)
+        self.assertEqual(Transaction.objects.filter(book=self.book).count(), 2)
+        progress = self.client.get(progress_url).json()
+        self.assertEqual((progress['processed'], progress['added'], progress['skipped']), (3, 2, 1))
+        self.assertEqual(progress['skipped_rows'], ['Chybějící kategorie: Bydlení'])
+        self.assertContains(self.client.get(f"{reverse('upload-transactions')}?job={job.id}"),
+                            'Chybějící kategorie: Bydlení')
+
+    def test_small_upload_is_imported_inline(self):
+        response = self.upload()
+        self.assertRedirects(response, reverse('transaction-list'), fetch_redirect_response=False)
+        self.assertFalse(ImportJob.objects.exists())
+        self.assertEqual(Transaction.objects.filter(book=self.book).count(), 2)
+
+    def test_progress_is_private(self):
+        job = ImportJob.objects.create(book=self.book, owner=self.user)
+        other, _ = self.create_book(email='other@budgetlog.cz')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(reverse('import-job-progress', args=[job.id])).status_code, 404)
+
+    def test_job_is_claimed_once(self):
+        job = ImportJob.objects.create(book=self.book, owner=self.user)
+        self.assertEqual(claim_next_job(), job)
+        self.assertIsNone(claim_next_job())
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.STATUS_RUNNING)
+
+
+class StreamingCsvReaderTests(BookTestMixin, TestCase):
+    def test_lines_match_full_decode_across_chunk_boundaries(self):
+        text = '\ufeffčástka;popis\r\n1;"víceřádkový\r\npopis"\r\n2;Žluťoučký kůň\n3;\rkonec'
+        for encoding in ('utf-8', 'cp1250', 'utf-16'):
+            data = text.encode(encoding) if encoding != 'cp1250' else text[1:].encode(encoding)
+            for chunk_size in (1, 2, 3, 7, 64):
+                with self.subTest(encoding=encoding, chunk_size=chunk_size):
+                    lines = list(iter_lines(io.BytesIO(data), encoding, chunk_size=chunk_size))
+                    self.assertEqual(''.join(lines), text.lstrip('\ufeff'))
+                    self.assertEqual(list(csv.reader(lines, delimiter=';')),
+                                     [['částka', 'popis'], ['1', 'víceřádkový\r\npopis'], ['2', 'Žluťoučký kůň'],
+                                      ['3', ''], ['konec']])
+
+    def test_decode_error_keeps_rows_read_so_far(self):
+        user, book = self.create_book()
+        Category.objects.create(name='Jídlo', book=book)
+        content = ('amount;datestamp;type;category;tags;description\n'
+                   + '10;2024-03-01;expense;Jídlo;;oběd\n' * 5000).encode('utf-8') + b'20;\xff\xfe;expense\n'
+        result = TransactionImporter(book, batch_size=500).run(SimpleUploadedFile('import.csv', content))
+        # Řádky z bloků před chybou se uloží, chyba se ohlásí s počtem zpracovaných řádků
+        self.assertGreater(result['added'], 0)
+        self.assertEqual(Transaction.objects.filter(book=book).count(), result['added'])
+        self.assertIn(f"přerušen po {result['added']} řádcích", result['error'])
+
+    def test_peak_memory_is_bounded_for_100_mb_file(self):
+        user, book = self.create_book()
+        Category.objects.create(name='Jídlo', book=book)
+        row = ('123,45;15.03.2024;expense;Jídlo;;' + 'Dlouhý popis transakce s diakritikou. ' * 100 + '\n')
+        rows = 100 * 1024 * 1024 // len(row.encode('utf-8')) + 1
+
+        with tempfile.TemporaryFile() as file:
+            file.write('\ufeffamount;datestamp;type;category;tags;description\n'.encode('utf-8'))
+            block = (row * 1000).encode('utf-8')
+            for _ in range(rows // 1000 + 1):
+                file.write(block)
+            self.assertGreater(file.tell(), 100 * 1024 * 1024)
+
+            importer = TransactionImporter(book)
+            tracemalloc.start()
+            try:
+                parsed = sum(1 for row in importer.read_rows(file, ';') if importer.parse_row(row))
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+
+        self.assertEqual(parsed, (rows // 1000 + 1) * 1000)
+        self.assertEqual(importer.skipped, [])
+        self.assertLess(peak, 8 * 1024 * 1024)
+
+
+class ImportEngineTests(BookTestMixin, TestCase):
+    """Sloupcový import (pandas) musí dát stejný výsledek a stejné hlášení jako řádkový import."""
+
+    LINES = [
+        '100,50;2024-03-01;expense;jídlo ;Oběd, oběd;nákup;x\n',
+        '200;15.03.2024;INCOME;Jídlo;;výplata;x\n',
+        ';2024-03-01;expense;Jídlo;;bez částky;x\n',
+        '1,000.5;2024-03-01;expense;Jídlo;;nejednoznačná částka;x\n',
+        '1-2;2024-03-01;expense;Jídlo;;neplatná částka;x\n',
+        '10;2024-13-01;expense;Jídlo;;špatné datum;x\n',
+        '10;0999-01-01;expense;Jídlo;;staré datum;x\n',
+        '10;2024-03-01;převod;Jídlo;;špatný typ;x\n',
+        '10;2024-03-01;expense;Bydlení;Nájem;chybí kategorie;x\n',
+        '30 Kč;2024-03-02;expense;Jídlo;Oběd, Večeře;chybí tag;x\n',
+        '40;2024-03-03;expense;Jídlo\n',
+        '\n',
+        '"50";"2024-03-04";"income";"Jídlo";"";"víceřádkový\npopis";x\n',
+    ]
+
+    def import_with(self, engine, content, create_missing=False, **kwargs):
+        user, book = self.create_book(email=f'{engine}-{create_missing}@budgetlog.cz')
+        Category.objects.create(name='Jídlo', book=book)
+        Tag.objects.create(name='Oběd', book=book)
+        importer = get_importer(book, create_missing, engine=engine, **kwargs)
+        result = importer.run(SimpleUploadedFile('import.csv', content))
+        transactions = [
+            (t.amount, t.datestamp, t.type, t.category.name if t.category else None, t.description,
+             sorted(tag.name for tag in t.tags.all()))
+            for t in Transaction.objects.filter(book=book).order_by('id')
+        ]
+        return result, transactions, importer.processed
+
+    def assert_engines_match(self, content, **kwargs):
+        rows = self.import_with('rows', content, **kwargs)
+        columns = self.import_with('pandas', content, **kwargs)
+        self.assertEqual(columns, rows)
+        return rows
+
+    def test_same_report_as_row_engine(self):
+        header = '\ufeffČástka;Datum;Typ;Kategorie;Tagy;Popis;Poznámka\n'
+        content = (header + ''.join(self.LINES)).encode('utf-8')
+        for create_missing in (False, True):
+            with self.subTest(create_missing=create_missing):
+                (result, transactions, processed) = self.assert_engines_match(
+                    content, create_missing=create_missing, batch_size=3)
+                self.assertEqual(processed, 12)
+                self.assertEqual(result['added'], 6 if create_missing else 5)
+
+    def test_same_report_with_small_chunks_and_cp1250(self):
+        content = ('amount;datestamp;type;category;tags;description;note\n' + ''.join(self.LINES)).encode('cp1250')
+        with mock.patch.object(PandasTransactionImporter, 'chunk_rows', 4):
+            self.assert_engines_match(content)
+
+    def test_missing_description_column(self):
+        content = '\ufeffamount;datestamp;type;category;tags\n10;2024-03-01;expense;Jídlo;\n'.encode('utf-8')
+        result, transactions, _ = self.assert_engines_match(content)
+        self.assertEqual(result['added'], 0)
+        self.assertIn("Chyba: 'description'", result['skipped'][0])
+
+    def test_engine_setting(self):
+        user, book = self.create_book()
+        self.assertIsInstance(get_importer(book), TransactionImporter)
+        with override_settings(IMPORT_ENGINE='pandas'):
+            self.assertIsInstance(get_importer(book), PandasTransactionImporter)
+        with self.assertRaises(ValueError):
+            get_importer(book, engine='neexistuje')
+
+
+class BulkTagActionTests(BookTestMixin, TestCase):
+    """Hromadné přiřazení a odebrání tagu: počet dotazů nezávisí na počtu vybraných transakcí."""
+
+    def setUp(self):
+        self.user, self.book = self.create_book()
+        self.tag = Tag.objects.create(name='Dovolená', book=self.book)
+        self.other_tag = Tag.objects.create(name='Jídlo', book=self.book)
+        self.login_to_book(self.user, self.book)
+
+    def add_transactions(self, count):
+        return Transaction.objects.bulk_create(
+            Transaction(book=self.book, amount=index + 1, datestamp=date(2024, 3, 1 + index % 28))
+            for index in range(count)
+        )
+
+    def post_action(self, action, tag, transactions):
+        field = 'bulk_tag' if action == 'assign_tag' else 'bulk_remove_tag'
+        ids = ','.join(str(transaction.pk) for transaction in transactions)
+        response = self.client.post(reverse('bulk-transaction-action'),
+                                    {'selected_transactions': ids, 'action': action, field: tag.pk})
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def count_queries(self, action, tag, transactions):
+        with CaptureQueriesContext(connection) as context:
+            self.post_action(action, tag, transactions)
+        return len(context.captured_queries)
+
+    def test_assign_tag_query_count_is_flat(self):
+        small = self.count_queries('assign_tag', self.tag, self.add_transactions(5))
+        large = self.count_queries('assign_tag', self.tag, self.add_transactions(200))
+        self.assertEqual(small, large)
+        self.assertEqual(Transaction.objects.filter(tags=self.tag).count(), 205)
+
+    def test_remove_tag_query_count_is_flat(self):
+        transactions = self.add_transactions(205)
+        Transaction.objects.all().add_tag(self.tag)
+        small = self.count_queries('remove_tag', self.tag, transactions[:5])
+        large = self.count_queries('remove_tag', self.tag, transactions[5:])
+        self.assertEqual(small, large)
+        self.assertFalse(Transaction.objects.filter(tags=self.tag).exists())
+
+    def test_assign_tag_skips_existing_and_reports_affected_rows(self):
+        transactions = self.add_transactions(4)
+        transactions[0].tags.add(self.tag, self.other_tag)
+        self.assertEqual(Transaction.objects.filter(pk__in=[t.pk for t in transactions]).add_tag(self.tag), 3)
+        self.assertEqual(Transaction.objects.all().add_tag(self.tag), 0)
+        self.assertEqual(Transaction.tags.through.objects.filter(tag=self.tag).count(), 4)
+        self.assertEqual(list(transactions[0].tags.order_by('name')), [self.tag, self.other_tag])
+
+    def test_remove_tag_keeps_other_tags(self):
+        transactions = self.add_transactions(3)
+        for transaction in transactions:
+            transaction.tags.add(self.tag, self.other_tag)
+        removed = Transaction.objects.filter(pk__in=[t.pk for t in transactions[:2]]).remove_tag(self.tag)
+        self.assertEqual(removed, 2)
+        self.assertEqual(list(transactions[2].tags.order_by('name')), [self.tag, self.other_tag])
+        self.assertEqual(list(transactions[0].tags.all()), [self.other_tag])
+
+    def test_messages_report_affected_rows(self):
+        transactions = self.add_transactions(3)
+        transactions[0].tags.add(self.tag)
+        self.post_action('assign_tag', self.tag, transactions)
+        response = self.client.get(reverse('transaction-list'))
+        self.assertContains(response, '2 transakcím byl přiřazen tag: Dovolená.')
+
+
+class MoveTransactionsTests(BookTestMixin, TestCase):
+    """Přesun transakcí do jiné knihy: přemapování kategorií a tagů, souhrny a konstantní počet dotazů."""
+
+    def setUp(self):
+        self.user, self.book = self.create_book()
+        self.food = Category.objects.create(name='Jídlo', book=self.book, color='#ff0000', description='Obchod')
+        self.travel = Category.objects.create(name='Cesty', book=self.book)
+        self.holiday = Tag.objects.create(name='Dovolená', book=self.book, color='#0000ff')
+        self.family = Tag.objects.create(name='Rodina', book=self.book)
+        self.target = self.create_target('Kniha 2')
+        self.login_to_book(self.user, self.book)
+
+    def create_target(self, name):
+        """Cílová kniha, ve které už existuje kategorie "Cesty" a tag "Rodina" (s jinou barvou)."""
+        target = Book.objects.create(name=name, owner=self.user)
+        Category.objects.create(name='Cesty', book=target, color='#00ff00')
+        Tag.objects.create(name='Rodina', book=target, color='#123456')
+        return target
+
+    def add_transactions(self, count):
+        transactions = Transaction.objects.bulk_create(
+            Transaction(book=self.book, amount=index + 1, category=self.food if index % 2 else self.travel,
+                        datestamp=date(2024, 1 + index % 12, 1))
+            for index in range(count)
+        )
+        rollups.add_instances(transactions)
+        Transaction.objects.filter(pk__in=[t.pk for t in transactions]).add_tag(self.holiday)
+        Transaction.objects.filter(pk__in=[t.pk for t in transactions[::2]]).add_tag(self.family)
+        return transactions
+
+    def post_move(self, transactions):
+        ids = ','.join(str(transaction.pk) for transaction in transactions)
+        response = self.client.post(reverse('bulk-transaction-action'),
+                                    {'selected_transactions': ids, 'action': 'move_to_book',
+                                     'bulk_book': self.target.pk})
+        self.assertEqual(response.status_code, 200)
+
+    def test_move_remaps_categories_and_tags(self):
+        transactions = self.add_transactions(4)
+        self.post_move(transactions)
+
+        self.assertEqual(Transaction.objects.filter(book=self.target).count(), 4)
+        target_food = Category.objects.get(book=self.target, name='Jídlo')
+        self.assertEqual((target_food.color, target_food.description), ('#ff0000', 'Obchod'))
+        self.assertEqual(Category.objects.get(book=self.target, name='Cesty').color, '#00ff00')
+        self.assertEqual(set(Transaction.objects.values_list('category__book', flat=True)), {self.target.pk})
+
+        target_holiday = Tag.objects.get(book=self.target, name='Dovolená')
+        self.assertEqual(target_holiday.color, '#0000ff')
+        self.assertEqual(Tag.objects.get(book=self.target, name='Rodina').color, '#123456')
+        first = Transaction.objects.get(pk=transactions[0].pk)
+        self.assertEqual(sorted(first.tags.values_list('name', 'book')),
+                         [('Dovolená', self.target.pk), ('Přesunuto', self.target.pk), ('Rodina', self.target.pk)])
+        second = Transaction.objects.get(pk=transactions[1].pk)
+        self.assertEqual(sorted(second.tags.values_list('name', flat=True)), ['Dovolená', 'Přesunuto'])
+
+    def test_move_keeps_rollups_in_sync(self):
+        self.add_transactions(6)
+        self.post_move(Transaction.objects.all())
+        rebuilt = sorted(MonthlyCategoryRollup.objects.values_list(
+            'book', 'year', 'month', 'category', 'type', 'total', 'count'))
+        rollups.rebuild()
+        self.assertEqual(rebuilt, sorted(MonthlyCategoryRollup.objects.values_list(
+            'book', 'year', 'month', 'category', 'type', 'total', 'count')))
+        self.assertFalse(MonthlyCategoryRollup.objects.filter(book=self.book).exists())
+
+    def test_move_back_does_not_duplicate_moved_tag(self):
+        transactions = self.add_transactions(2)
+        self.post_move(transactions)
+        self.target, self.book = self.book, self.target
+        self.login_to_book(self.user, self.book)
+        self.post_move(transactions)
+        self.assertEqual(sorted(Transaction.objects.get(pk=transactions[0].pk).tags.values_list('name', 'book')),
+                         [('Dovolená', self.target.pk), ('Přesunuto', self.target.pk), ('Rodina', self.target.pk)])
+
+    def test_query_count_is_flat(self):
+        def count_queries(transactions):
+            with CaptureQueriesContext(connection) as context:
+                self.post_move(transactions)
+            return len(context.captured_queries)
+
+        small = count_queries(self.add_transactions(12))
+        self.target = self.create_target('Kniha 3')
+        get_user_books(self.user)  # Nová kniha zneplatnila seznam knih v cache, první měření ho mělo načtený
+        large = count_queries(self.add_transactions(240))
+        self.assertEqual(small, large)
+        self.assertEqual(Transaction.objects.filter(book=self.target).count(), 240)
+
+
+class SelectAllBulkActionTests(BookTestMixin, TestCase):
+    """Hromadné akce v režimu "vybrat vše": výběr se sestaví na serveru z filtru, ne ze seznamu ID."""
+
+    def setUp(self):
+        self.user, self.book = self.create_book()
+        self.other_user, self.other_book = self.create_book(email='other@budgetlog.cz')
+        self.food = Category.objects.create(name='Jídlo', book=self.book)
+        self.trip = Tag.objects.create(name='Výlet', book=self.book)
+        self.marked = Tag.objects.create(name='Označeno', book=self.book)
+        for index in range(6):
+            transaction = Transaction.objects.create(book=self.book, amount=100 + index, datestamp=date(2024, 3, 1),
+                                                     category=self.food if index % 2 else None)
+            if index < 4:
+                transaction.tags.add(self.trip)
+        self.foreign = Transaction.objects.create(book=self.other_book, amount=105, datestamp=date(2024, 3, 1))
+        self.login_to_book(self.user, self.book)
+
+    def post_select_all(self, filter_query, action, **data):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(reverse('bulk-transaction-action'), {
+                'select_all': 'true', 'filter_query': filter_query, 'action': action, **data,
+            })
+        self.assertEqual(response.status_code, 200)
+        self.queries = [query['sql'] for query in context.captured_queries]
+        return response
+
+    def test_ajax_list_returns_count_instead_of_ids(self):
+        response = self.client.get(reverse('transaction-list') + f'?category={self.food.id}',
+                                   HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.json(), {'count': 3})
+
+    def test_assign_tag_to_all_matching_filter(self):
+        self.post_select_all(f'category={self.food.id}', 'assign_tag', bulk_tag=self.marked.id)
+        # Výběr je v SQL poddotaz podle filtru, žádný seznam ID v parametrech
+        self.assertFalse([sql for sql in self.queries if re.search(r'"id" IN \(\d+', sql)])
+        self.assertEqual(set(Transaction.objects.filter(tags=self.marked).values_list('category', flat=True)),
+                         {self.food.id})
+        self.assertEqual(Transaction.objects.filter(tags=self.marked).count(), 3)
+
+    def test_repeated_filter_parameters_are_kept(self):
+        self.post_select_all(f'tags={self.trip.id}&amount_min=102', 'delete')
+        self.assertEqual(sorted(Transaction.objects.filter(book=self.book).values_list('amount', flat=True)),
+                         [100, 101, 104, 105])
+
+    def test_select_all_stays_in_current_book(self):
+        response = self.post_select_all('amount_min=105', 'delete')
+        self.assertTrue(Transaction.objects.filter(pk=self.foreign.pk).exists())
+        self.assertEqual(Transaction.objects.filter(book=self.book).count(), 5)
+        self.assertEqual(response.json()['redirect_url'], reverse('transaction-list') + '?amount_min=105')
+
+    def test_select_all_key_ignores_pagination(self):
+        url = reverse('transaction-list')
+        keys = {self.client.get(f'{url}?tags={self.trip.id}{suffix}').context['filter_query']
+                for suffix in ('', '&page=2', '&pagination=cursor&cursor=abc')}
+        self.assertEqual(keys, {f'tags={self.trip.id}'})
+
+    def test_select_all_from_later_page_affects_every_match(self):
+        response = self.post_select_all(f'tags={self.trip.id}&page=2&pagination=cursor&cursor=abc', 'assign_tag',
+                                        bulk_tag=self.marked.id, page='2')
+        self.assertEqual(Transaction.objects.filter(tags=self.marked).count(), 4)
+        self.assertEqual(response.json()['redirect_url'], f"{reverse('transaction-list')}?tags={self.trip.id}&page=2")
+
+    def test_invalid_filter_does_nothing(self):
+        self.post_select_all('amount_min=abc', 'delete')
+        self.assertEqual(Transaction.objects.filter(book=self.book).count(), 6)
+
+    def test_selected_ids_are_scoped_to_current_book(self):
+        ids = ','.join(str(pk) for pk in Transaction.objects.values_list('id', flat=True))
+        self.client.post(reverse('bulk-transaction-action'), {'selected_transactions': ids, 'action': 'delete'})
+        self.assertEqual(list(Transaction.objects.values_list('id', flat=True)), [self.foreign.pk])
+
+    def test_export_all_matching_filter(self):
+        response = self.post_select_all(f'tags={self.trip.id}', 'export_csv')
+        rows = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(len(rows), 5)
+
+
+class BookVersionCacheTests(BookTestMixin, TestCase):
+    """Cache souhrnů podle verze knihy: opakovaný požadavek nepočítá souhrny znovu, každý zápis je zneplatní."""
+
+    def setUp(self):
+        self.user, self.book = self.create_book()
+        self.food = Category.objects.create(name='Jídlo', book=self.book)
+        self.tag = Tag.objects.create(name='Výlet', book=self.book)
+        for amount in (100, 200):
+            Transaction.objects.create(book=self.book, amount=amount, category=self.food, datestamp=date(2024, 3, 1))
+        self.login_to_book(self.user, self.book)
+
+    def aggregate_queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return response, [query['sql'] for query in context.captured_queries if 'AVG(' in query['sql']]
+
+    def test_list_aggregates_are_cached_per_filter(self):
+        url = reverse('transaction-list')
+        _, queries = self.aggregate_queries(url)
+        self.assertEqual(len(queries), 1)
+        response, queries = self.aggregate_queries(url)
+        self.assertEqual((queries, response.context['transaction_count']), ([], 2))
+
+        response, queries = self.aggregate_queries(url, {'amount_min': 150})
+        self.assertEqual((len(queries), response.context['transaction_count']), (1, 1))
+        # Stejný filtr s jinak zapsanou hodnotou sdílí záznam
+        response, queries = self.aggregate_queries(url, {'amount_min': '150.00', 'description': ''})
+        self.assertEqual((queries, response.context['transaction_count']), ([], 1))
+
+    def test_writes_invalidate_cached_aggregates(self):
+        url = reverse('transaction-list')
+        self.aggregate_queries(url, {'tags': self.tag.id})
+
+        Transaction.objects.filter(book=self.book).add_tag(self.tag)
+        response, queries = self.aggregate_queries(url, {'tags': self.tag.id})
+        self.assertEqual((len(queries), response.context['transaction_count']), (1, 2))
+
+        Transaction.objects.create(book=self.book, amount=50, datestamp=date(2024, 3, 2))
+        self.assertEqual(self.aggregate_queries(url)[0].context['transaction_count'], 3)
+
+        ids = ','.join(str(pk) for pk in Transaction.objects.values_list('id', flat=True))
+        self.client.post(reverse('bulk-transaction-action'), {'selected_transactions': ids, 'action': 'delete'})
+        self.assertEqual(self.aggregate_queries(url)[0].context['transaction_count'], 0)
+
+    def test_other_books_keep_their_cache(self):
+        other_user, other_book = self.create_book(email='other@budgetlog.cz')
+        version = caching.get_book_version(self.book.id)
+        Transaction.objects.create(book=other_book, amount=10, datestamp=date(2024, 3, 1))
+        self.assertEqual(caching.get_book_version(self.book.id), version)
+
+    def test_every_bump_writes_a_new_version(self):
+        # Souběžné zvýšení přes cache.incr (u souborové cache načtení a zápis) by mohlo uložit stejnou hodnotu
+        versions = {caching.get_book_version(self.book.id)}
+        with mock.patch.object(caching.get_cache(), 'incr', side_effect=AssertionError('incr není atomický')):
+            for _ in range(3):
+                caching.bump_book_version(self.book.id)
+                versions.add(caching.get_book_version(self.book.id))
+        self.assertEqual(len(versions), 4)
+
+    def test_month_and_year_reports_are_cached_and_invalidated(self):
+        month_url = reverse('month-detail', args=[2024, 3])
+        year_url = reverse('year-detail', args=[2024])
+        self.assertEqual(self.client.get(month_url).context['total_expense'], 300)
+        self.assertEqual(self.client.get(year_url).context['total_expense'], 300)
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(month_url)
+            self.client.get(year_url)
+        self.assertFalse([query for query in context.captured_queries
+                          if 'budgetlog_monthlycategoryrollup' in query['sql']])
+
+        rollups.update_transactions(Transaction.objects.filter(book=self.book), type='income')
+        self.assertEqual(self.client.get(month_url).context['total_income'], 300)
+        self.assertEqual(self.client.get(year_url).context['total_income'], 300)
+
+    def test_stats_count_hits_and_misses(self):
+        caching.reset_stats()
+        self.client.get(reverse('transaction-list'))
+        self.client.get(reverse('transaction-list'))
+        self.assertEqual(caching.stats(), {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+        out = StringIO()
+        call_command('cache_stats', '--reset', stdout=out)
+        self.assertIn('Zásahy: 1, minutí: 1, úspěšnost: 50.0 %', out.getvalue())
+        self.assertEqual(caching.stats()['hits'], 0)
+
+    def test_stats_are_not_written_to_cache_by_default(self):
+        caching.reset_stats()
+        with mock.patch.object(caching.get_cache(), 'incr') as incr:
+            self.client.get(reverse('transaction-list'))
+            self.client.get(reverse('transaction-list'))
+        incr.assert_not_called()
+        self.assertEqual(caching.stats()['hits'], 1)
+
+    @override_settings(BUDGETLOG_CACHE_STATS=True)
+    def test_shared_stats_are_opt_in(self):
+        caching.reset_stats()
+        self.client.get(reverse('transaction-list'))
+        self.client.get(reverse('transaction-list'))
+        caching._local_stats.clear()  # Jiný proces (příkaz cache_stats) vidí jen sdílené čítače
+        self.assertEqual(caching.stats(), {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+
+class DescriptionSearchTests(BookTestMixin, TestCase):
+    """Fulltextové vyhledávání v popisech: prefixy, diakritika, řazení podle relevance a synchronizace indexu."""
+
+    def setUp(self):
+        self.user, self.book = self.create_book()
+        self.other_user, self.other_book = self.create_book(email='other@budgetlog.cz')
+        self.coffee = self.add('Káva v kavárně Slavia', date(2024, 3, 1))
+        self.lunch = self.add('Oběd s kolegy, káva', date(2024, 3, 5))
+        self.cakes = self.add('Zákusky', date(2024, 3, 6))
+        self.foreign = Transaction.objects.create(book=self.other_book, amount=1, description='Káva',
+                                                  datestamp=date(2024, 3, 1))
+
+    def add(self, description, datestamp):
+        return Transaction.objects.create(book=self.book, amount=10, description=description, datestamp=datestamp)
+
+    def search(self, text):
+        queryset = Transaction.objects.filter(book=self.book)
+        return list(TransactionFilter({'description': text}, queryset=queryset, book=self.book).qs)
+
+    def test_fulltext_index_is_available(self):
+        self.assertTrue(search.is_available())
+
+    def test_prefix_and_diacritics_insensitive(self):
+        self.assertCountEqual(self.search('KAVA'), [self.coffee, self.lunch])
+        self.assertEqual(self.search('kavar'), [self.coffee])
+        self.assertEqual(self.search('obed kol'), [self.lunch])
+        self.assertEqual(self.search('zakus'), [self.cakes])
+
+    def test_results_are_ranked(self):
+        # "káva" tvoří větší část krátkého popisu, takže je relevantnější než v delší větě
+        first = self.add('Káva', date(2024, 1, 1))
+        self.assertEqual(self.search('káva')[0], first)
+
+    def test_query_operators_are_treated_as_words(self):
+        self.assertEqual(self.search('"Slavia" OR'), [])
+        self.assertEqual(self.search('slavia*'), [self.coffee])
+        self.assertEqual(len(self.search('  ,. ')), 3)
+
+    def test_index_follows_bulk_writes(self):
+        Transaction.objects.filter(pk=self.cakes.pk).update(description='Dort a káva')
+        self.assertIn(self.cakes, self.search('dort'))
+        created = Transaction.objects.bulk_create([
+            Transaction(book=self.book, amount=5, description='Čaj', datestamp=date(2024, 4, 1))
+        ])
+        self.assertEqual(self.search('caj'), created)
+        rollups.delete_transactions(Transaction.objects.filter(pk=self.coffee.pk))
+        self.assertEqual(self.search('slavia'), [])
+
+    def test_fallback_without_index(self):
+        with mock.patch('budgetlog.search.is_available', return_value=False):
+            self.assertEqual(self.search('kolegy, ká'), [self.lunch])
+            self.assertEqual(self.search('kava'), [])
+
+
+class TagFilterModeTests(BookTestMixin, TestCase):
+    """Filtr tagů v režimech všechny / alespoň jeden / žádný s pevným počtem JOINů."""
+
+    def setUp(self):
+        self.user, self.book = self.create_book()
+        self.tags = Tag.objects.bulk_create([Tag(name=f'Tag {i}', book=self.book) for i in range(5)])
+        self.all_tags = self.add(*self.tags)
+        self.first_two = self.add(*self.tags[:2])
+        self.first = self.add(self.tags[0])
+        self.untagged = self.add()
+
+    def add(self, *tags):
+        transaction = Transaction.objects.create(book=self.book, amount=10, datestamp=date(2024, 3, 1))
+        transaction.tags.set(tags)
+        return transaction
+
+    def filtered(self, tags, mode=None):
+        params = {'tags': [tag.id for tag in tags]}
+        if mode:
+            params['tag_mode'] = mode
+        return TransactionFilter(params, queryset=Transaction.objects.filter(book=self.book), book=self.book).qs
+
+    def test_all_mode_is_default(self):
+        self.assertCountEqual(self.filtered(self.tags[:2]), [self.all_tags, self.first_two])
+        self.assertCountEqual(self.filtered(self.tags[:2], 'all'), [self.all_tags, self.first_two])
+        self.assertCountEqual(self.filtered(self.tags), [self.all_tags])
+
+    def test_any_and_none_modes(self):
+        self.assertCountEqual(self.filtered(self.tags[1:3], 'any'), [self.all_tags, self.first_two])
+        self.assertCountEqual(self.filtered(self.tags[1:3], 'none'), [self.first, self.untagged])
+
+    def test_mode_without_tags_does_not_filter(self):
+        self.assertEqual(self.filtered([], 'none').count(), 4)
+
+    def test_join_count_does_not_grow_with_tags(self):
+        for mode in ('all', 'any', 'none'):
+            with self.subTest(mode=mode):
+                sql = [str(self.filtered(self.tags[:count], mode).query).upper() for count in (1, 5)]
+                self.assertEqual(sql[0].count('JOIN'), 0, sql[0])
+                self.assertEqual(sql[1].count('JOIN'), 0, sql[1])
+                self.assertEqual(sql[1].count('SELECT'), 2, sql[1])
+
+    def test_list_view_renders_mode_choices(self):
+        self.login_to_book(self.user, self.book)
+        response = self.client.get(reverse('transaction-list'),
+                                   {'tags': [self.tags[0].id, self.tags[1].id], 'tag_mode': 'any'})
+        self.assertEqual(response.context['transaction_count'], 3)
+        self.assertContains(response, 'id="id_tag_mode_', count=3)
+        self.assertEqual(response.context['filter'].form['tag_mode'].value(), 'any')
+
+
+class CurrentBookMiddlewareTests(BookTestMixin, TestCase):
+    """Aktuální kniha a seznam knih se určí jednou za požadavek, bez dotazů na knihy, dokud se knihy nezmění."""
+
+    def setUp(self):
+        self.user, self.book = self.create_book()
+        self.second = Book.objects.create(name='Kniha 2', owner=self.user)
+        self.other_user, self.other_book = self.create_book(email='other@budgetlog.cz', name='Cizí kniha')
+        self.login_to_book(self.user, self.book)
+
+    def book_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, [query['sql'] for query in context.captured_queries if 'FROM "budgetlog_book"' in query['sql']]
+
+    def test_pages_do_not_query_books(self):
+        for url in (reverse('category-list'), reverse('book-list'), reverse('transaction-list'),
+                    reverse('dashboard')):
+            with self.subTest(url=url):
+                response, queries = self.book_queries(url)
+                self.assertEqual(queries, [])
+                self.assertEqual(response.wsgi_request.book, self.book)
+                self.assertEqual(response.context['current_book'], self.book)
+                self.assertEqual(list(response.context['all_books']), [self.book, self.second])
+
+    def test_book_list_changes_invalidate_cache(self):
+        self.client.post(reverse('book-edit', args=[self.second.id]), {'name': 'Přejmenovaná'})
+        response, queries = self.book_queries(reverse('book-list'))
+        self.assertEqual(len(queries), 1)
+        self.assertEqual([book.name for book in response.context['all_books']], ['Kniha 1', 'Přejmenovaná'])
+
+        self.client.post(reverse('book-add'), {'name': 'Nová'})
+        response, _ = self.book_queries(reverse('book-list'))
+        self.assertEqual(len(response.context['all_books']), 3)
+
+        self.second.delete()
+        response, _ = self.book_queries(reverse('book-list'))
+        self.assertEqual([book.name for book in response.context['all_books']], ['Kniha 1', 'Nová'])
+
+    def test_late_write_of_old_book_list_is_never_read(self):
+        # Souběžný požadavek načetl seznam knih před commitem nové knihy a uloží ho až po zneplatnění
+        stale_key = caching.user_books_key(self.user.pk)
+        stale_books = list(Book.objects.filter(owner=self.user).order_by('pk'))
+        Book.objects.create(name='Nová', owner=self.user)
+        caching.get_cache().set(stale_key, stale_books)
+        self.assertEqual([book.name for book in get_user_books(self.user)], ['Kniha 1', 'Kniha 2', 'Nová'])
+
+    def test_foreign_book_is_never_current(self):
+        session = self.client.session
+        session['current_book_id'] = self.other_book.id
+        session.save()
+        response, _ = self.book_queries(reverse('category-list'))
+        self.assertIsNone(response.wsgi_request.book)
+        self.assertEqual(self.client.get(reverse('select-book', args=[self.other_book.id])).status_code, 404)
+
+    def test_objects_of_other_book_return_404(self):
+        transaction = Transaction.objects.create(book=self.second, amount=1, datestamp=date(2024, 1, 1))
+        category = Category.objects.create(name='Jiná', book=self.second)
+        self.assertEqual(self.client.get(reverse('transaction-detail', args=[transaction.id])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('category-edit', args=[category.id])).status_code, 404)
+        self.client.get(reverse('select-book', args=[self.second.id]))
+        self.assertEqual(self.client.get(reverse('transaction-detail', args=[transaction.id])).status_code, 200)
+        self.assertEqual(self.client.get(reverse('category-edit', args=[category.id])).status_code, 200)
+
+    def test_anonymous_request_has_no_books(self):
+        self.client.logout()
+        response = self.client.get(reverse('login'))
+        self.assertEqual(response.wsgi_request.books, [])
+        self.assertIsNone(response.wsgi_request.book)
+
+
+@override_settings(**settings.REQUEST_PROFILES['cached'])
+class CachedRequestProfileTests(BookTestMixin, TestCase):
+    """Profil požadavků s uživatelem a sezením v cache: bez dotazů na sezení a uživatele, odhlášení platí dál."""
+
+    def setUp(self):
+        self.user, self.book = self.create_book()
+        self.client.force_login(self.user)
+        self.client.get(reverse('select-book', args=[self.book.id]))
+
+    def overhead(self, client=None):
+        """Vrátí (odpověď, dotazy na sezení a uživatele) pro seznam knih."""
+        with CaptureQueriesContext(connection) as context:
+            response = (client or self.client).get(reverse('book-list'))
+        return response, [query['sql'] for query in context.captured_queries
+                          if '"django_session"' in query['sql'] or '"budgetlog_appuser"' in query['sql']]
+
+    def test_warm_request_skips_session_and_user_queries(self):
+        self.overhead()
+        response, queries = self.overhead()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, [])
+        self.assertEqual(response.wsgi_request.user, self.user)
+        self.assertEqual(response.wsgi_request.book, self.book)
+
+    def test_password_change_logs_out_other_sessions(self):
+        other = self.client_class()
+        other.force_login(self.user)
+        self.overhead(other)
+        response = self.client.post(reverse('change-password'), {
+            'old_password': 'password123', 'new_password1': 'Nove-heslo-42', 'new_password2': 'Nove-heslo-42',
+        })
+        self.assertRedirects(response, reverse('profile'))
+        # Sezení, ve kterém se heslo měnilo, zůstává přihlášené, ostatní se odhlásí
+        self.assertTrue(self.overhead()[0].wsgi_request.user.is_authenticated)
+        self.assertFalse(self.overhead(other)[0].wsgi_request.user.is_authenticated)
+
+    def test_logout_and_deactivation(self):
+        self.overhead()
+        self.client.get(reverse('logout'))
+        response, _ = self.overhead()
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
+
+        self.client.force_login(self.user)
+        self.overhead()
+        self.user.is_active = False
+        self.user.save()
+        self.assertFalse(self.overhead()[0].wsgi_request.user.is_authenticated)
+
+    @override_settings(**settings.REQUEST_PROFILES['cookies'])
+    def test_signed_cookie_sessions(self):
+        client = self.client_class()
+        client.force_login(self.user)
+        client.get(reverse('select-book', args=[self.book.id]))
+        self.overhead(client)
+        response, queries = self.overhead(client)
+        self.assertEqual(queries, [])
+        self.assertEqual(response.wsgi_request.book, self.book)
+
+
+class SignedAmountTests(BookTestMixin, TestCase):
+    """Uložený sloupec signed_amount: přepočet při každém zápisu a souhrny bez výrazů CASE nad indexem."""
+
+    def setUp(self):
+        self.user, self.book = self.create_book()
+        self.income = Transaction.objects.create(book=self.book, amount=Decimal('100.50'), type='income',
+                                                 datestamp=date(2024, 3, 1))
+        self.expense = Transaction.objects.create(book=self.book, amount=Decimal('40.25'), type='expense',
+                                                  datestamp=date(2024, 3, 2))
+
+    def signed(self, transaction):
+        return Transaction.objects.values_list('signed_amount', flat=True).get(pk=transaction.pk)
+
+    def test_follows_every_write(self):
+        self.assertEqual(self.signed(self.income), Decimal('100.50'))
+        self.assertEqual(self.signed(self.expense), Decimal('-40.25'))
+
+        self.expense.amount = Decimal('50')
+        self.expense.save()
+        self.assertEqual(self.signed(self.expense), Decimal('-50.00'))
+
+        Transaction.objects.filter(pk=self.income.pk).update(type='expense')
+        self.assertEqual(self.signed(self.income), Decimal('-100.50'))
+
+        created, = Transaction.objects.bulk_create([
+            Transaction(book=self.book, amount=Decimal('7.10'), type='income', datestamp=date(2024, 3, 3))
+        ])
+        self.assertEqual(self.signed(created), Decimal('7.10'))
+        self.assertEqual(created.adjusted_amount, Decimal('7.10'))
+
+    def test_list_aggregates_read_one_indexed_column(self):
+        self.login_to_book(self.user, self.book)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('transaction-list'))
+        self.assertEqual(response.context['balance'], Decimal('60.25'))
+        self.assertEqual(response.context['min_transaction_amount'], Decimal('-40.25'))
+        aggregate_sql = [query['sql'] for query in context.captured_queries if 'AVG(' in query['sql']]
+        self.assertEqual(len(aggregate_sql), 1)
+        self.assertNotIn('CASE', aggregate_sql[0])
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + aggregate_sql[0])
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('INDEX transaction_book_signed_idx (book_id=?)', plan)
+
+
+class BookAnalyticsTests(BookTestMixin, TestCase):
+    """Sloupce knihy v paměti (ANALYTICS_ENGINE = 'numpy') dávají stejné přehledy jako SQL."""
+
+    def setUp(self):
+        self.user, self.book = self.create_book()
+        self.food = Category.objects.create(name='Jídlo', book=self.book)
+        self.salary = Category.objects.create(name='Plat', book=self.book)
+        self.lunch = Tag.objects.create(name='Oběd', book=self.book)
+        self.work = Tag.objects.create(name='Práce', book=self.book)
+        rows = [
+            ('120.50', 'expense', self.food, date(2023, 12, 30), [self.lunch]),
+            ('45.10', 'expense', self.food, date(2024, 1, 5), [self.lunch, self.work]),
+            ('30000', 'income', self.salary, date(2024, 1, 15), [self.work]),
+            ('999.99', 'expense', None, date(2024, 1, 20), []),
+            ('10.01', 'income', self.food, date(2024, 2, 1), []),
+        ]
+        for amount, type_, category, day, tags in rows:
+            transaction = Transaction.objects.create(book=self.book, amount=Decimal(amount), type=type_,
+                                                     category=category, datestamp=day)
+            transaction.tags.set(tags)
+
+    def test_filters_match_sql_aggregates(self):
+        mixin = TransactionSummaryMixin()
+        base = Transaction.objects.filter(book=self.book)
+        analytics = BookAnalytics.load(self.book)
+        for params in ({}, {'type': 'expense'}, {'category': self.food.pk}, {'amount_min': '45.10'},
+                       {'amount_max': '100'}, {'datestamp__gte': '2024-01-05', 'datestamp__lte': '2024-01-20'},
+                       {'tags': [self.lunch.pk, self.work.pk]},
+                       {'tags': [self.lunch.pk, self.work.pk], 'tag_mode': 'any'},
+                       {'tags': [self.lunch.pk], 'tag_mode': 'none', 'type': 'expense'}):
+            with self.subTest(params=params):
+                filterset = TransactionFilter(params, queryset=base, book=self.book)
+                self.assertTrue(filterset.is_valid())
+                expected = mixin.get_aggregates(filterset.qs)
+                actual = analytics.aggregates(analytics.select(**filterset.form.cleaned_data))
+                self.assertEqual(actual['transaction_count'], expected['transaction_count'])
+                self.assertEqual(actual, expected)
+
+    def test_get_aggregates_same_for_both_engines(self):
+        view = MonthDetailView()
+        view.request = SimpleNamespace(book=self.book)
+        base = Transaction.objects.filter(book=self.book)
+        # Průměry 5768.884, -51.863… a -388.53 ověří i zaokrouhlení na haléře
+        for params in ({}, {'category': self.food.pk}, {'type': 'expense'}, {'amount_min': '1000'}):
+            with self.subTest(params=params):
+                filterset = TransactionFilter(params, queryset=base, book=self.book)
+                self.assertTrue(filterset.is_valid())
+                results = {}
+                for engine in ('sql', 'numpy'):
+                    with override_settings(ANALYTICS_ENGINE=engine):
+                        results[engine] = view.get_aggregates(filterset.qs, filterset.form.cleaned_data)
+                self.assertEqual(results['numpy'], results['sql'])
+                self.assertEqual(results['numpy']['average_amount'].as_tuple().exponent, -2)
+
+    def test_description_filter_stays_in_sql(self):
+        self.assertTrue(BookAnalytics.supports({'type': 'expense', 'description': ''}))
+        self.assertFalse(BookAnalytics.supports({'description': 'oběd'}))
+        with self.assertRaises(ValueError):
+            BookAnalytics.load(self.book).select(description='oběd')
+
+    def test_pivot_totals_and_percentiles(self):
+        with self.assertNumQueries(2):
+            analytics = BookAnalytics.load(self.book)
+
+        expected = YearlyCategoryPivot(self.book, 2024)
+        pivot = YearlyCategoryPivot(self.book, 2024, analytics)
+        for matrix in ('income', 'expense', 'counts'):
+            self.assertEqual(getattr(pivot, matrix).tolist(), getattr(expected, matrix).tolist())
+
+        january = analytics.select(year=2024, month=1)
+        self.assertEqual(analytics.totals(january), (30000.0, 1045.09, 28954.91))
+        balances, expenses = analytics.category_totals(january)
+        self.assertEqual(balances, {None: -99999, self.food.pk: -4510, self.salary.pk: 3000000})
+        self.assertEqual(expenses[self.salary.pk], 0)
+        self.assertEqual(analytics.percentiles((0, 50, 100)),
+                         [Decimal('-999.99'), Decimal('-45.10'), Decimal('30000.00')])
+
+    def test_reloaded_after_book_changes(self):
+        self.assertEqual(len(BookAnalytics.for_book(self.book)), 5)
+        with self.assertNumQueries(0):
+            BookAnalytics.for_book(self.book)
+
+        Transaction.objects.create(book=self.book, amount=1, datestamp=date(2024, 2, 2))
+        self.assertEqual(len(BookAnalytics.for_book(self.book)), 6)
+        Transaction.objects.filter(book=self.book, category=self.food).delete()
+        self.assertEqual(len(BookAnalytics.for_book(self.book)), 3)
+
+    def test_views_match_sql_engine(self):
+        self.login_to_book(self.user, self.book)
+        pages = [
+            (reverse('month-detail', args=[2024, 1]), ('total_income', 'total_expense', 'total_balance')),
+            (reverse('year-detail', args=[2024]), ('total_income', 'total_expense', 'monthly_data_json')),
+            (reverse('transaction-list') + f'?tags={self.work.pk}', ('balance', 'transaction_count')),
+        ]
+        for url, names in pages:
+            with self.subTest(url=url):
+                responses = {}
+                for engine in ('sql', 'numpy'):
+                    caching.bump_book_version(self.book.id)  # Souhrny se nevezmou z cache
+                    with override_settings(ANALYTICS_ENGINE=engine), \
+                            CaptureQueriesContext(connection) as context:
+                        responses[engine] = self.client.get(url)
+                # Se sloupci v paměti se nečtou měsíční souhrny ani agregace nad transakcemi
+                self.assertFalse([query['sql'] for query in context.captured_queries
+                                  if 'monthlycategoryrollup' in query['sql'] or 'AVG(' in query['sql']])
+                for name in names:
+                    self.assertEqual(responses['numpy'].context[name], responses['sql'].context[name])
+                summaries = {engine: [(category.name, category.total)
+                                      for category in response.context.get('category_summaries', [])]
+                             for engine, response in responses.items()}
+                self.assertEqual(summaries['numpy'], summaries['sql'])
+
+
+class BalanceSeriesTests(BookTestMixin, TestCase):
+    """Průběžný zůstatek z okenní funkce v databázi, seskupený do období a omezený počtem bodů."""
+
+    def setUp(self):
+        self.user, self.book = self.create_book()
+        for amount, type_, day in (('1000', 'income', date(2024, 1, 1)), ('100.10', 'expense', date(2024, 1, 1)),
+                                   ('50', 'expense', date(2024, 1, 3)), ('200', 'income', date(2024, 2, 10)),
+                                   ('0.30', 'expense', date(2024, 3, 31))):
+            Transaction.objects.create(book=self.book, amount=Decimal(amount), type=type_, datestamp=day)
+        self.login_to_book(self.user, self.book)
+
+    def series(self, **params):
+        response = self.client.get(reverse('balance-series'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_daily_balances_use_a_window_over_days(self):
+        balances = Transaction.objects.filter(book=self.book).daily_balances()
+        self.assertIn('OVER (ORDER BY', str(balances.query))
+        self.assertEqual([(day, balance.quantize(Decimal('0.01'))) for day, balance in balances], [
+            (date(2024, 1, 1), Decimal('899.90')), (date(2024, 1, 3), Decimal('849.90')),
+            (date(2024, 2, 10), Decimal('1049.90')), (date(2024, 3, 31), Decimal('1049.60')),
+        ])
+
+    def test_periods_carry_balance_forward(self):
+        series = self.series(period='month')
+        self.assertEqual(series, {'period': 'month', 'dates': ['2024-01-01', '2024-02-01', '2024-03-01'],
+                                  'balances': [849.9, 1049.9, 1049.6]})
+
+        series = self.series(period='week')
+        self.assertEqual(len(series['dates']), 13)
+        self.assertEqual(series['dates'][:2], ['2024-01-01', '2024-01-08'])
+        self.assertEqual(series['balances'][:2], [849.9, 849.9])
+
+        series = self.series(period='day')
+        self.assertEqual(series['period'], 'day')
+        self.assertEqual(len(series['dates']), 91)
+        self.assertEqual(series['balances'][:3], [899.9, 899.9, 849.9])
+
+    def test_coarser_period_when_too_many_points(self):
+        with override_settings(BALANCE_SERIES_MAX_POINTS=20):
+            self.assertEqual(self.series(period='day')['period'], 'week')
+        with override_settings(BALANCE_SERIES_MAX_POINTS=2):
+            series = self.series()
+            # Ani měsíce se nevejdou: zůstane každý druhý měsíc, vždy včetně posledního
+            self.assertEqual((series['period'], series['dates'], series['balances']),
+                             ('month', ['2024-01-01', '2024-03-01'], [849.9, 1049.6]))
+
+    def test_filter_and_cache(self):
+        series = self.series(period='month', type='expense')
+        self.assertEqual(series['balances'], [-150.1, -150.1, -150.4])
+
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.series(period='month', type='expense'), series)
+        self.assertFalse([query for query in context.captured_queries if 'OVER' in query['sql']])
+
+        Transaction.objects.create(book=self.book, amount=1, type='expense', datestamp=date(2024, 3, 1))
+        self.assertEqual(self.series(period='month', type='expense')['balances'], [-150.1, -150.1, -151.4])
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(reverse('balance-series'), {'period': 'year'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('balance-series'), {'amount_min': 'x'}).status_code, 400)
+        self.assertEqual(self.series(category=Category.objects.get(book=self.book).pk),
+                         {'period': 'day', 'dates': [], 'balances': []})
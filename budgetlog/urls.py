@@ -30,6 +30,7 @@ urlpatterns = [
     path('transaction/<int:pk>/', views.TransactionDetailView.as_view(), name='transaction-detail'),
     path('transactions/bulk-action/', views.BulkTransactionActionView.as_view(), name='bulk-transaction-action'),
     path('transactions/upload/', views.UploadTransactionsView.as_view(), name='upload-transactions'),
+    path('transactions/upload/jobs/<int:pk>/', views.ImportJobProgressView.as_view(), name='import-job-progress'),
     path("download-template/", views.download_csv_template, name="download_csv_template"),
 
     # Sekce pro kategorie
@@ -49,6 +50,8 @@ urlpatterns = [
     path('dashboard/', views.DashboardView.as_view(), name='dashboard'),
     path('dashboard/month/<int:year>/<int:month>/', views.MonthDetailView.as_view(), name='month-detail'),
     path('dashboard/year/<int:year>/', views.YearDetailView.as_view(), name='year-detail'),
+    path('dashboard/balance/', views.BalanceSeriesView.as_view(), name='balance-series'),
+    path('charts/<slug:key>.png', views.ChartImageView.as_view(), name='chart-image'),
 
     # Sekce pro uživatele
     path('register/', views.UserViewRegister.as_view(), name='registration'),
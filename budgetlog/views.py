@@ -1,14 +1,11 @@
 # Standardní knihovny Pythonu
-import io
-import base64
 import csv
-import chardet
 import json
 import random
 import re
-from datetime import date, datetime
+from datetime import date
 from decimal import Decimal
-from io import StringIO, TextIOWrapper
+from io import TextIOWrapper
 
 # Django importy
 from django.conf import settings
@@ -19,17 +16,19 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.tokens import default_token_generator
 from django.contrib.auth.views import PasswordResetView, PasswordChangeView, PasswordResetConfirmView
 from django.core.mail import EmailMultiAlternatives
-from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
+from django.core.paginator import PageNotAnInteger, EmptyPage
 from django.db.models import (
     Sum, DecimalField, Q, F, Case, When, Max, Min, Avg, Value, Count
 )
 from django.db.models.functions import Coalesce
 from django.http import (
-    HttpResponse, HttpResponseForbidden, JsonResponse, QueryDict, HttpResponseRedirect
+    HttpResponse, HttpResponseForbidden, JsonResponse, QueryDict, HttpResponseRedirect, Http404,
+    StreamingHttpResponse
 )
 from django.shortcuts import redirect, render, get_object_or_404
 from django.template.loader import render_to_string
 from django.urls import reverse, reverse_lazy
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
 from django.utils.dateformat import format
 from django.utils.encoding import force_bytes
 from django.utils.http import urlsafe_base64_encode
@@ -37,19 +36,22 @@ from django.views import View
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView, TemplateView
 
 # Třetí strany
-import numpy as np
-import pandas as pd
-import matplotlib
-matplotlib.use('Agg')  # Nastavení non-GUI backendu
-import matplotlib.pyplot as plt
 from django_filters.views import FilterView
 
 # Lokální aplikace
-from budgetlog.models import AppUser, Book, Transaction, Category, Tag
-from .filters import TransactionFilter
+from budgetlog.models import AppUser, Book, Transaction, Category, Tag, MonthlyCategoryRollup, ImportJob
+from . import balances, caching, charts, exports, rollups
+from .imports import get_importer
+from .moves import move_transactions
+from .filters import PAGINATION_PARAMS, TransactionFilter, without_pagination
+from .pagination import CountedPaginator, KeysetPaginator, InvalidCursor
 from .forms import *
 
 
+# Doba, po kterou si prohlížeč může graf držet v cache (obsah pod daným klíčem se nemění)
+CHART_MAX_AGE = 365 * 24 * 60 * 60
+
+
 def index_handler(request):
     return redirect("login")
 # Přesměrování z localhost:8000/ na localhost:8000/login/
@@ -267,17 +269,9 @@ class BookUpdateView(LoginRequiredMixin, UpdateView):
 class BookContextMixin:
     """Mixin, který poskytne aktuální knihu uživatele v pohledech."""
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.current_book = None
-
     def get_current_book(self):
-        """Vrátí aktuální knihu uživatele, pokud není v instanci, načte ji z databáze."""
-        if not self.current_book:
-            current_book_id = self.request.session.get('current_book_id')
-            if current_book_id:
-                self.current_book = Book.objects.filter(id=current_book_id, owner=self.request.user).first()
-        return self.current_book
+        """Vrátí aktuální knihu uživatele (určí ji jednou za požadavek CurrentBookMiddleware)."""
+        return self.request.book
 
     def form_valid(self, form):
         # Jen pokud form existuje a má instanci (Create/Update)
@@ -289,7 +283,7 @@ class BookContextMixin:
         context = super().get_context_data(**kwargs)
         current_book = self.get_current_book()
         context.update({
-            'all_books': Book.objects.filter(owner=self.request.user),
+            'all_books': self.request.books,
             'current_book': current_book
         })
         return context
@@ -300,6 +294,14 @@ class BookContextMixin:
         return queryset.filter(book=current_book) if current_book else queryset.none()
 
 
+def get_user_book(request, book_id):
+    """Vrátí knihu přihlášeného uživatele z `request.books` podle ID, jinak vyhodí Http404."""
+    for book in request.books:
+        if str(book.pk) == str(book_id):
+            return book
+    raise Http404("Kniha nebyla nalezena.")
+
+
 class SelectBookView(LoginRequiredMixin, View):
     """View pro zpracování výběru knihy uživatelem."""
 
@@ -309,9 +311,10 @@ class SelectBookView(LoginRequiredMixin, View):
         book_id = kwargs.get('book_id')
         if book_id:
             # Ověření, že kniha patří uživateli
-            book = get_object_or_404(Book, id=book_id, owner=request.user)
-            # Nastavení aktivní knihy v session
-            request.session['current_book_id'] = book.id
+            book = get_user_book(request, book_id)
+            # Nastavení aktivní knihy v session (sezení se zapisuje, jen když se kniha opravdu změní)
+            if request.session.get('current_book_id') != book.id:
+                request.session['current_book_id'] = book.id
             # Přesměrování na stránku pro přidání nové transakce
             return redirect('transaction-add')
         else:
@@ -321,42 +324,44 @@ class SelectBookView(LoginRequiredMixin, View):
 
 class TransactionSummaryMixin:
 
-    @staticmethod
-    def get_aggregates(filtered_qs):
-        """Vrací celkové statistiky transakcí (průměr, max/min, bilance, počet)."""
+    def cached(self, kind, params, compute):
+        """Vrátí výsledek z cache podle verze aktuální knihy, nebo ho spočítá funkcí `compute` (viz caching)."""
+        return caching.get_or_compute(self.get_current_book(), kind, params, compute)
+
+    def use_analytics(self):
+        """Přehledy se počítají ze sloupců knihy v paměti (ANALYTICS_ENGINE = 'numpy'), ne agregačními dotazy."""
+        return settings.ANALYTICS_ENGINE == 'numpy'
+
+    def get_analytics(self):
+        """Sloupce transakcí aktuální knihy; modul s NumPy se načítá až zde, ne při startu workeru."""
+        from .reports import BookAnalytics
+        return BookAnalytics.for_book(self.get_current_book())
+
+    def get_aggregates(self, filtered_qs, params=None):
+        """
+        Vrací celkové statistiky transakcí (průměr, max/min, bilance, počet).
+
+        :param params: cleaned_data filtru, ze kterého vznikl `filtered_qs`; s enginem 'numpy' se statistiky
+                       spočítají nad sloupci knihy, pokud engine umí všechny podmínky filtru.
+        """
+        if params is not None and self.use_analytics():
+            from .reports import BookAnalytics
+            if BookAnalytics.supports(params):
+                analytics = self.get_analytics()
+                return analytics.aggregates(analytics.select(**params))
+
+        # signed_amount je uložený sloupec (výdaj záporný), agregace jsou prosté funkce nad jedním sloupcem
         aggregates = filtered_qs.aggregate(
-            avg_amount=Avg(
-                Case(
-                    When(type='expense', then=-F('amount')),
-                    default=F('amount'),
-                    output_field=DecimalField()
-                )
-            ),
-            max_amount=Max(
-                Case(
-                    When(type='expense', then=-F('amount')),
-                    default=F('amount'),
-                    output_field=DecimalField()
-                )
-            ),
-            min_amount=Min(
-                Case(
-                    When(type='expense', then=-F('amount')),
-                    default=F('amount'),
-                    output_field=DecimalField()
-                )
-            ),
-            total_balance=Sum(
-                Case(
-                    When(type='expense', then=-F('amount')),
-                    default=F('amount'),
-                    output_field=DecimalField()
-                )
-            ),
+            avg_amount=Avg('signed_amount'),
+            max_amount=Max('signed_amount'),
+            min_amount=Min('signed_amount'),
+            total_balance=Sum('signed_amount'),
             count=Count('id')
         )
+        average = aggregates['avg_amount']
         return {
-            'average_amount': aggregates['avg_amount'] or 0,
+            # SQLite počítá průměr v plovoucí čárce, zaokrouhlí se na haléře jako v BookAnalytics.aggregates
+            'average_amount': average.quantize(Decimal('0.01')) if average is not None else 0,
             'max_transaction_amount': aggregates['max_amount'] or 0,
             'min_transaction_amount': aggregates['min_amount'] or 0,
             'balance': aggregates['total_balance'] or 0,
@@ -364,46 +369,40 @@ class TransactionSummaryMixin:
         }
 
     @staticmethod
-    def calculate_totals(filtered_qs):
-        """Výpočet celkových hodnot pro příjem, výdaje a bilanci."""
-        totals = filtered_qs.aggregate(
-            total_income=Coalesce(Sum('amount', filter=Q(type='income'), output_field=DecimalField()), Decimal('0')),
-            total_expense=Coalesce(Sum('amount', filter=Q(type='expense'), output_field=DecimalField()), Decimal('0'))
+    def calculate_totals(period_rollups):
+        """Výpočet celkových hodnot pro příjem, výdaje a bilanci z měsíčních souhrnů."""
+        totals = period_rollups.aggregate(
+            total_income=Coalesce(Sum('total', filter=Q(type='income'), output_field=DecimalField()), Decimal('0')),
+            total_expense=Coalesce(Sum('total', filter=Q(type='expense'), output_field=DecimalField()), Decimal('0'))
         )
         total_income = totals['total_income']
         total_expense = totals['total_expense']
         total_balance = total_income - total_expense
         return float(total_income), float(total_expense), float(total_balance)
 
-    def get_category_summaries(self, transactions, year=None, month=None):
-        """Získá souhrny kategorií pro daný rok a měsíc."""
+    @staticmethod
+    def signed_rollup_total():
+        """Výraz pro součet souhrnů kategorie se záporným znaménkem u výdajů."""
+        return Case(
+            When(rollups__type='expense', then=-F('rollups__total')),
+            default=F('rollups__total'),
+            output_field=DecimalField()
+        )
+
+    def get_category_summaries(self, year, month):
+        """Získá souhrny kategorií pro daný rok a měsíc z předpočítaných měsíčních souhrnů."""
         current_book = self.get_current_book()
+        period = Q(rollups__year=year, rollups__month=month)
         category_summaries = Category.objects.filter(book=current_book).annotate(
             total=Coalesce(
-                Sum(
-                    Case(
-                        When(transaction__type='expense', then=-F('transaction__amount')),
-                        default=F('transaction__amount'),
-                        output_field=DecimalField()
-                    ),
-                    filter=Q(transaction__datestamp__year=year, transaction__datestamp__month=month),
-                    output_field=DecimalField()
-                ),
+                Sum(self.signed_rollup_total(), filter=period, output_field=DecimalField()),
                 Decimal('0')
             )
         ).order_by('-total')
 
         category_expenses = Category.objects.filter(book=current_book).annotate(
             total=Coalesce(
-                Sum(
-                    Case(
-                        When(transaction__type='expense', then=F('transaction__amount')),
-                        default=Decimal('0'),
-                        output_field=DecimalField()
-                    ),
-                    filter=Q(transaction__datestamp__year=year, transaction__datestamp__month=month),
-                    output_field=DecimalField()
-                ),
+                Sum('rollups__total', filter=period & Q(rollups__type='expense'), output_field=DecimalField()),
                 Decimal('0')
             )
         ).order_by('total')
@@ -418,41 +417,25 @@ class TransactionSummaryMixin:
                 labels.append(category.name)
                 colors.append(category.color)
 
-        return category_summaries, data, labels, colors
+        return list(category_summaries), data, labels, colors
 
+    def get_analytics_category_summaries(self, analytics, mask):
+        """Totéž co get_category_summaries, ale z vybraných řádků sloupců knihy (BookAnalytics)."""
+        totals, expenses = analytics.category_totals(mask)
+        categories = list(Category.objects.filter(book=self.get_current_book()))
+        for category in categories:
+            category.total = Decimal(totals.get(category.id, 0)) / 100
 
-def generate_pie_chart(data, labels, colors, title="Výdaje podle kategorií"):
-    """
-    Vytvoří koláčový graf na základě poskytnutých dat a vrátí jej jako Base64 kódovaný obrázek.
-
-    Args:
-        data (list): Seznam hodnot reprezentující jednotlivé části koláče.
-        labels (list): Seznam názvů odpovídajících jednotlivým částem.
-        colors (list): Seznam barev odpovídajících jednotlivým částem.
-        title (str): Název grafu.
-
-    Returns:
-        str: Base64 reprezentace obrázku.
-    """
-
-    # Vytvoření grafu
-    fig, ax = plt.subplots(figsize=(6, 6))
-    total = sum(data)
-    explode = [0.2 if (value / total) < 0.05 else 0 for value in data]
-    ax.pie(data, labels=labels, colors=colors, explode=explode, autopct=lambda pct: '' if pct < 5 else f'{pct:.1f}%', startangle=180)  # autopct=lambda p: f'{p:.1f}%\n({p*total/100:.2f})' pro zobrazení konkrétní hodnoty pod x.x%
-    # ax.set_title(title)
-    # ax.legend(loc='upper right', bbox_to_anchor=(1.3, 1))
-
-
-    # Uložení grafu do Base64
-    buf = io.BytesIO()  # Vytváří objekt paměťového bufferu pro uložení obrázku.
-    plt.savefig(buf, format="png")  # Uloží graf do bufferu ve formátu PNG.
-    plt.close(fig)  # Zavře graf, aby se uvolnila paměť.
-    buf.seek(0)  # Posune ukazatel v bufferu na začátek, aby bylo možné data přečíst.
-    image_base64 = base64.b64encode(buf.read()).decode('utf-8')  # Převede obsah bufferu na Base64 a poté dekóduje na číselný řetězec.
-    buf.close()  # Zavře buffer.
+        data = []
+        labels = []
+        colors = []
+        for category in sorted(categories, key=lambda category: expenses.get(category.id, 0)):
+            if expenses.get(category.id, 0) > 0:  # Filtrujeme kategorie s nulovou hodnotou
+                data.append(expenses[category.id] / 100)
+                labels.append(category.name)
+                colors.append(category.color)
 
-    return image_base64
+        return sorted(categories, key=lambda category: category.total, reverse=True), data, labels, colors
 
 
 class TransactionListView(LoginRequiredMixin, BookContextMixin, TransactionSummaryMixin, FilterView, ListView):
@@ -460,9 +443,22 @@ class TransactionListView(LoginRequiredMixin, BookContextMixin, TransactionSumma
     model = Transaction
     template_name = 'budgetlog/transaction_list.html'
     context_object_name = 'transactions'
-    ordering = ['-datestamp']
+    ordering = ['-datestamp', '-id']  # id zajišťuje stabilní pořadí transakcí se stejným datem
     filterset_class = TransactionFilter
     paginate_by = 30
+    pagination_mode = 'offset'  # 'offset' (číslované stránky) nebo 'cursor' (stránkování podle klíče)
+
+    def get_pagination_mode(self):
+        """Režim stránkování: výchozí z atributu třídy, lze přepnout parametrem `pagination` nebo kurzorem v URL."""
+        if self.request.GET.get('cursor'):
+            return 'cursor'
+        mode = self.request.GET.get('pagination', self.pagination_mode)
+        return mode if mode in ('offset', 'cursor') else self.pagination_mode
+
+    def get_paginate_by(self, queryset):
+        # ListView nestránkuje (a nespouští vlastní COUNT), stránku sestaví get_context_data z již vyfiltrovaného
+        # querysetu a počtu transakcí z agregačního dotazu
+        return None
 
     def get_filterset_kwargs(self, filterset_class):
         """Přidává aktuální knihu do filtrů."""
@@ -472,29 +468,53 @@ class TransactionListView(LoginRequiredMixin, BookContextMixin, TransactionSumma
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        filterset = self.filterset_class(self.request.GET, queryset=self.get_queryset(), book=self.get_current_book())
-        context['filter'] = filterset
         request = self.request
-        filtered_qs = filterset.qs
+        # Filtr sestavil a vyhodnotil FilterView.get (self.filterset, self.object_list), znovu se nestaví
+        filtered_qs = self.object_list
 
         # Získání tagů a kategorií pouze z aktuální knihy
         context['all_tags'] = Tag.objects.filter(book=self.get_current_book())
         context['all_categories'] = Category.objects.filter(book=self.get_current_book())
+        # Filtr pro hromadné akce v režimu "vybrat vše" (a klíč tohoto režimu v prohlížeči) je na všech stránkách stejný
+        context['filter_query'] = without_pagination(request.GET).urlencode()
 
-        # Výpočet souhrnů a přidání do kontextu
-        summary_data = self.get_aggregates(filtered_qs)
+        # Výpočet souhrnů a přidání do kontextu; počet transakcí z téhož dotazu slouží i stránkování.
+        # Souhrny platného filtru se berou z cache, dokud se data knihy nezmění
+        if self.filterset.is_bound and not self.filterset.is_valid():
+            summary_data = self.get_aggregates(filtered_qs)
+        else:
+            params = self.filterset.form.cleaned_data if self.filterset.is_bound else {}
+            summary_data = self.cached('transaction-aggregates', params,
+                                       lambda: self.get_aggregates(filtered_qs, params))
         context.update(summary_data)
 
-        # Paginace
-        paginator = Paginator(filtered_qs, self.paginate_by)
-        page = self.request.GET.get('page')
+        pagination_mode = self.get_pagination_mode()
+        context['pagination_mode'] = pagination_mode
 
-        try:
-            transactions = paginator.page(page)
-        except PageNotAnInteger:
-            transactions = paginator.page(1)
-        except EmptyPage:
-            transactions = paginator.page(paginator.num_pages)
+        # Kategorie a tagy zobrazených řádků se načtou najednou, ne pro každý řádek zvlášť
+        page_qs = filtered_qs.for_display()
+
+        if pagination_mode == 'cursor':
+            # Stránkování podle klíče: každá stránka stojí stejně, bez ohledu na hloubku
+            paginator = KeysetPaginator(page_qs, self.paginate_by)
+            try:
+                transactions = paginator.page(request.GET.get('cursor'))
+            except InvalidCursor:
+                transactions = paginator.page()
+        else:
+            # Paginace bez COUNT, počet transakcí je známý ze souhrnů
+            paginator = CountedPaginator(page_qs, self.paginate_by, count=summary_data['transaction_count'])
+            page = self.request.GET.get('page')
+
+            try:
+                transactions = paginator.page(page)
+            except PageNotAnInteger:
+                transactions = paginator.page(1)
+            except EmptyPage:
+                transactions = paginator.page(paginator.num_pages)
+
+            # Zkrácený seznam stránek (1 … 4 5 6 … 100) místo odkazu na každou stránku
+            context['page_range'] = paginator.get_elided_page_range(transactions.number, on_each_side=2, on_ends=1)
 
         context['transactions'] = transactions
         return context
@@ -502,11 +522,10 @@ class TransactionListView(LoginRequiredMixin, BookContextMixin, TransactionSumma
     def get(self, request, *args, **kwargs):
         """Zpracuje GET požadavek a rozhodne, zda vrátí JSON nebo HTML."""
         if self.is_ajax():
-            # Pokud je požadavek přes AJAX, vrátí JSON odpověď
-            filterset = self.filterset_class(self.request.GET, queryset=self.get_queryset(),
-                                             book=self.get_current_book())
-            all_transaction_ids = list(filterset.qs.values_list('id', flat=True))
-            return JsonResponse({'transaction_ids': all_transaction_ids})
+            # Pokud je požadavek přes AJAX, vrátí JSON odpověď s počtem transakcí odpovídajících filtru
+            # (hromadné akce pak pracují přímo s filtrem, ID transakcí se do prohlížeče neposílají)
+            filterset = self.get_filterset(self.get_filterset_class())
+            return JsonResponse({'count': filterset.qs.count()})
         else:
             # Jinak normálně vykreslí stránku s šablonou
             return super().get(request, *args, **kwargs)
@@ -521,10 +540,9 @@ class TransactionDetailView(LoginRequiredMixin, BookContextMixin, DeleteView):
     template_name = 'budgetlog/transaction_detail.html'
     context_object_name = 'transaction'
 
-    def dispatch(self, request, *args, **kwargs):
-        current_book = self.get_current_book()
-        transaction = get_object_or_404(Transaction, pk=self.kwargs['pk'], book=current_book)
-        return super().dispatch(request, *args, **kwargs)
+    def get_queryset(self):
+        # Queryset z BookContextMixin obsahuje jen transakce aktuální knihy, cizí transakce vrátí 404
+        return super().get_queryset().for_display()
 
 
 class ObjectListView(LoginRequiredMixin, BookContextMixin, ListView):
@@ -548,7 +566,7 @@ class BookListView(ObjectListView):
     ordering = ['name']  # Řazení dle atributu name v modelu
 
     def get_queryset(self):
-        return Book.objects.filter(owner=self.request.user)
+        return self.request.books
 
 
 class CategoryListView(ObjectListView):
@@ -590,13 +608,6 @@ class ObjectFormView(LoginRequiredMixin, BookContextMixin):
         context['is_transaction_create'] = (self.model.__name__ == "Transaction")
         return context
 
-    def dispatch(self, request, *args, **kwargs):
-        # Ověříme, zda tato třída dědí z UpdateView (u CreateView by vyhazovala KeyError)
-        if issubclass(self.__class__, UpdateView):
-            current_book = self.get_current_book()
-            obj = get_object_or_404(self.model, pk=self.kwargs['pk'], book=current_book)
-        return super().dispatch(request, *args, **kwargs)
-
 
 class TransactionCreateView(ObjectFormView, CreateView):
     model = Transaction
@@ -713,20 +724,24 @@ class MonthDetailView(LoginRequiredMixin, BookContextMixin, TransactionSummaryMi
             book=self.get_current_book(),
             datestamp__year=year,
             datestamp__month=month
-        )
+        ).select_related('category')  # Šablona měsíce zobrazuje u každé transakce název kategorie
 
-        # Výpočet souhrnů
-        total_income, total_expense, total_balance = self.calculate_totals(transactions)
-        category_summaries, data, labels, colors = self.get_category_summaries(transactions, year=year, month=month)
+        # Výpočet souhrnů z měsíčních souhrnů (nezávisí na počtu transakcí), do změny dat knihy z cache
+        def compute_summaries():
+            if self.use_analytics():
+                analytics = self.get_analytics()
+                rows = analytics.period(date(year, month, 1), date(year + month // 12, month % 12 + 1, 1))
+                return analytics.totals(rows), self.get_analytics_category_summaries(analytics, rows)
+            month_rollups = MonthlyCategoryRollup.objects.filter(book=self.get_current_book(), year=year,
+                                                                 month=month)
+            return self.calculate_totals(month_rollups), self.get_category_summaries(year=year, month=month)
 
-        # Zpracování dat pro koláčový graf
-        # df = pd.DataFrame(list(category_summaries.values('name', 'total')))
-        # expense_data = df[df['total'] < 0]  # Pouze výdaje
-        # labels = expense_data['name'].tolist()
-        # values = np.abs(expense_data['total']).tolist()  # Absolutní hodnota výdajů
+        totals, summaries = self.cached('month-summary', {'year': year, 'month': month}, compute_summaries)
+        total_income, total_expense, total_balance = totals
+        category_summaries, data, labels, colors = summaries
 
-        # Vytvoření grafu
-        expense_pie_chart = generate_pie_chart(data, labels, colors, title="Výdaje podle kategorií")
+        # Registrace grafu; obrázek vykreslí a cachuje samostatný endpoint (viz ChartImageView)
+        expense_pie_chart_key = charts.register_pie_chart(data, labels, colors)
 
         context.update({
             'year': year,
@@ -736,11 +751,35 @@ class MonthDetailView(LoginRequiredMixin, BookContextMixin, TransactionSummaryMi
             'total_expense': total_expense,
             'total_balance': total_balance,
             'category_summaries': category_summaries,
-            'expense_pie_chart': expense_pie_chart,  # Base64 reprezentace grafu
+            'expense_pie_chart_url': reverse('chart-image', kwargs={'key': expense_pie_chart_key}),
         })
         return context
 
 
+class ChartImageView(LoginRequiredMixin, View):
+    """Vrací PNG grafu podle jeho obsahového klíče s hlavičkami pro cachování v prohlížeči."""
+
+    def get(self, request, key):
+        if not re.fullmatch(r'[0-9a-f]{64}', key):
+            raise Http404("Graf nebyl nalezen.")
+
+        # Klíč je hash obsahu, takže se obrázek pod ním nikdy nezmění
+        etag = f'"{key}"'
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            patch_cache_control(not_modified, private=True, max_age=CHART_MAX_AGE, immutable=True)
+            return not_modified
+
+        png = charts.get_chart_png(key)
+        if png is None:
+            raise Http404("Graf nebyl nalezen.")
+
+        response = HttpResponse(png, content_type='image/png')
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, max_age=CHART_MAX_AGE, immutable=True)
+        return response
+
+
 class YearDetailView(LoginRequiredMixin, BookContextMixin, TransactionSummaryMixin, TemplateView):
     """Templát pro zobrazení statistik transakcí u vybraného roku."""
     template_name = 'budgetlog/yearly_detail.html'
@@ -748,13 +787,18 @@ class YearDetailView(LoginRequiredMixin, BookContextMixin, TransactionSummaryMix
     def get_context_data(self, year, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        # Načtení všech transakcí pro daný rok a knihu
-        current_book = self.get_current_book()
-        transactions = Transaction.objects.filter(book=current_book, datestamp__year=year)
+        # Pokud se zpracovává aktuální rok, použijeme aktuální měsíc jako počet měsíců, jinak hodnotu 12
+        month_count = date.today().month if year == date.today().year else 12
+
+        def compute_summaries():
+            # Matice kategorie × měsíc z jediného dotazu nad měsíčními souhrny
+            pivot = self.get_pivot(year)
+            return (pivot.totals(), *self.get_yearly_category_summaries(year, pivot), pivot.monthly_data())
 
-        # Výpočet agregátů
-        total_income, total_expense, total_balance = self.calculate_totals(transactions)
-        months, category_summaries, monthly_balances = self.get_yearly_category_summaries(year)
+        # Výpočet agregátů; do změny dat knihy z cache (NumPy se pak vůbec nenačítá)
+        totals, months, category_summaries, monthly_balances, monthly_data = self.cached(
+            'year-summary', {'year': year, 'month_count': month_count}, compute_summaries)
+        total_income, total_expense, total_balance = totals
 
         # Generování JSON dat pro graf
         category_data = []
@@ -763,9 +807,6 @@ class YearDetailView(LoginRequiredMixin, BookContextMixin, TransactionSummaryMix
                 'name': category.name,
                 'color': category.color
             })
-        monthly_data = {}
-        for category in category_summaries:
-            monthly_data[category.name] = [monthly_balances[category.name].get(month, 0) for month in months]
 
         context.update({
             'year': year,
@@ -781,66 +822,21 @@ class YearDetailView(LoginRequiredMixin, BookContextMixin, TransactionSummaryMix
         })
         return context
 
-    def get_yearly_category_summaries(self, year):
-        """Získá souhrny kategorií a měsíční bilance pro daný rok."""
-        current_book = self.get_current_book()
-        transactions = Transaction.objects.filter(book=current_book, datestamp__year=year)
+    def get_pivot(self, year):
+        """Sestaví matici kategorie × měsíc; modul s NumPy se načítá až zde, ne při startu workeru."""
+        from .reports import YearlyCategoryPivot
+        analytics = self.get_analytics() if self.use_analytics() else None
+        return YearlyCategoryPivot(self.get_current_book(), year, analytics)
+
+    def get_yearly_category_summaries(self, year, pivot=None):
+        """Získá souhrny kategorií a měsíční bilance pro daný rok z matice kategorie × měsíc."""
+        if pivot is None:
+            pivot = self.get_pivot(year)
 
         # Pokud se zpracovává aktuální rok, použijeme aktuální měsíc jako počet měsíců, jinak hodnotu 12
         month_count = date.today().month if year == date.today().year else 12
-        # Agregace transakcí podle kategorií za celý rok
-        category_summaries = Category.objects.filter(book=current_book).annotate(
-            total=Coalesce(
-                Sum(
-                    Case(
-                        When(transaction__type='expense', then=-F('transaction__amount')),
-                        default=F('transaction__amount'),
-                        output_field=DecimalField()
-                    ),
-                    filter=Q(transaction__datestamp__year=year),
-                    output_field=DecimalField()
-                ),
-                Decimal('0')
-            ),
-            monthly_average=Coalesce(
-                Sum(
-                    Case(
-                        When(transaction__type='expense', then=-F('transaction__amount')),
-                        default=F('transaction__amount'),
-                        output_field=DecimalField()
-                    ),
-                    filter=Q(transaction__datestamp__year=year),
-                    output_field=DecimalField()
-                ) / month_count,
-                Decimal('0')
-            )
-        ).order_by('-total')
-
-        # Výpočet součtu a průměrné hodnoty transakcí pro každou kategorii
-        months = transactions.dates('datestamp', 'month', order='ASC')
-        # Výpočet bilance pro každou kategorii každého měsíce v daném roce
-        monthly_balances = {category.name: {} for category in category_summaries}
-        for month in months:
-            month_balances = Category.objects.filter(book=current_book).annotate(
-                monthly_total=Coalesce(
-                    Sum(
-                        Case(
-                            When(transaction__type='expense', then=-F('transaction__amount')),
-                            default=F('transaction__amount'),
-                            output_field=DecimalField()
-                        ),
-                        filter=Q(transaction__datestamp__year=year, transaction__datestamp__month=month.month),
-                        output_field=DecimalField()
-                    ),
-                    Decimal('0')
-                )
-            ).order_by('-monthly_total')
-
-            # Konverze Decimal na float (kvůli JSON serializaci)
-            for balance in month_balances:
-                monthly_balances[balance.name][month] = float(balance.monthly_total)
-
-        return months, category_summaries, monthly_balances
+        category_summaries = pivot.category_summaries(month_count)
+        return pivot.months, category_summaries, pivot.monthly_balances()
 
 
 class DashboardView(LoginRequiredMixin, BookContextMixin, TransactionSummaryMixin, TemplateView):
@@ -849,9 +845,13 @@ class DashboardView(LoginRequiredMixin, BookContextMixin, TransactionSummaryMixi
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        transactions = Transaction.objects.filter(book=self.get_current_book())
-        months_years = transactions.dates('datestamp', 'month', order='DESC')
-        years = transactions.dates('datestamp', 'year', order='DESC')
+        # Období s transakcemi se čtou z měsíčních souhrnů, nikoli z tabulky transakcí
+        periods = self.cached('periods', {}, lambda: list(
+            MonthlyCategoryRollup.objects.filter(book=self.get_current_book()).values_list(
+                'year', 'month').distinct().order_by('-year', '-month')
+        ))
+        months_years = [date(year, month, 1) for year, month in periods]
+        years = sorted({date(period.year, 1, 1) for period in months_years}, reverse=True)
 
         context.update({
             'months_years': months_years,
@@ -860,22 +860,81 @@ class DashboardView(LoginRequiredMixin, BookContextMixin, TransactionSummaryMixi
         return context
 
 
+class BalanceSeriesView(LoginRequiredMixin, BookContextMixin, TransactionSummaryMixin, View):
+    """
+    Vrací JSON s průběžným zůstatkem aktuální knihy po dnech, týdnech nebo měsících (parametr `period`) pro graf
+    na dashboardu. Ostatní parametry jsou filtr seznamu transakcí, zůstatek se pak počítá jen z vybraných transakcí.
+    """
+    filterset_class = TransactionFilter
+
+    def get(self, request):
+        period = request.GET.get('period', balances.PERIODS[0])
+        if period not in balances.PERIODS:
+            return JsonResponse({'error': f'Neznámé období: {period}'}, status=400)
+
+        book = self.get_current_book()
+        filterset = self.filterset_class(request.GET, queryset=Transaction.objects.filter(book=book), book=book)
+        if not filterset.is_valid():
+            return JsonResponse({'errors': filterset.errors}, status=400)
+
+        # Výsledek je malý (nejvýše max_points bodů), do změny dat knihy se bere z cache
+        max_points = settings.BALANCE_SERIES_MAX_POINTS
+        series = self.cached('balance-series', {**filterset.form.cleaned_data, 'period': period,
+                                                'max_points': max_points},
+                             lambda: balances.balance_series(filterset.qs, period, max_points))
+        return JsonResponse(series)
+
+
 class BulkTransactionActionView(LoginRequiredMixin, BookContextMixin, View):
     """Umožňuje provádět hromadné operace na vyfiltrovaných transakcích."""
     filterset_class = TransactionFilter
 
     def get_filtered_queryset(self, request):
-        """Získá vyfiltrované transakce podle aktuálních filtrů."""
-        filterset = TransactionFilter(request.GET, queryset=Transaction.objects.filter(book=self.get_current_book()))
+        """
+        Znovu sestaví výběr "všechny transakce odpovídající filtru" z query stringu seznamu transakcí (`filter_query`),
+        takže se ID transakcí nemusí posílat mezi prohlížečem a serverem.
+
+        :return: Queryset transakcí aktuální knihy, nebo None, pokud filtr není platný.
+        """
+        book = self.get_current_book()
+        filterset = self.filterset_class(without_pagination(QueryDict(request.POST.get('filter_query', ''))),
+                                         queryset=Transaction.objects.filter(book=book), book=book)
+        if not filterset.is_valid():
+            return None
         return filterset.qs
 
+    def get_selected_queryset(self, request):
+        """
+        Vrátí vybrané transakce aktuální knihy: buď všechny odpovídající filtru (`select_all`), nebo jednotlivě
+        zaškrtnuté podle ID (`selected_transactions`).
+
+        :return: Queryset transakcí, nebo None, pokud nebylo nic vybráno nebo je výběr neplatný.
+        """
+        if request.POST.get('select_all') == 'true':
+            return self.get_filtered_queryset(request)
+
+        # Převedeme seznam id transakcí z řetězce na seznam integerů
+        selected_transactions = request.POST.get('selected_transactions', '')
+        transaction_ids = [int(tid) for tid in selected_transactions.split(',') if tid.strip().isdigit()]
+        if not transaction_ids:
+            return None
+        return Transaction.objects.filter(book=self.get_current_book(), id__in=transaction_ids)
+
     def get_redirect_url_with_filters(self, request):
         """Vrátí URL zpět na stránku s transakcemi s původními filtry."""
-        # Vytvoření URL na základě filtrů z requestu
         base_url = reverse('transaction-list')  # 'transaction-list' je URL jméno vaší stránky s transakcemi
+        # Filtry seznamu posílá formulář v `filter_query` (včetně opakovaných parametrů, např. více tagů)
+        filter_query = without_pagination(QueryDict(request.POST.get('filter_query', '')))
+        if filter_query:
+            # Stránku seznamu posílají skryté parametry původního požadavku, zpět se vrátí na ni
+            for key in PAGINATION_PARAMS:
+                if request.POST.get(key):
+                    filter_query[key] = request.POST[key]
+            return f"{base_url}?{filter_query.urlencode()}"
+        # Vytvoření URL na základě filtrů z requestu
         query_params = request.POST.copy()  # Zkopíruje původní POST parametry, které zahrnují i filtry z GET
-        query_params.pop('csrfmiddlewaretoken', None)  # Odstraní CSRF token, ten do URL nepatří
-        query_params.pop('selected_transactions', None)  # Odstraní vybrané transakce, ty nejsou pro URL potřeba
+        for key in ('csrfmiddlewaretoken', 'selected_transactions', 'select_all', 'filter_query'):
+            query_params.pop(key, None)  # CSRF token a výběr transakcí do URL nepatří
         if query_params:
             return f"{base_url}?{query_params.urlencode()}"
         return base_url
@@ -884,17 +943,12 @@ class BulkTransactionActionView(LoginRequiredMixin, BookContextMixin, View):
         # Získání ID aktuální knihy
         book = self.get_current_book()
 
-        # Získání seznamu vybraných transakcí
-        selected_transactions = request.POST.get('selected_transactions')
-
-        if not selected_transactions:
+        # Vybrané transakce vždy jen z aktuální knihy
+        transactions = self.get_selected_queryset(request)
+        if transactions is None:
             messages.warning(request, "Nevybrali jste žádné transakce.")
             return JsonResponse({'redirect_url': self.get_redirect_url_with_filters(request)})
 
-        # Převedeme seznam id transakcí z řetězce na seznam integerů
-        transaction_ids = [int(tid) for tid in selected_transactions.split(',') if tid]
-        transactions = Transaction.objects.filter(id__in=transaction_ids)
-
         # Zpracování jednotlivých akcí podle toho, co bylo zvoleno za akci
         action = request.POST.get('action')
         action_mapping = {
@@ -919,9 +973,8 @@ class BulkTransactionActionView(LoginRequiredMixin, BookContextMixin, View):
             return JsonResponse({'redirect_url': self.get_redirect_url_with_filters(request)})
 
         tag = get_object_or_404(Tag, id=tag_id, book=book)  # Tag musí být z aktuální knihy
-        for transaction in transactions:  # Zamysli se nad zvýšením rychlosti procesu
-            transaction.tags.add(tag)
-        messages.success(request, f"{transactions.count()} transakcím byl přiřazen tag: {tag.name}.")
+        tagged = transactions.add_tag(tag)
+        messages.success(request, f"{tagged} transakcím byl přiřazen tag: {tag.name}.")
         # Přesměrování na stránku s původními filtry
         return JsonResponse({'redirect_url': self.get_redirect_url_with_filters(request)})
 
@@ -933,9 +986,8 @@ class BulkTransactionActionView(LoginRequiredMixin, BookContextMixin, View):
             return JsonResponse({'redirect_url': self.get_redirect_url_with_filters(request)})
 
         tag = get_object_or_404(Tag, id=tag_id, book=book)  # Tag musí být z aktuální knihy
-        for transaction in transactions:
-            transaction.tags.remove(tag)
-        messages.success(request, f"{transactions.count()} transakcím byl odebrán tag: {tag.name}.")
+        untagged = transactions.remove_tag(tag)
+        messages.success(request, f"{untagged} transakcím byl odebrán tag: {tag.name}.")
         return JsonResponse({'redirect_url': self.get_redirect_url_with_filters(request)})
 
     def change_category(self, request, transactions, book):
@@ -946,45 +998,31 @@ class BulkTransactionActionView(LoginRequiredMixin, BookContextMixin, View):
             return JsonResponse({'redirect_url': self.get_redirect_url_with_filters(request)})
 
         category = get_object_or_404(Category, id=category_id, book=book)  # Kategorie musí být z aktuální knihy
-        transactions.update(category=category)
-        messages.success(request, f"Kategorie změněna u {transactions.count()} transakcí na: {category.name}.")
+        changed = rollups.update_transactions(transactions, category=category)
+        messages.success(request, f"Kategorie změněna u {changed} transakcí na: {category.name}.")
         return JsonResponse({'redirect_url': self.get_redirect_url_with_filters(request)})
 
     def delete_transactions(self, request, transactions, book):
         """Smaže vybrané transakce."""
-        count = transactions.count()
-        transactions.delete()
+        count = rollups.delete_transactions(transactions)
         messages.success(request, f"Smazáno {count} transakcí.")
         return JsonResponse({'redirect_url': self.get_redirect_url_with_filters(request)})
 
     def export_transactions_to_csv(self, request, transactions, book):
-        """Exportuje vybrané transakce do CSV souboru."""
-        # Nastavení HTTP odpovědi pro CSV export
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="transactions.csv"'
+        """Exportuje vybrané transakce do CSV souboru, který se odesílá průběžně po dávkách."""
+        chunks = exports.csv_chunks(transactions, chunk_size=settings.CSV_EXPORT_CHUNK_SIZE)
 
-        # Použití StringIO pro zápis do paměti
-        output = StringIO()
-        writer = csv.writer(output)
-
-        # Zápis hlavičky do CSV
-        writer.writerow(['ID', 'Datum', 'Kategorie', 'Částka', 'Tagy', 'Popis', 'Typ', 'Kniha'])
-
-        # Záznamy do CSV
-        for transaction in transactions:
-            writer.writerow([
-                transaction.id,
-                transaction.datestamp,
-                transaction.category.name if transaction.category else '',
-                transaction.adjusted_amount,
-                ', '.join([tag.name for tag in transaction.tags.all()]),
-                transaction.description,
-                transaction.type,
-                transaction.book,
-            ])
-
-        # Vrácení CSV výstupu ve správném kódování UTF-8
-        response.write(output.getvalue().encode('utf-8-sig'))
+        # Velké exporty se komprimují, pokud to klient podporuje (prohlížeč je při stažení sám rozbalí)
+        compress = ('gzip' in request.headers.get('Accept-Encoding', '')
+                    and transactions.count() >= settings.CSV_EXPORT_GZIP_MIN_ROWS)
+        if compress:
+            chunks = exports.gzip_chunks(chunks)
+
+        response = StreamingHttpResponse(chunks, content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="transactions.csv"'
+        if compress:
+            response['Content-Encoding'] = 'gzip'
+        patch_vary_headers(response, ('Accept-Encoding',))
         return response
 
     def move_transactions_to_book(self, request, transactions, book):
@@ -995,44 +1033,12 @@ class BulkTransactionActionView(LoginRequiredMixin, BookContextMixin, View):
             return JsonResponse({'redirect_url': self.get_redirect_url_with_filters(request)})
 
         # Kontrola, zda cílová kniha patří uživateli
-        new_book = get_object_or_404(Book, id=new_book_id, owner=request.user)
-
-        # Procházíme každou transakci a zpracováváme tagy a kategorie
-        for transaction in transactions:
-            # Tagy - Zkontrolujeme, zda tagy existují v nové knize, jinak je vytvoříme s kopiemi atributů
-            new_tags = []
-            for tag in transaction.tags.all():
-                # Zkontrolujeme, zda tag již existuje v nové knize
-                new_tag, created = Tag.objects.get_or_create(
-                    name=tag.name,
-                    book=new_book,
-                    defaults={'color': tag.color, 'description': tag.description}
-                )
-                new_tags.append(new_tag)  # Přidáme nový nebo existující tag do seznamu
-            """Pokud v nové knize existuje tag se stejným názvem, zachovává se barva a popisek tagu z nové knihy 
-            nikoli tagu z knihy původní."""
-
-            # Nastavíme transakci nové tagy z nové knihy
-            transaction.tags.set(new_tags)
-
-            # Kategorie - Zkontrolujeme, zda kategorie existuje v nové knize, jinak ji vytvoříme s kopiemi atributů
-            if transaction.category:
-                new_category, created = Category.objects.get_or_create(
-                    name=transaction.category.name,
-                    book=new_book,
-                    defaults={'color': transaction.category.color, 'description': transaction.category.description}
-                )
-                transaction.category = new_category  # Aktualizujeme kategorii na tu z nové knihy
-
-            # Případné označení transakce tagem "přesunuto"
-            moved_tag, created = Tag.objects.get_or_create(name="Přesunuto", book=new_book)
-            transaction.tags.add(moved_tag)
-
-            # Přesun transakce do nové knihy
-            transaction.book = new_book
-            transaction.save()
-
-        messages.success(request, f"{transactions.count()} vybrané/ých transakce/í byly přesunuty do knihy: {new_book.name}.")
+        new_book = get_user_book(request, new_book_id)
+
+        # Kategorie a tagy se nahradí stejnojmennými z nové knihy (chybějící se vytvoří s kopiemi atributů);
+        # pokud v nové knize tag či kategorie se stejným názvem existuje, zachovává se barva a popis z nové knihy
+        moved = move_transactions(transactions, new_book)
+        messages.success(request, f"{moved} vybrané/ých transakce/í byly přesunuty do knihy: {new_book.name}.")
         return JsonResponse({'redirect_url': self.get_redirect_url_with_filters(request)})
 
 
@@ -1042,9 +1048,12 @@ class UploadTransactionsView(LoginRequiredMixin, BookContextMixin, TemplateView)
     template_name = 'budgetlog/upload_transactions.html'
 
     def get_context_data(self, **kwargs):
-        """Vrátí kontext s formulářem a aktuální knihou."""
+        """Vrátí kontext s formulářem, aktuální knihou a případně sledovaným importem na pozadí."""
         context = super().get_context_data(**kwargs)  # Zajistí, že se zavolá BookContextMixin
         context['form'] = TransactionUploadForm()  # Přidá formulář do kontextu
+        job_id = self.request.GET.get('job')
+        if job_id and job_id.isdigit():
+            context['import_job'] = ImportJob.objects.filter(id=job_id, owner=self.request.user).first()
         return context
 
     def post(self, request, *args, **kwargs):
@@ -1061,6 +1070,13 @@ class UploadTransactionsView(LoginRequiredMixin, BookContextMixin, TemplateView)
                 messages.warning(request, "Nebyla vybrána žádná kniha.")
                 return redirect('book-list')
 
+            # Velké soubory se neimportují v požadavku, ale uloží se a zpracuje je worker (run_import_worker)
+            if file.size > settings.IMPORT_INLINE_MAX_BYTES:
+                job = ImportJob.objects.create(book=book, owner=request.user, file=file,
+                                               create_missing=create_missing)
+                messages.info(request, "Soubor byl nahrán a transakce se importují na pozadí.")
+                return redirect(f"{reverse('upload-transactions')}?job={job.id}")
+
             result = self.upload_transactions_csv(file, book, create_missing) # doplnit příp. delimiter
 
             # Kontrola výsledku
@@ -1086,193 +1102,16 @@ class UploadTransactionsView(LoginRequiredMixin, BookContextMixin, TemplateView)
         :param create_missing: Bool indikující, zda se mají vytvořit chybějící tagy/kategorie.
         :return: Slovník s informacemi o úspěšně přidaných a vynechaných transakcích.
         """
-        # Mapování názvů sloupců (české i anglické verze)
-        column_mapping = {
-            "částka": "amount",
-            "datum": "datestamp",
-            "typ": "type",
-            "kategorie": "category",
-            "tagy": "tags",
-            "popis": "description",
-
-            "amount": "amount",
-            "datestamp": "datestamp",
-            "type": "type",
-            "category": "category",
-            "tags": "tags",
-            "description": "description"
-        }
-
-        # Detekce kódování a dekódování souboru CSV
-        encoding = detect_encoding(file)  # Nejprve zkusíme detekci
-        print(f"Detekované kódování souboru: {encoding}")
-
-        if not encoding:
-            return {"error": "Nepodařilo se určit kódování souboru. Zkuste soubor uložit v UTF-8."}
-
-            # Pokus o dekódování souboru
-        try:
-            file.seek(0)  # Reset ukazatele souboru
-            content = file.read().decode(encoding)
-        except (UnicodeDecodeError, LookupError):
-            return {"error": f"Nepodařilo se dekódovat soubor v kódování {encoding}. Zkuste soubor uložit v UTF-8."}
-
-        # Odstranění BOM (pokud existuje)
-        content = content.lstrip("\ufeff")
-
-        reader = csv.DictReader(content.splitlines(), delimiter=delimiter)  # Použití vybraného oddělovače
-
-        # Normalizace názvů sloupců
-        normalized_fieldnames = {col.lower().strip(): column_mapping.get(col.lower().strip()) for col in
-                                 reader.fieldnames}
-
-        # Ověření, zda všechny potřebné sloupce existují
-        required_columns = {"amount", "datestamp", "type", "category", "tags"}
-        if not required_columns.issubset(set(normalized_fieldnames.values())):
-            return {"error": "Transakce nenahrány! Soubor neobsahuje všechny požadované sloupce nebo hodnoty nejsou "
-                             "správně odděleny. Zkontrolujte, zda jsou názvy sloupců správné, oddělovač hodnot je "
-                             "středník (;), uložte soubor ve formátu UTF-8 a opět jej nahrajte."}
-
-        added = 0
-        skipped = []
-
-        # Načtení všech kategorií a tagů pro knihu, abychom minimalizovali dotazy do DB
-        existing_categories = {c.name.capitalize(): c for c in book.categories.all()}
-        existing_tags = {t.name.capitalize(): t for t in book.tag_set.all()}
-
-        # Validace a převod dat v souboru
-        for row in reader:
-            try:
-                # Převod klíčů v řádku podle normalizovaných názvů
-                row = {normalized_fieldnames[k.lower().strip()]: v for k, v in row.items() if
-                       k.lower().strip() in normalized_fieldnames}
-
-                # Ověření, že všechny požadované hodnoty nejsou prázdné
-                required_fields = ["amount", "datestamp", "type", "category"]
-                missing_fields = [field for field in required_fields if not row.get(field)]
-
-                if missing_fields:
-                    skipped.append(f"Řádek přeskočen – chybějící hodnoty: {', '.join(missing_fields)} na řádku: {row}")
-                    continue
-
-                # Převod částky na správný formát
-                try:
-                    amount = parse_amount(row["amount"])
-                except ValueError as e:
-                    skipped.append(f"Chybný formát částky v řádku: {row}, Chyba: {str(e)}")
-                    continue
-
-                # Ověření a převod formátu datumu
-                try:
-                    datestamp = parse_date(row["datestamp"])
-                except ValueError as e:
-                    skipped.append(f"Chybný formát data transakce v řádku: {row}, Chyba: {str(e)}")
-                    continue
-
-                transaction_type = row['type'].lower()
-
-                # Ověření správnosti typu transakce
-                if transaction_type not in ['income', 'expense']:
-                    skipped.append(f"Neplatný typ transakce v řádku: {row} (typ musí být 'income' nebo 'expense').")
-                    continue
-
-                category_name = row['category'].strip().capitalize()
-
-                # Ověření existence kategorie
-                category = existing_categories.get(category_name)
-                if not category:
-                    if create_missing:
-                        category = Category.objects.create(name=category_name, book=book, color='#000000')
-                        existing_categories[category_name] = category
-                    else:
-                        skipped.append(f"Chybějící kategorie: {category_name}")
-                        continue
-
-                tag_names = [tag.strip().capitalize() for tag in row['tags'].split(',') if tag.strip()]
-
-                # Ověření existence tagů
-                tags = []
-                for tag_name in tag_names:
-                    tag = existing_tags.get(tag_name)
-                    if not tag:
-                        if create_missing:
-                            tag = Tag.objects.create(name=tag_name, book=book, color='#000000')
-                            existing_tags[tag_name] = tag
-                        else:
-                            skipped.append(f"Chybějící tag: {tag_name}")
-                            continue
-                    tags.append(tag)
-
-                description = row['description'].capitalize()
-
-                # Vytvoření transakce
-                transaction = Transaction.objects.create(
-                    book=book,
-                    amount=amount,
-                    datestamp=datestamp,
-                    category=category,
-                    type=transaction_type,
-                    description=description,
-                )
-                transaction.tags.set(tags)
-                added += 1
-
-            except Exception as e:
-                skipped.append(f"Chyba v řádku: {row}, Chyba: {str(e)}")
-                continue
-
-        return {"added": added, "skipped": skipped}
-
-
-#Pomocné funkce pro kódování a parsování hodnot v CSV souboru
-def detect_encoding(file):
-    """
-    Detekuje kódování souboru na základě prvních několika tisíc bajtů.
-
-    :param file: CSV soubor s daty transakcí.
-    """
-    raw_data = file.read(4096)  # Přečte první blok dat
-    file.seek(0)  # Vrátí ukazatel na začátek souboru
-    result = chardet.detect(raw_data)  # Odhadne kódování
-    return result['encoding'] if result['confidence'] > 0.5 else None  # Pouze pokud je detekce spolehlivá
+        return get_importer(book, create_missing).run(file, delimiter)
 
 
-def parse_amount(amount_str):
-    """
-    Převádí zadanou částku na formát s desetinnou tečkou.
-    - Podporuje desetinnou čárku i desetinnou tečku.
-    - Odstraní mezery nebo jiné než číselné znaky kromě čísel, tečky a čárky.
-    """
-    amount_str = amount_str.strip()  # Odstranění mezer na začátku a konci
-    amount_str = re.sub(r"[^\d,.-]", "", amount_str)  # Odstranění nežádoucích znaků (kromě číslic, čárky, tečky, mínusu)
+class ImportJobProgressView(LoginRequiredMixin, View):
+    """Vrací průběh importu na pozadí jako JSON (zpracované, přidané a vynechané řádky)."""
 
-    # Pokud je v čísle čárka i tečka, ignorujeme formát a vyhodíme chybu
-    if "," in amount_str and "." in amount_str:
-        raise ValueError(f"Nejednoznačný formát čísla: {amount_str}")
-
-    # Pokud obsahuje čárku (ale ne tečku), nahradíme ji tečkou
-    """
-    if "," in amount_str:
-        amount_str = amount_str.replace(",", ".")
-    """
-    amount_str = amount_str.replace(",", ".")
-
-    return Decimal(amount_str)
-
-
-def parse_date(date_str):
-    """
-    Pokusí se rozpoznat a převést datum na standardní formát YYYY-MM-DD.
-    Podporované formáty:
-    - 'YYYY-MM-DD'
-    - 'DD.MM.YYYY'
-    """
-    for fmt in ("%Y-%m-%d", "%d.%m.%Y"):
-        try:
-            return datetime.strptime(date_str, fmt).date()
-        except ValueError:
-            continue
-    raise ValueError(f"Neznámý formát data: {date_str}")
+    @staticmethod
+    def get(request, pk, *args, **kwargs):
+        job = get_object_or_404(ImportJob, pk=pk, owner=request.user)
+        return JsonResponse(job.progress())
 
 
 # Metoda pro vytvoření a stažení šablony pro CSV
@@ -50,7 +50,8 @@ MIDDLEWARE = [
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'budgetlog.middleware.CachedAuthenticationMiddleware',
+    'budgetlog.middleware.CurrentBookMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -106,6 +107,57 @@ STATIC_ROOT = '/home/budgetlog/BudgetLog/static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = '/home/budgetlog/BudgetLog/media/'
 
+# Grafy se cachují na disku v MEDIA_ROOT/charts a v paměti každého workeru (limity v bajtech); z disku se při
+# překročení limitu mažou nejdéle nepoužité soubory
+CHART_MEMORY_CACHE_BYTES = 8 * 1024 * 1024
+CHART_DISK_CACHE_BYTES = 64 * 1024 * 1024
+
+# Cache souhrnů a přehledů podle verze knihy (budgetlog.caching); souborová cache je společná pro všechny workery
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('CACHE_LOCATION', str(BASE_DIR / 'cache')),
+    }
+}
+BUDGETLOG_CACHE = 'default'
+BUDGETLOG_CACHE_TIMEOUT = 60 * 60
+# Sčítání zásahů a minutí cache za všechny workery (python manage.py cache_stats); každý zásah pak zapisuje do cache
+BUDGETLOG_CACHE_STATS = os.getenv('BUDGETLOG_CACHE_STATS', 'False') == 'True'
+
+# Profil požadavků (proměnná prostředí REQUEST_PROFILE, měření: python manage.py benchmark_request_overhead):
+#   'default' – sezení v databázi, přihlášený uživatel se načítá z databáze při každém požadavku
+#   'cached'  – sezení v cache se zálohou v databázi (zapisuje se jen při změně), uživatel z cache
+#   'cookies' – podepsané sezení v cookie (žádné dotazy ani zápisy sezení do databáze), uživatel z cache
+REQUEST_PROFILES = {
+    'default': {'SESSION_ENGINE': 'django.contrib.sessions.backends.db', 'BUDGETLOG_USER_CACHE': False},
+    'cached': {'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db', 'BUDGETLOG_USER_CACHE': True},
+    'cookies': {'SESSION_ENGINE': 'django.contrib.sessions.backends.signed_cookies', 'BUDGETLOG_USER_CACHE': True},
+}
+REQUEST_PROFILE = os.getenv('REQUEST_PROFILE', 'default')
+SESSION_ENGINE = REQUEST_PROFILES[REQUEST_PROFILE]['SESSION_ENGINE']
+BUDGETLOG_USER_CACHE = REQUEST_PROFILES[REQUEST_PROFILE]['BUDGETLOG_USER_CACHE']
+
+# Export CSV se odesílá po dávkách transakcí; od daného počtu řádků se komprimuje gzipem (pokud to klient podporuje)
+CSV_EXPORT_CHUNK_SIZE = 2000
+CSV_EXPORT_GZIP_MIN_ROWS = 5000
+
+# Import CSV zapisuje transakce po dávkách; každá dávka je jedna databázová transakce
+IMPORT_BATCH_SIZE = 1000
+
+# Implementace importu: 'rows' (řádek po řádku) nebo 'pandas' (převod hodnot po celých sloupcích)
+IMPORT_ENGINE = 'rows'
+
+# Výpočet přehledů (souhrny seznamu transakcí, měsíční a roční přehled): 'sql' (agregační dotazy nad transakcemi
+# a měsíčními souhrny) nebo 'numpy' (sloupce transakcí knihy v paměti, viz budgetlog.reports.BookAnalytics;
+# měření: python manage.py benchmark_analytics)
+ANALYTICS_ENGINE = 'sql'
+
+# Nejvyšší počet bodů grafu vývoje zůstatku; delší období se seskupí do týdnů / měsíců (viz budgetlog.balances)
+BALANCE_SERIES_MAX_POINTS = 366
+
+# Soubory větší než tento limit (v bajtech) se neimportují v požadavku, ale ve workeru (manage.py run_import_worker)
+IMPORT_INLINE_MAX_BYTES = 256 * 1024
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 SITE_ID = 2